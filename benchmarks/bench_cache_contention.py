@@ -0,0 +1,83 @@
+"""
+Contention benchmark of Data_Cache against Sharded_Data_Cache, with many threads reading at once
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_cache_contention
+"""
+
+import random
+import threading
+import time
+
+from qb_remote.core import CoreCaches as Cache
+
+
+def run_threads(cache, keys: list[str], thread_count: int, reads_per_thread: int, write_every: int):
+    """
+    Gets how many reads per second thread_count threads manage together, every write_every-th
+    operation of a thread is a write instead
+    """
+    barrier = threading.Barrier(thread_count + 1)
+
+    def work(seed: int):
+        rng = random.Random(seed)
+        picks = [rng.choice(keys) for _ in range(reads_per_thread)]
+
+        barrier.wait()
+
+        for i, key in enumerate(picks):
+            if write_every and i % write_every == 0:
+                cache.add_data(key, i, True)
+            else:
+                cache.get_if_has_data(key)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(thread_count)]
+
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+
+    for thread in threads:
+        thread.join()
+
+    return thread_count * reads_per_thread / (time.perf_counter() - start)
+
+
+def make_caches(keys: list[str]) -> dict[str, object]:
+    single = Cache.Data_Cache("single")
+    sharded = Cache.Sharded_Data_Cache("sharded", 16)
+    frozen = Cache.Sharded_Data_Cache("frozen", 16)
+
+    for key in keys:
+        single.add_data(key, [key])
+        sharded.add_data(key, [key])
+        frozen.add_data(key, [key])
+        frozen.freeze_data(key)
+
+    return {"Data_Cache": single, "Sharded_Data_Cache": sharded, "Sharded (frozen)": frozen}
+
+
+def main(key_count: int = 2000, reads_per_thread: int = 50_000):
+    keys = [f"torrent_files_{i:040x}" for i in range(key_count)]
+
+    for thread_count in (1, 8, 64, 200):
+        for write_every, label in ((0, "reads only"), (20, "5% writes")):
+            # writes would thaw the frozen entries, so only the read only runs use them
+            caches = make_caches(keys)
+
+            if write_every:
+                caches.pop("Sharded (frozen)")
+
+            results = "   ".join(
+                f"{name} {run_threads(cache, keys, thread_count, reads_per_thread // thread_count * 8, write_every) / 1e6:6.2f} M/s"
+                for name, cache in caches.items()
+            )
+
+            print(f"{thread_count:>4} threads, {label:<11} {results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Micro-benchmark of the CoreFormatting formatters against the old CoreData ones
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_formatting
+"""
+
+import math
+import random
+import timeit
+
+import numpy as np
+
+from qb_remote.core import CoreConstants as CC
+from qb_remote.core import CoreFormatting as CF
+
+
+# copies of the formatters as they were before CoreFormatting, so there is something to compare to
+
+
+def legacy_size_bytes_to_pretty_str(size_bytes: int):
+    if size_bytes == 0:
+        return "0B"
+
+    is_negative = False
+    if size_bytes < 0:
+        size_bytes *= -1
+        is_negative = True
+
+    size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+    i = int(math.floor(math.log(size_bytes, 1024)))
+    p = math.pow(1024, i)
+    s = round(size_bytes / p, 2)
+
+    if is_negative:
+        s *= -1
+    return "%s %s" % (s, size_name[i])
+
+
+def legacy_get_pretty_download_priority(priority):
+    if priority == CC.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD:
+        return "Do Not Download"
+
+    if priority == CC.TORRENT_FILE_PRIORITY_NORMAL:
+        return "Normal"
+
+    if priority == CC.TORRENT_FILE_PRIORITY_HIGH:
+        return "High"
+
+    if priority == CC.TORRENT_FILE_PRIORITY_MAXIMUM:
+        return "Maximum"
+
+    return "Unknown"
+
+
+def legacy_torrent_state_to_pretty(state_: str):
+    state = state_.lower()
+
+    if state == "stalledup":
+        return "Seeding"
+
+    if state == "stalled" or state == "stalleddown":
+        return "Stalled"
+
+    if state == "downloading":
+        return "Downloading"
+
+    if state == "pauseddl":
+        return "Paused"
+
+    if state == "uploading":
+        return "Uploading"
+
+    return state_
+
+
+def best_of(func, repeat: int = 5) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def report(name: str, legacy: float, new: float):
+    print(
+        f"{name:<40} legacy {legacy * 1000:9.2f} ms   new {new * 1000:9.2f} ms   "
+        f"x{legacy / new:6.1f}"
+    )
+
+
+def main(count: int = 1_000_000):
+    rng = random.Random(1234)
+
+    # file lists repeat sizes a lot, so mix distinct sizes with a smaller pool of common ones
+    common = [rng.randrange(0, 1 << 34) for _ in range(count // 100)]
+    sizes = [
+        rng.choice(common) if rng.random() < 0.7 else rng.randrange(0, 1 << 40)
+        for _ in range(count)
+    ]
+    states = [rng.choice(CF.TORRENT_STATES) for _ in range(count)]
+    priorities = [rng.choice((0, 1, 6, 7)) for _ in range(count)]
+
+    size_column = np.array(sizes, dtype=np.int64)
+    state_column = np.array([CF.torrent_state_to_code(s) for s in states], dtype=np.int16)
+    priority_column = np.array(priorities, dtype=np.int8)
+
+    for size in sizes[:10000]:
+        assert CF.size_bytes_to_pretty_str(size) == legacy_size_bytes_to_pretty_str(size), size
+
+    assert CF.format_sizes(size_column[:10000]) == [
+        legacy_size_bytes_to_pretty_str(s) for s in sizes[:10000]
+    ]
+
+    print(f"Formatting {count:,} values")
+
+    report(
+        "size_bytes_to_pretty_str",
+        best_of(lambda: [legacy_size_bytes_to_pretty_str(s) for s in sizes]),
+        best_of(lambda: [CF.size_bytes_to_pretty_str(s) for s in sizes]),
+    )
+    report(
+        "size_bytes_to_pretty_str (batched)",
+        best_of(lambda: [legacy_size_bytes_to_pretty_str(s) for s in sizes]),
+        best_of(lambda: CF.format_sizes(size_column)),
+    )
+    report(
+        "torrent_state_to_pretty",
+        best_of(lambda: [legacy_torrent_state_to_pretty(s) for s in states]),
+        best_of(lambda: [CF.torrent_state_to_pretty(s) for s in states]),
+    )
+    report(
+        "torrent_state_to_pretty (batched)",
+        best_of(lambda: [legacy_torrent_state_to_pretty(s) for s in states]),
+        best_of(lambda: CF.format_torrent_states(state_column)),
+    )
+    report(
+        "get_pretty_download_priority",
+        best_of(lambda: [legacy_get_pretty_download_priority(p) for p in priorities]),
+        best_of(lambda: [CF.get_pretty_download_priority(p) for p in priorities]),
+    )
+    report(
+        "get_pretty_download_priority (batched)",
+        best_of(lambda: [legacy_get_pretty_download_priority(p) for p in priorities]),
+        best_of(lambda: CF.format_download_priorities(priority_column)),
+    )
+
+
+if __name__ == "__main__":
+    main()
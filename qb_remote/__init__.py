@@ -30,15 +30,16 @@ def main():
     client_controller.boot_everything_base()
 
     try:
-        GUICommon.enable_hi_dpi()
-        
-        app = QW.QApplication([])
-        app.setPalette( GUICommon.get_darkModePalette(app))
-        mainwindow = GUIClient.ClientWindow()
+        # the controller is already logging in and syncing on its own threads while this runs,
+        # the torrents come in through the window's sync timer
+        with client_controller.boot_phase("window"):
+            GUICommon.enable_hi_dpi()
 
-        mainwindow.show()
+            app = QW.QApplication([])
+            app.setPalette( GUICommon.get_darkModePalette(app))
+            mainwindow = GUIClient.ClientWindow()
 
-        mainwindow.update_torrent_list()
+            mainwindow.show()
 
         app.exec()
 
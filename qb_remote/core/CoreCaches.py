@@ -4,28 +4,340 @@ import traceback
 import os
 import json
 import threading
+import logging
 import collections
+import heapq
+import itertools
+import functools
+import zlib
 from typing import Union, Callable, TYPE_CHECKING
 
+import numpy as np
+
 from . import CoreData as CD
 from . import CoreExceptions as CE
 
+# containers longer than this are sized from a sample of their items
+SIZE_SAMPLE_COUNT = 64
+
+# how many levels of nested containers estimate_size follows
+SIZE_MAX_DEPTH = 4
+
+# zlib level idle entries are compressed with, higher levels take a few times longer for little gain
+COLD_COMPRESSION_LEVEL = 1
+
+_SIZERS: dict[type, Callable[[object], int]] = {}
+
+# type -> (encode, decode), see register_codec
+_CODECS: dict[type, tuple[Callable, Callable]] = {}
+
+
+def register_sizer(data_type: type, sizer: Callable[[object], int]):
+    """
+    Sets how estimate_size sizes data of the given type, subclasses included
+    """
+    _SIZERS[data_type] = sizer
+
+
+def register_codec(
+    data_type: type,
+    encode: Callable[[object], tuple[bytes, object]],
+    decode: Callable[[bytes, object], object],
+):
+    """
+    Sets how data of the given type, subclasses included, is turned into bytes to compress when idle
+
+    encode gives the bytes and a context object, both are handed back to decode, it can throw
+    ValueError for data that it can not encode
+    """
+    _CODECS[data_type] = (encode, decode)
+
+
+def _get_sizer(data_type: type) -> Callable[[object], int] | None:
+    for base in data_type.__mro__:
+        sizer = _SIZERS.get(base, None)
+
+        if sizer is not None:
+            return sizer
+
+    return None
+
+
+def _get_codec(data_type: type) -> tuple[Callable, Callable] | None:
+    for base in data_type.__mro__:
+        codec = _CODECS.get(base, None)
+
+        if codec is not None:
+            return codec
+
+    return None
+
+
+def _estimate_items_size(items, count: int, depth: int) -> int:
+    if count <= SIZE_SAMPLE_COUNT:
+        return sum(estimate_size(item, depth) for item in items)
+
+    if isinstance(items, (list, tuple)):
+        step = count / SIZE_SAMPLE_COUNT
+        sample = [items[int(i * step)] for i in range(SIZE_SAMPLE_COUNT)]
+
+    else:
+        sample = list(itertools.islice(items, SIZE_SAMPLE_COUNT))
+
+    return sum(estimate_size(item, depth) for item in sample) * count // SIZE_SAMPLE_COUNT
+
+
+def estimate_size(data, depth: int = SIZE_MAX_DEPTH) -> int:
+    """
+    Estimates how many bytes data takes up, including what its containers hold
+
+    This is meant for cache budgets, long containers are sized from a sample of their items
+    """
+    sizer = _get_sizer(type(data))
+
+    if sizer is not None:
+        return sizer(data)
+
+    size = sys.getsizeof(data)
+
+    depth -= 1
+
+    if depth < 0:
+        return size
+
+    if isinstance(data, dict):
+        count = len(data)
+
+        return (
+            size
+            + _estimate_items_size(data.keys(), count, depth)
+            + _estimate_items_size(data.values(), count, depth)
+        )
+
+    if isinstance(data, (list, tuple, set, frozenset)):
+        return size + _estimate_items_size(data, len(data), depth)
+
+    return size
+
+
+# getsizeof includes the buffer of an array that owns it, but not of a view
+register_sizer(
+    np.ndarray, lambda array: sys.getsizeof(array) + (0 if array.base is None else array.nbytes)
+)
+
+
+class Compressed_Data(object):
+    """
+    The compressed bytes of a cache entry that went idle, with what is needed to decode it again
+    """
+
+    def __init__(self, data, codec: tuple[Callable, Callable], hot_size: int):
+        (encode, decode) = codec
+
+        (payload, context) = encode(data)
+
+        self._payload: bytes = zlib.compress(payload, COLD_COMPRESSION_LEVEL)
+        self._context = context
+        self._decode: Callable[[bytes, object], object] = decode
+
+        # the estimated size once decompressed, so it does not have to be estimated again
+        self.hot_size: int = hot_size
+
+    def get_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self._payload)
+
+    def decompress(self):
+        return self._decode(zlib.decompress(self._payload), self._context)
+
+
+class Fetch_In_Flight(object):
+    """
+    A fetch one thread is doing for a key, the other threads missing the same key wait on it
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data = None
+
+        # what the fetch raised, raised again in every thread waiting on it
+        self.error: BaseException | None = None
+
 
 class Data_Cache(object):
-    def __init__(self, name: str, timeout: int = 1200):
+    """
+    Thread safe key value cache
+
+    With a max_bytes budget, the least recently used entries are evicted once the estimated size
+    of everything in the cache goes over it, the entry just added is never evicted
+
+    With cold_after, maintain_cache compresses the entries that were not read for that many seconds,
+    if their type has a codec, see register_codec, they are decompressed the next time they are read
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: int = 1200,
+        max_bytes: int | None = None,
+        sizer: Callable[[object], int] = estimate_size,
+        invalidation_listener: Callable[[object], None] = None,
+        cold_after: int | None = None,
+    ):
         self._name: str = name
         self._timeout: int = timeout
 
+        self._cold_after: int | None = cold_after
+
+        self._max_bytes: int | None = max_bytes
+        self._sizer: Callable[[object], int] = sizer
+
+        # called with a key, under the lock, whenever its data is replaced, removed or goes stale
+        self._invalidation_listener: Callable[[object], None] = invalidation_listener
+
         self._keys_to_data: dict[str] = {}
         self._keys_fifo: dict[str, int] = collections.OrderedDict()
 
+        self._keys_to_size: dict[str, int] = {}
+        self._total_bytes: int = 0
+
+        # keys whose data is a Compressed_Data
+        self._cold_keys: set = set()
+
+        # key -> time of reads made without the lock, such as of frozen Sharded_Data_Cache entries,
+        # moved into the lru order before evicting or compressing goes by it
+        self._unlocked_reads: dict = {}
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
         self._lock = threading.Lock()
 
+    def __len__(self):
+        return len(self._keys_to_data)
+
     def _delete_item(self):
         (delete_key, last_access_time) = self._keys_fifo.popitem(last=False)
 
         self.delete_data_unsafe(delete_key)
 
+        self._evictions += 1
+
+    def _apply_unlocked_reads_unsafe(self):
+        reads = []
+
+        # popitem is atomic, so reads recorded meanwhile are either taken now or left for next time
+        while self._unlocked_reads:
+            try:
+                reads.append(self._unlocked_reads.popitem())
+
+            except KeyError:
+                break
+
+        fifo = self._keys_fifo
+
+        for key, read_time in sorted(reads, key=lambda read: read[1]):
+            if key in fifo and read_time >= fifo[key]:
+                fifo.move_to_end(key)
+                fifo[key] = read_time
+
+    def _evict_unsafe(self, keep_key=None):
+        if self._max_bytes is None or self._total_bytes <= self._max_bytes:
+            return
+
+        self._apply_unlocked_reads_unsafe()
+
+        while self._total_bytes > self._max_bytes and self._keys_fifo:
+            # the newest entry alone is over the budget, it stays rather than being fetched again
+            if next(iter(self._keys_fifo)) == keep_key:
+                return
+
+            self._delete_item()
+
+    def _set_size_unsafe(self, key, size: int):
+        self._total_bytes += size - self._keys_to_size.get(key, 0)
+        self._keys_to_size[key] = size
+
+    def _get_hot_unsafe(self, key):
+        data = self._keys_to_data[key]
+
+        if key in self._cold_keys:
+            self._cold_keys.discard(key)
+
+            hot_size = data.hot_size
+
+            data = self._keys_to_data[key] = data.decompress()
+
+            self._set_size_unsafe(key, hot_size)
+
+            self._evict_unsafe(key)
+
+        return data
+
+    def _compress_idle(self):
+        """
+        Compresses the entries that were not read for cold_after seconds, outside the lock
+        """
+        if self._cold_after is None:
+            return
+
+        with self._lock:
+            self._apply_unlocked_reads_unsafe()
+
+            candidates = []
+
+            # the lru order has the entries that were read the longest ago first
+            for key, last_access_time in self._keys_fifo.items():
+                if not CD.time_has_passed(last_access_time + self._cold_after):
+                    break
+
+                if key in self._cold_keys:
+                    continue
+
+                data = self._keys_to_data[key]
+
+                codec = _get_codec(type(data))
+
+                if codec is not None:
+                    candidates.append((key, data, codec, self._keys_to_size.get(key, 0)))
+
+        for key, data, codec, hot_size in candidates:
+            try:
+                compressed = Compressed_Data(data, codec, hot_size)
+
+            except ValueError as e:
+                logging.debug(f"Could not compress {key} in the {self._name} cache: {e}")
+                continue
+
+            with self._lock:
+                self._apply_unlocked_reads_unsafe()
+
+                # it was replaced or read in the meantime
+                if self._keys_to_data.get(key, None) is not data or not CD.time_has_passed(
+                    self._keys_fifo[key] + self._cold_after
+                ):
+                    continue
+
+                if self._invalidation_listener is not None:
+                    self._invalidation_listener(key)
+
+                self._keys_to_data[key] = compressed
+                self._cold_keys.add(key)
+
+                self._set_size_unsafe(key, compressed.get_size())
+
+    def get_expiry_time_unsafe(self, key) -> int | None:
+        """
+        Gets when the data of key stops being fresh, None if it does not expire
+        """
+        return None
+
+    def record_unlocked_read(self, key):
+        """
+        Records a read of key made without taking the lock, so the entry does not count as idle
+        """
+        self._unlocked_reads[key] = CD.time_now()
+
     def _touch_key(self, key):
         # have to delete first, rather than overwriting, so the ordereddict updates its internal order
         if key in self._keys_fifo:
@@ -46,6 +358,55 @@ class Data_Cache(object):
         with self._lock:
             self._keys_to_data = {}
             self._keys_fifo = collections.OrderedDict()
+            self._keys_to_size = {}
+            self._total_bytes = 0
+            self._cold_keys = set()
+            self._unlocked_reads = {}
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_stats(self) -> dict:
+        """
+        Gets the entry count, estimated bytes and the hit, miss and eviction counts of the cache
+        """
+        with self._lock:
+            return {
+                "name": self._name,
+                "entries": len(self._keys_to_data),
+                "cold": len(self._cold_keys),
+                "bytes": self._total_bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def get_total_bytes(self) -> int:
+        """
+        Gets the estimated size of everything in the cache
+        """
+        with self._lock:
+            return self._total_bytes
+
+    def get_max_bytes(self) -> int | None:
+        with self._lock:
+            return self._max_bytes
+
+    def set_max_bytes(self, max_bytes: int | None):
+        """
+        Sets the byte budget, None for no budget, evicting entries that no longer fit
+        """
+        with self._lock:
+            self._max_bytes = max_bytes
+
+            self._evict_unsafe()
 
     def add_data_unsafe(self, key, data, replace=False):
         """
@@ -55,10 +416,19 @@ class Data_Cache(object):
         if key in self._keys_to_data and not replace:
             return
 
+        if self._invalidation_listener is not None and key in self._keys_to_data:
+            self._invalidation_listener(key)
+
+        self._cold_keys.discard(key)
+
+        self._set_size_unsafe(key, self._sizer(data))
+
         self._keys_to_data[key] = data
 
         self._touch_key(key)
 
+        self._evict_unsafe(key)
+
     def add_data(self, key, data, replace=False):
         """
         Adds data to the cache
@@ -73,8 +443,17 @@ class Data_Cache(object):
         if key not in self._keys_to_data:
             return
 
+        if self._invalidation_listener is not None:
+            self._invalidation_listener(key)
+
         del self._keys_to_data[key]
 
+        self._cold_keys.discard(key)
+
+        self._keys_fifo.pop(key, None)
+
+        self._total_bytes -= self._keys_to_size.pop(key, 0)
+
     def delete_data(self, key):
         """
         Deletes data from the cache
@@ -82,6 +461,18 @@ class Data_Cache(object):
         with self._lock:
             self.delete_data_unsafe(key)
 
+    def delete_data_where(self, predicate: Callable[[object], bool]) -> int:
+        """
+        Deletes the data of every key the predicate is True for, returns how many were deleted
+        """
+        with self._lock:
+            keys = [key for key in self._keys_to_data if predicate(key)]
+
+            for key in keys:
+                self.delete_data_unsafe(key)
+
+            return len(keys)
+
     def get_data_unsafe(self, key, remove=False):
         """
         Gets data from the cache without locking
@@ -90,11 +481,14 @@ class Data_Cache(object):
         """
 
         if key not in self._keys_to_data:
+            self._misses += 1
             raise CE.Cache_Lookup_Exception(f"Cache error! Looking for {key}, but it was missing.")
 
+        self._hits += 1
+
         self._touch_key(key)
 
-        _ = self._keys_to_data[key]
+        _ = self._get_hot_unsafe(key)
 
         if remove:
             self.delete_data_unsafe(key)
@@ -116,15 +510,19 @@ class Data_Cache(object):
         """
 
         if key in self._keys_to_data:
+            self._hits += 1
+
             self._touch_key(key)
 
-            _ = self._keys_to_data[key]
+            _ = self._get_hot_unsafe(key)
 
             if remove:
                 self.delete_data_unsafe(key)
 
             return _
 
+        self._misses += 1
+
         return None
 
     def get_if_has_data(self, key, remove=False):
@@ -141,20 +539,27 @@ class Data_Cache(object):
         with self._lock:
             return self.has_data_unsafe(key)
 
+    def _get_maintenance_timeout(self) -> int | None:
+        """
+        Gets how old an entry has to be for maintain_cache to drop it, None to never drop by age
+        """
+        return self._timeout
+
     def maintain_cache(self):
         with self._lock:
-            while True:
-                if len(self._keys_fifo) == 0:
-                    return
+            timeout = self._get_maintenance_timeout()
 
+            while timeout is not None and self._keys_fifo:
                 (key, last_access_time) = next(iter(self._keys_fifo.items()))
 
-                if CD.time_has_passed(last_access_time + self._timeout):
+                if CD.time_has_passed(last_access_time + timeout):
                     self._delete_item()
 
                 else:
                     break
 
+        self._compress_idle()
+
     def set_timeout(self, timeout: int):
         with self._lock:
             self._timeout = timeout
@@ -163,19 +568,250 @@ class Data_Cache(object):
 
 
 class Expiring_Data_Cache(Data_Cache):
-    def __init__(self, name: str, timeout: int = 1200):
-        Data_Cache.__init__(self, name, timeout)
+    """
+    Cache whose entries expire a timeout after they were added, reading them does not keep them alive
+
+    Expiry goes by a heap of insertion times, kept apart from the LRU order that reads update, so
+    maintain_cache only visits the entries that expired
+
+    With stale_while_revalidate, get_data_revalidating keeps serving an expired entry while one background
+    refresh, run through scheduler, replaces it, until the entry is older than hard_timeout
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: int = 1200,
+        stale_while_revalidate: bool = False,
+        hard_timeout: int | None = None,
+        scheduler: Callable[..., object] = None,
+        **kwargs,
+    ):
+        Data_Cache.__init__(self, name, timeout, **kwargs)
+
+        if stale_while_revalidate and scheduler is None:
+            raise ValueError("Stale while revalidate needs a scheduler to refresh entries with")
+
+        self._stale_while_revalidate: bool = stale_while_revalidate
+        self._hard_timeout: int | None = hard_timeout
+
+        # called as scheduler(delay, callable, *args), such as ClientController.call_later
+        self._scheduler: Callable[..., object] = scheduler
+
+        self._revalidating_keys: set = set()
+
+        # key -> the fetch of a missing key, so only one thread fetches it at a time
+        self._fetching_keys: dict[object, Fetch_In_Flight] = {}
+
+        # keys whose data is known to be out of date before its timeout
+        self._stale_keys: set = set()
+
+        self._reset_expiry_unsafe()
+
+    def _reset_expiry_unsafe(self):
+        self._keys_added: dict[object, int] = {}
+
+        # (added time, insertion number, key), replaced and deleted keys are skipped when popped
+        self._expiry_heap: list[tuple[int, int, object]] = []
+        self._keys_insertion: dict[object, int] = {}
+        self._insertion_count: int = 0
+
+    def clear(self):
+        with self._lock:
+            self._stale_keys = set()
+            self._reset_expiry_unsafe()
+
+        Data_Cache.clear(self)
+
+    def add_data_unsafe(self, key, data, replace=False):
+        if key in self._keys_to_data and not replace:
+            return
+
+        self._stale_keys.discard(key)
+
+        added_time = CD.time_now()
+
+        self._insertion_count += 1
+
+        self._keys_added[key] = added_time
+        self._keys_insertion[key] = self._insertion_count
+
+        heapq.heappush(self._expiry_heap, (added_time, self._insertion_count, key))
+
+        # replaced keys leave dead heap entries behind, rebuild before they outnumber the live ones
+        if len(self._expiry_heap) > 2 * len(self._keys_added) + 64:
+            self._expiry_heap = [
+                (self._keys_added[key], insertion, key)
+                for key, insertion in self._keys_insertion.items()
+            ]
+            heapq.heapify(self._expiry_heap)
+
+        Data_Cache.add_data_unsafe(self, key, data, replace)
+
+    def delete_data_unsafe(self, key):
+        self._stale_keys.discard(key)
+
+        self._keys_added.pop(key, None)
+        self._keys_insertion.pop(key, None)
+
+        Data_Cache.delete_data_unsafe(self, key)
+
+    def maintain_cache(self):
+        with self._lock:
+            timeout = self._get_maintenance_timeout()
+
+            heap = self._expiry_heap
+
+            while timeout is not None and heap and CD.time_has_passed(heap[0][0] + timeout):
+                (added_time, insertion, key) = heapq.heappop(heap)
+
+                if self._keys_insertion.get(key, None) != insertion:
+                    continue
+
+                self.delete_data_unsafe(key)
+
+                self._evictions += 1
+
+        self._compress_idle()
+
+    def mark_stale(self, key):
+        """
+        Treats the data of key as expired, without dropping it, such as when it is known to have changed
+        """
+        with self._lock:
+            if key in self._keys_to_data:
+                self._stale_keys.add(key)
+
+                if self._invalidation_listener is not None:
+                    self._invalidation_listener(key)
+
+    def mark_stale_where(self, predicate: Callable[[object], bool]) -> int:
+        """
+        Marks the data of every key the predicate is True for as stale, returns how many were marked
+        """
+        with self._lock:
+            keys = [key for key in self._keys_to_data if predicate(key)]
+
+        for key in keys:
+            self.mark_stale(key)
+
+        return len(keys)
+
+    def _get_maintenance_timeout(self) -> int | None:
+        if self._stale_while_revalidate:
+            return self._hard_timeout
+
+        return self._timeout
+
+    def _revalidate(self, key, fetch: Callable[[], object]):
+        try:
+            data = fetch()
+
+            if data is not None:
+                self.add_data(key, data, True)
+
+        except Exception as e:
+            logging.warning(f"Refreshing {key} in the {self._name} cache failed: {e}")
+
+        finally:
+            with self._lock:
+                self._revalidating_keys.discard(key)
+
+    def get_data_revalidating(self, key, fetch: Callable[[], object]):
+        """
+        Gets data from the cache, calling fetch for it when it is missing
+
+        Expired data is fetched again right away, unless the cache is in stale while revalidate mode,
+        then the expired data is returned and a single background refresh is scheduled instead,
+        data older than the hard timeout is always fetched again right away
+
+        Threads missing a key that is already being fetched wait for that fetch rather than repeating it
+        """
+        with self._lock:
+            if key in self._keys_to_data:
+                added_time = self._keys_added[key]
+
+                if key not in self._stale_keys and not CD.time_has_passed(
+                    added_time + self._timeout
+                ):
+                    self._hits += 1
+                    self._touch_key(key)
+
+                    return self._get_hot_unsafe(key)
+
+                if self._stale_while_revalidate and (
+                    self._hard_timeout is None
+                    or not CD.time_has_passed(added_time + self._hard_timeout)
+                ):
+                    self._hits += 1
+                    self._touch_key(key)
+
+                    if key not in self._revalidating_keys:
+                        try:
+                            self._scheduler(0, self._revalidate, key, fetch)
+
+                            self._revalidating_keys.add(key)
+
+                        except Exception as e:
+                            logging.warning(f"Could not schedule refreshing {key}: {e}")
+
+                    return self._get_hot_unsafe(key)
+
+            self._misses += 1
+
+            flight = self._fetching_keys.get(key, None)
+
+            is_fetching = flight is None
+
+            if is_fetching:
+                flight = self._fetching_keys[key] = Fetch_In_Flight()
+
+        if not is_fetching:
+            flight.done.wait()
+
+            # the other threads get the same failure, rather than all trying again at once
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.data
+
+        try:
+            data = fetch()
+
+            if data is not None:
+                self.add_data(key, data, True)
+
+            flight.data = data
+
+            return data
+
+        except BaseException as e:
+            flight.error = e
+
+            raise
+
+        finally:
+            with self._lock:
+                self._fetching_keys.pop(key, None)
+
+            flight.done.set()
 
     def get_data_unsafe(self, key, remove=False):
         if key not in self._keys_to_data:
+            self._misses += 1
             raise CE.Cache_Lookup_Exception(f"Cache error! Looking for {key}, but it was missing.")
 
-        data_added_time = self._keys_fifo[key]
+        data_added_time = self._keys_added[key]
 
         if CD.time_has_passed(data_added_time + self._timeout):
+            self._misses += 1
             raise CE.Cache_Expired_Exception(f"Cache error! Data for {key} has expired.")
 
-        _ = self._keys_to_data[key]
+        self._hits += 1
+
+        self._touch_key(key)
+
+        _ = self._get_hot_unsafe(key)
 
         if remove:
             self.delete_data_unsafe(key)
@@ -193,18 +829,25 @@ class Expiring_Data_Cache(Data_Cache):
         Throws Cache_Expired_Exception
         """
         if key in self._keys_to_data:
-            data_added_time = self._keys_fifo[key]
+            data_added_time = self._keys_added[key]
 
             if CD.time_has_passed(data_added_time + self._timeout):
+                self._misses += 1
                 raise CE.Cache_Expired_Exception(f"Cache error! Data for {key} has expired.")
 
-            _ = self._keys_to_data[key]
+            self._hits += 1
+
+            self._touch_key(key)
+
+            _ = self._get_hot_unsafe(key)
 
             if remove:
                 self.delete_data_unsafe(key)
 
             return _
 
+        self._misses += 1
+
         return None
 
     def get_if_has_data(self, key, remove=False):
@@ -221,18 +864,25 @@ class Expiring_Data_Cache(Data_Cache):
         Gets data if it exists in the cache and has not expired without locking
         """
         if key in self._keys_to_data:
-            data_added_time = self._keys_fifo[key]
+            data_added_time = self._keys_added[key]
 
             if CD.time_has_passed(data_added_time + self._timeout):
+                self._misses += 1
                 return None
 
-            _ = self._keys_to_data[key]
+            self._hits += 1
+
+            self._touch_key(key)
+
+            _ = self._get_hot_unsafe(key)
 
             if remove:
                 self.delete_data_unsafe(key)
 
             return _
 
+        self._misses += 1
+
         return None
 
     def get_if_has_non_expired_data(self, key, remove=False):
@@ -242,11 +892,427 @@ class Expiring_Data_Cache(Data_Cache):
         with self._lock:
             return self.get_if_has_non_expired_data_unsafe(key, remove)
 
+    def get_expiry_time_unsafe(self, key) -> int | None:
+        return self._keys_added[key] + self._timeout
+
     def has_non_expired_data_unsafe(self, key):
-        return key in self._keys_to_data and not CD.time_has_passed(
-            self._keys_fifo[key] + self._timeout
+        return (
+            key in self._keys_to_data
+            and key not in self._stale_keys
+            and not CD.time_has_passed(self._keys_added[key] + self._timeout)
         )
 
     def has_non_expired_data(self, key):
         with self._lock:
             return self.has_non_expired_data_unsafe(key)
+
+
+class Sharded_Data_Cache(object):
+    """
+    Data_Cache split into stripes by key hash, each with its own lock, so threads working on different
+    keys do not wait on each other
+
+    Entries frozen with freeze_data can not change anymore, they are read without taking any lock until
+    they are replaced, removed, marked stale or expire, the hit counts of those reads are approximate,
+    the stripes are told about those reads, so frozen entries are not compressed or evicted as idle
+
+    An expired frozen entry is read through its stripe again, so it is refreshed like any other entry
+    """
+
+    def __init__(
+        self,
+        name: str,
+        stripe_count: int = 16,
+        cache_class: type[Data_Cache] = Data_Cache,
+        timeout: int = 1200,
+        max_bytes: int | None = None,
+        **kwargs,
+    ):
+        self._name: str = name
+
+        # key -> (data, when it expires or None) of the frozen entries,
+        # only changed under the lock of the stripe of the key
+        self._frozen: dict = {}
+        self._frozen_hits: int = 0
+
+        stripe_max_bytes = None if max_bytes is None else max(1, max_bytes // stripe_count)
+
+        self._stripes: list[Data_Cache] = [
+            cache_class(
+                f"{name} {i}",
+                timeout,
+                max_bytes=stripe_max_bytes,
+                invalidation_listener=self._thaw_unsafe,
+                **kwargs,
+            )
+            for i in range(stripe_count)
+        ]
+
+    def __len__(self):
+        return sum(len(stripe) for stripe in self._stripes)
+
+    def _get_stripe(self, key) -> Data_Cache:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def _thaw_unsafe(self, key):
+        self._frozen.pop(key, None)
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_stripe_count(self) -> int:
+        return len(self._stripes)
+
+    def get_stats(self) -> dict:
+        stats = {
+            "name": self._name,
+            "entries": 0,
+            "cold": 0,
+            "bytes": 0,
+            "max_bytes": None,
+            "hits": self._frozen_hits,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+        for stripe in self._stripes:
+            stripe_stats = stripe.get_stats()
+
+            for stat in ("entries", "cold", "bytes", "hits", "misses", "evictions"):
+                stats[stat] += stripe_stats[stat]
+
+            if stripe_stats["max_bytes"] is not None:
+                stats["max_bytes"] = (stats["max_bytes"] or 0) + stripe_stats["max_bytes"]
+
+        return stats
+
+    def reset_stats(self):
+        self._frozen_hits = 0
+
+        for stripe in self._stripes:
+            stripe.reset_stats()
+
+    def get_total_bytes(self) -> int:
+        return sum(stripe.get_total_bytes() for stripe in self._stripes)
+
+    def get_max_bytes(self) -> int | None:
+        return self.get_stats()["max_bytes"]
+
+    def set_max_bytes(self, max_bytes: int | None):
+        stripe_max_bytes = None if max_bytes is None else max(1, max_bytes // len(self._stripes))
+
+        for stripe in self._stripes:
+            stripe.set_max_bytes(stripe_max_bytes)
+
+    def clear(self):
+        for stripe in self._stripes:
+            with stripe.get_lock():
+                for key in list(self._frozen):
+                    if self._get_stripe(key) is stripe:
+                        self._frozen.pop(key, None)
+
+            stripe.clear()
+
+    def add_data(self, key, data, replace=False):
+        self._get_stripe(key).add_data(key, data, replace)
+
+    def freeze_data(self, key) -> bool:
+        """
+        Marks the data of key as never changing, so it is read without locking, returns False if there is
+        no data for key
+        """
+        stripe = self._get_stripe(key)
+
+        with stripe.get_lock():
+            if not stripe.has_data_unsafe(key):
+                return False
+
+            # only fresh data is worth freezing
+            if isinstance(stripe, Expiring_Data_Cache):
+                fresh = stripe.has_non_expired_data_unsafe(key)
+            else:
+                fresh = True
+
+            if not fresh:
+                return False
+
+            self._frozen[key] = (
+                stripe.get_if_has_data_unsafe(key),
+                stripe.get_expiry_time_unsafe(key),
+            )
+
+            return True
+
+    def is_frozen(self, key) -> bool:
+        return key in self._frozen
+
+    def delete_data(self, key):
+        self._get_stripe(key).delete_data(key)
+
+    def delete_data_where(self, predicate: Callable[[object], bool]) -> int:
+        return sum(stripe.delete_data_where(predicate) for stripe in self._stripes)
+
+    def _get_frozen(self, key):
+        # dict.get is atomic, so this needs no lock
+        frozen = self._frozen.get(key, None)
+
+        if frozen is None:
+            return None
+
+        (data, expiry_time) = frozen
+
+        # the stripe serves it from here on, refreshing it like any other expired entry
+        if expiry_time is not None and CD.time_has_passed(expiry_time):
+            return None
+
+        self._frozen_hits += 1
+
+        self._get_stripe(key).record_unlocked_read(key)
+
+        return data
+
+    def get_data(self, key, remove=False):
+        if not remove:
+            data = self._get_frozen(key)
+
+            if data is not None:
+                return data
+
+        return self._get_stripe(key).get_data(key, remove)
+
+    def get_if_has_data(self, key, remove=False):
+        if not remove:
+            data = self._get_frozen(key)
+
+            if data is not None:
+                return data
+
+        return self._get_stripe(key).get_if_has_data(key, remove)
+
+    def get_if_has_non_expired_data(self, key, remove=False):
+        if not remove:
+            data = self._get_frozen(key)
+
+            if data is not None:
+                return data
+
+        return self._get_stripe(key).get_if_has_non_expired_data(key, remove)
+
+    def get_data_revalidating(self, key, fetch: Callable[[], object]):
+        data = self._get_frozen(key)
+
+        if data is not None:
+            return data
+
+        return self._get_stripe(key).get_data_revalidating(key, fetch)
+
+    def has_data(self, key):
+        return key in self._frozen or self._get_stripe(key).has_data(key)
+
+    def mark_stale(self, key):
+        self._get_stripe(key).mark_stale(key)
+
+    def mark_stale_where(self, predicate: Callable[[object], bool]) -> int:
+        return sum(stripe.mark_stale_where(predicate) for stripe in self._stripes)
+
+    def maintain_cache(self):
+        for stripe in self._stripes:
+            stripe.maintain_cache()
+
+    def set_timeout(self, timeout: int):
+        for stripe in self._stripes:
+            # the frozen entries expire by the old timeout
+            with stripe.get_lock():
+                for key in list(self._frozen):
+                    if self._get_stripe(key) is stripe:
+                        self._frozen.pop(key, None)
+
+            stripe.set_timeout(timeout)
+
+
+def make_argument_key(args: tuple, kwargs: dict) -> tuple:
+    """
+    Turns call arguments into a cache key, lists, sets and dicts are turned into tuples
+
+    Throws TypeError if an argument can not be hashed
+    """
+
+    def freeze(value):
+        if isinstance(value, (list, tuple)):
+            return tuple(freeze(v) for v in value)
+
+        if isinstance(value, (set, frozenset)):
+            return frozenset(freeze(v) for v in value)
+
+        if isinstance(value, dict):
+            return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+
+        hash(value)
+
+        return value
+
+    if not kwargs:
+        return freeze(args)
+
+    return (freeze(args), freeze(kwargs))
+
+
+class Memoized_Method(object):
+    """
+    Caches what a method returns for every set of arguments, see memoize_method
+
+    The first time it is looked up on an instance, the instance gets its own Memoized_Method_Binding,
+    which is stored on the instance so later lookups go straight to it
+    """
+
+    def __init__(
+        self,
+        method: Callable,
+        timeout: int,
+        stale_while_revalidate: bool = False,
+        hard_timeout: int | None = None,
+        max_bytes: int | None = None,
+        invalidated_by: tuple[str, ...] = (),
+    ):
+        functools.update_wrapper(self, method)
+
+        self.method: Callable = method
+        self.name: str = method.__name__
+
+        self.timeout: int = timeout
+        self.stale_while_revalidate: bool = stale_while_revalidate
+        self.hard_timeout: int | None = hard_timeout
+        self.max_bytes: int | None = max_bytes
+        self.invalidated_by: tuple[str, ...] = tuple(invalidated_by)
+
+        self._lock = threading.Lock()
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        with self._lock:
+            binding = instance.__dict__.get(self.name, None)
+
+            if binding is None:
+                binding = instance.__dict__[self.name] = Memoized_Method_Binding(self, instance)
+
+        return binding
+
+
+class Memoized_Method_Binding(object):
+    """
+    A Memoized_Method of one instance, with the cache of its results
+
+    The cache is registered with instance.register_cache, refreshed in the background through
+    instance.call_later, and marked stale by instance.add_metadata_delta_listener deltas, when the
+    instance has them
+    """
+
+    def __init__(self, memoized: Memoized_Method, instance):
+        functools.update_wrapper(self, memoized.method)
+
+        self._memoized: Memoized_Method = memoized
+        self._instance = instance
+
+        self._cache = Expiring_Data_Cache(
+            memoized.name,
+            memoized.timeout,
+            stale_while_revalidate=memoized.stale_while_revalidate,
+            hard_timeout=memoized.hard_timeout,
+            scheduler=getattr(instance, "call_later", None),
+            max_bytes=memoized.max_bytes,
+        )
+
+        register_cache = getattr(instance, "register_cache", None)
+
+        if register_cache is not None:
+            register_cache(self._cache)
+
+        add_listener = getattr(instance, "add_metadata_delta_listener", None)
+
+        if memoized.invalidated_by and add_listener is not None:
+            add_listener(self._metadata_delta_received)
+
+    def __call__(self, *args, skip_cache: bool = False, **kwargs):
+        """
+        Calls the method, or gets what it returned for these arguments from the cache,
+        None is never cached
+        """
+        method = self._memoized.method
+        instance = self._instance
+
+        try:
+            key = make_argument_key(args, kwargs)
+
+        except TypeError:
+            return method(instance, *args, **kwargs)
+
+        if skip_cache:
+            data = method(instance, *args, **kwargs)
+
+            if data is not None:
+                self._cache.add_data(key, data, True)
+
+            return data
+
+        return self._cache.get_data_revalidating(key, lambda: method(instance, *args, **kwargs))
+
+    def _metadata_delta_received(self, maindata: dict, removed_hashes: list[str]):
+        if any(maindata.get(section, None) for section in self._memoized.invalidated_by):
+            self.invalidate_all(stale=True)
+
+    def get_cache(self) -> Expiring_Data_Cache:
+        return self._cache
+
+    def invalidate(self, *args, **kwargs):
+        """
+        Drops what was cached for these arguments, the next call fetches it again
+        """
+        try:
+            self._cache.delete_data(make_argument_key(args, kwargs))
+
+        except TypeError:
+            pass
+
+    def invalidate_all(self, stale: bool = False):
+        """
+        Drops everything that was cached, or with stale, keeps it to be served while it is refreshed
+        """
+        if stale:
+            self._cache.mark_stale_where(lambda key: True)
+
+        else:
+            self._cache.clear()
+
+
+def memoize_method(
+    timeout: int,
+    stale_while_revalidate: bool = False,
+    hard_timeout: int | None = None,
+    max_bytes: int | None = None,
+    invalidated_by: tuple[str, ...] = (),
+) -> Callable[[Callable], Memoized_Method]:
+    """
+    Decorator that caches what a method returns, per arguments, for timeout seconds
+
+    Only one thread fetches a missing result while the others wait for it, results that are not None
+    are cached, the decorated method takes an extra skip_cache keyword to fetch again regardless
+
+    With stale_while_revalidate, expired results keep being returned while one background refresh runs,
+    invalidated_by names sync/maindata sections that mark every cached result stale when a delta has them
+
+        @Cache.memoize_method(CC.CLIENT_PREFERENCES_CACHE_TIME_SECONDS, stale_while_revalidate=True)
+        def get_client_preferences(self):
+            return self.qbittorrent.app_preferences()
+    """
+
+    def decorator(method: Callable) -> Memoized_Method:
+        return Memoized_Method(
+            method, timeout, stale_while_revalidate, hard_timeout, max_bytes, invalidated_by
+        )
+
+    return decorator
@@ -18,6 +18,7 @@ BRAND = "qBittorrent Remote GUI"
 CONFIG_DIRECTORY = os.path.join(pathlib.Path.home(), ".config", "qBittorrent_Remote_GUI")
 CONFIG_CLIENT_ID_FILE = os.path.join(CONFIG_DIRECTORY, "client_id")
 CONFIG_CLIENT_SETTINGS = os.path.join(CONFIG_DIRECTORY, "settings.json")
+CONFIG_STATE_SNAPSHOT = os.path.join(CONFIG_DIRECTORY, "torrents_snapshot.json.gz")
 
 # profile mode is designed if you want to share a remote client with multiple pc / people
 # the idea is that each gui would have it's own 'profile' where only it's torrents show up
@@ -35,10 +36,43 @@ USE_TORRENT_ROOT_FOLDER = False
 TORRENT_ROOT_FOLDER = "/mnt"
 PUBLIC_TORRENT_ROOT_FOLDER = "/mnt/public"
 
+# torrent file lists are refreshed in the background once they are this old
 TORRENT_CACHE_TIME_SECONDS = 3
+# past this they are not served at all, but fetched again right away
+TORRENT_FILES_CACHE_HARD_TIMEOUT_SECONDS = 60 * 60
+# file lists that were not looked at for this long are kept compressed until they are again
+TORRENT_FILES_CACHE_COLD_AFTER_SECONDS = 2 * 60
+
+# memoized controller getters, see CoreCaches.memoize_method
+CLIENT_PREFERENCES_CACHE_TIME_SECONDS = 60
 
 
 TORRENT_METADATA_SYNC_RATE_MS = 5 * 1000
+# until the first sync/maindata update arrives the sync runs this often, so the saved list is replaced soon
+TORRENT_METADATA_BOOT_SYNC_RATE_MS = 250
+
+# the torrent list is saved this often and on exit, so the next launch can show it right away
+STATE_SNAPSHOT_PERIOD_SECONDS = 5 * 60
+
+# estimated byte budgets, past them the least recently used entries are dropped
+QBITTORRENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+TORRENT_FILES_CACHE_MAX_BYTES = 256 * 1024 * 1024
+TORRENT_TREE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# caches used from many threads are split into this many separately locked stripes
+CACHE_STRIPE_COUNT = 16
+
+# every registered cache drops its timed out entries this often
+CACHE_MAINTENANCE_PERIOD_SECONDS = 60
+
+# the torrent list is loaded this many torrents at a time as it is scrolled
+TORRENT_PAGE_SIZE = 500
+# pages asked for without a sort are in this order, which puts new torrents at the end
+TORRENT_PAGE_SORT = "added_on"
+
+# the file path index fetches the file lists of this many torrents per run in the background
+FILE_PATH_INDEX_PERIOD_SECONDS = 30
+FILE_PATH_INDEX_TORRENTS_PER_RUN = 25
 
 
 TORRENT_PAUSED_PRIORITY = 1
@@ -49,6 +83,12 @@ TORRENT_FILE_PRIORITY_NORMAL = 1
 TORRENT_FILE_PRIORITY_HIGH = 6
 TORRENT_FILE_PRIORITY_MAXIMUM = 7
 
+# file priority changes are collected this long before being sent
+FILE_PRIORITY_TRANSACTION_DELAY_SECONDS = 2
+# the file ids go in the request body, so very large selections are split up
+FILE_PRIORITY_TRANSACTION_BATCH_SIZE = 2000
+FILE_PRIORITY_TRANSACTION_MAX_RETRIES = 3
+
 # see https://en.wikipedia.org/wiki/Magnet_URI_scheme
 MAGNET_LINK_REGEX = re.compile(
     r"(magnet:\?xt=urn:btih:[a-zA-Z0-9]+(?:&(?:xt|dn|xl|tr|ws|as|xs|kt|mt|so|x\.pe)=[^\s]+)*)"
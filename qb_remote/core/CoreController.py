@@ -5,8 +5,9 @@ import traceback
 import time
 import threading
 import collections
+import contextlib
 import random
-from typing import Callable
+from typing import Callable, Iterable
 
 
 import qbittorrentapi
@@ -18,12 +19,27 @@ from . import CoreExceptions as CE
 from . import CoreData as CD
 from . import CoreConstants as CC
 from . import CoreCaches as Cache
+from . import CoreStateStore
+from . import CoreFileSearch
+from . import CoreFileTree  # registers the cache sizers of file lists and trees
 from . import CoreThreading
+from . import CoreTransactions
 
 class ClientControllerUser():
 
     CONTROLLER:"ClientController" = None
 
+
+def get_cache_key_torrent_hash(key) -> str | None:
+    """
+    Gets the torrent hash of a cache key, keys for one torrent are the hash or end in _<hash>
+    """
+    if not isinstance(key, str):
+        return None
+
+    return key.rsplit("_", 1)[-1]
+
+
 class ClientController(ClientControllerUser):
     def __init__(self):
 
@@ -32,14 +48,43 @@ class ClientController(ClientControllerUser):
         self._name: str = CC.BRAND
 
         self._daemon_jobs: dict[str, CoreThreading.Schedulable_Job] = {}
-        self._caches:list[Cache.Data_Cache] = [] 
-        self._expiring_caches:list[Cache.Expiring_Data_Cache] = [] 
+        # cache name -> cache, every registered cache is maintained by a daemon job
+        self._caches: dict[str, Cache.Data_Cache | Cache.Sharded_Data_Cache] = {}
 
         self._call_to_threads: list[CoreThreading.Thread_Call_To_Thread] = []
 
 
-        self.qbittorrent_cache = Cache.Data_Cache("qbittorrent")
-        self._caches.append(self.qbittorrent_cache)
+        self.qbittorrent_cache = Cache.Data_Cache(
+            "qbittorrent", max_bytes=CC.QBITTORRENT_CACHE_MAX_BYTES
+        )
+        self.register_cache(self.qbittorrent_cache)
+
+        # file lists are served while a newer one is fetched, so selecting a torrent never waits on it,
+        # they are read from the gui, workers and the file path index at once, hence the stripes
+        self.torrent_files_cache = Cache.Sharded_Data_Cache(
+            "torrent files",
+            CC.CACHE_STRIPE_COUNT,
+            Cache.Expiring_Data_Cache,
+            CC.TORRENT_CACHE_TIME_SECONDS,
+            stale_while_revalidate=True,
+            hard_timeout=CC.TORRENT_FILES_CACHE_HARD_TIMEOUT_SECONDS,
+            scheduler=self.call_later,
+            max_bytes=CC.TORRENT_FILES_CACHE_MAX_BYTES,
+            cold_after=CC.TORRENT_FILES_CACHE_COLD_AFTER_SECONDS,
+        )
+        self.register_cache(self.torrent_files_cache)
+
+        # called with every sync/maindata delta and the hashes it removed, after the store has it
+        self._metadata_delta_listeners: list[Callable[[SyncMainDataDictionary, list[str]], None]] = []
+
+        self.add_metadata_delta_listener(self._invalidate_caches)
+
+        self.torrent_state_store = CoreStateStore.Torrent_State_Store()
+
+        self.file_path_index = CoreFileSearch.File_Path_Index()
+
+        self.file_priority_transactions = CoreTransactions.File_Priority_Transactions(self)
+        self.file_priority_transactions.add_listener(self._file_priorities_committed)
 
         self._fast_job_scheduler:CoreThreading.Job_Scheduler = None
         self._slow_job_scheduler:CoreThreading.Job_Scheduler = None
@@ -64,6 +109,14 @@ class ClientController(ClientControllerUser):
 
         self._doing_fast_exit = False
 
+        # phase name -> (seconds after start it began, seconds it took), see boot_phase
+        self._boot_phases_lock = threading.Lock()
+        self._boot_phases: dict[str, tuple[float, float]] = {}
+
+        # the first sync/maindata update, fetched during boot and handed out by get_metadata_delta
+        self._metadata_delta_lock = threading.Lock()
+        self._prefetched_metadata_delta: SyncMainDataDictionary = None
+
         self.client_id = None
 
 
@@ -165,10 +218,29 @@ class ClientController(ClientControllerUser):
 
         return job
 
+    def register_cache(self, cache: Cache.Data_Cache | Cache.Sharded_Data_Cache):
+        """
+        Adds a cache to the ones that are maintained and reported by get_cache_stats
+        """
+        self._caches[cache.get_name()] = cache
+
+    def get_cache_stats(self) -> list[dict]:
+        """
+        Gets Data_Cache.get_stats of every registered cache
+        """
+        return [cache.get_stats() for cache in list(self._caches.values())]
+
     def clear_caches(self):
         for cache in list(self._caches.values()):
             cache.clear()
 
+    def maintain_caches(self):
+        """
+        Drops the timed out entries of every registered cache
+        """
+        for cache in list(self._caches.values()):
+            cache.maintain_cache()
+
     def is_doing_fast_exit(self) -> bool:
         return self._doing_fast_exit
 
@@ -204,7 +276,23 @@ class ClientController(ClientControllerUser):
         job = self.call_repeating(10.0, 5*60.0, self.maintain_memory_fast)
         self._daemon_jobs["maintain_memory_fast"] = job
 
-        job = self.call_later(10, self.post_boot)
+        job = self.call_repeating(
+            15.0, CC.FILE_PATH_INDEX_PERIOD_SECONDS, self.maintain_file_path_index
+        )
+        self._daemon_jobs["maintain_file_path_index"] = job
+
+        job = self.call_repeating(20.0, CC.CACHE_MAINTENANCE_PERIOD_SECONDS, self.maintain_caches)
+        self._daemon_jobs["maintain_caches"] = job
+
+        job = self.call_repeating(
+            CC.STATE_SNAPSHOT_PERIOD_SECONDS,
+            CC.STATE_SNAPSHOT_PERIOD_SECONDS,
+            self.save_state_snapshot,
+        )
+        self._daemon_jobs["save_state_snapshot"] = job
+
+        # the saved torrent list is shown in the meantime, so there is no reason to wait
+        job = self.call_later(0, self.post_boot)
 
     def maintain_memory_fast(self):
 
@@ -317,13 +405,22 @@ class ClientController(ClientControllerUser):
             try:
                 logging.info(f"Trying to connect to qBittorrent at {self.qbittorrent.host}:{self.qbittorrent.port}")
                 self.qbittorrent.auth_log_in()
-                logging.info(CD.get_client_build_information(self.qbittorrent))
                 self.qbittorrent_initialized = True
             except qbittorrentapi.LoginFailed as e:
                 logging.warn(e)
             except qbittorrentapi.APIConnectionError as e:
                 logging.error(e)
 
+        # three more requests, nothing waits on them
+        if self.qbittorrent_initialized:
+            self.call_to_thread(self.log_client_build_information)
+
+    def log_client_build_information(self):
+        try:
+            logging.info(CD.get_client_build_information(self.qbittorrent))
+
+        except (qbittorrentapi.APIError, qbittorrentapi.APIConnectionError) as e:
+            logging.warning(f"Could not get the qBittorrent build information: {e}")
 
 
     def shutdown_qbittorrent_connection(self):
@@ -333,11 +430,111 @@ class ClientController(ClientControllerUser):
             self.qbittorrent.auth_log_out()
             self.qbittorrent_initialized = False
 
+    def get_server_name(self) -> str:
+        return f"{self.get_qbittorrent_setting('host')}:{self.get_qbittorrent_setting('port')}"
+
+    def save_state_snapshot(self):
+        """
+        Saves the state store to CC.CONFIG_STATE_SNAPSHOT, once a full sync/maindata update has filled it
+        """
+        store = self.torrent_state_store
+
+        # anything else is the snapshot that was loaded, or only some of the torrents
+        if store.is_stale() or not store.has_categories_and_tags():
+            return
+
+        # only what the torrent list can show, in profile mode the torrents of this client
+        snapshot = store.get_snapshot(self.get_filtered_hash_set())
+        snapshot["server"] = self.get_server_name()
+        snapshot["saved"] = CD.time_now()
+
+        CD.save_state_snapshot(snapshot)
+
+        logging.debug(f"Saved a state snapshot of {len(snapshot['columns'][0])} torrents")
+
+    def load_state_snapshot(self) -> bool:
+        """
+        Fills the state store from CC.CONFIG_STATE_SNAPSHOT if it is of the server in the settings,
+        the store is stale until the first full sync/maindata update
+        """
+        try:
+            snapshot = CD.load_state_snapshot()
+
+            if snapshot is None or snapshot.get("server", None) != self.get_server_name():
+                return False
+
+            count = self.torrent_state_store.load_snapshot(snapshot)
+
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Could not load the state snapshot: {e}")
+            return False
+
+        self.set_timestamp("state_snapshot", snapshot.get("saved", 0))
+
+        logging.info(f"Loaded a state snapshot of {count} torrents")
+
+        return True
+
+    @contextlib.contextmanager
+    def boot_phase(self, name: str):
+        """
+        Times a startup phase, it is logged and kept for get_boot_phases
+        """
+        started = CD.time_now_precise()
+
+        try:
+            yield
+
+        finally:
+            self.record_boot_phase(name, started)
+
+    def record_boot_phase(self, name: str, started: float = CC.START_TIME_PRECISE):
+        """
+        Records a startup phase that began at started, a time_now_precise, and ends now,
+        by default it is timed from the start of the program
+        """
+        ended = CD.time_now_precise()
+
+        with self._boot_phases_lock:
+            self._boot_phases[name] = (started - CC.START_TIME_PRECISE, ended - started)
+
+        logging.info(
+            f"Boot phase {name} took {(ended - started) * 1000:.0f} ms, "
+            f"done {(ended - CC.START_TIME_PRECISE) * 1000:.0f} ms after start"
+        )
+
+    def get_boot_phases(self) -> dict[str, tuple[float, float]]:
+        """
+        Gets phase name -> (seconds after start it began, seconds it took), in the order they ended
+        """
+        with self._boot_phases_lock:
+            return dict(self._boot_phases)
+
+    def _run_boot_phase(self, name: str, func: Callable):
+        with self.boot_phase(name):
+            try:
+                func()
+
+            except Exception as e:
+                logging.warning(f"Boot phase {name} failed: {e}")
+
     def post_boot(self):
+        """
+        Logs in, then gets the build information, the preferences and the first sync/maindata update
+        at the same time, all while the window is being built
+        """
+        if not self.get_qbittorrent_setting("autoconnect"):
+            return
 
-        if self.get_qbittorrent_setting("autoconnect"):
+        with self.boot_phase("login"):
             self.init_qbittorrent_connection()
 
+        if not self.qbittorrent_initialized:
+            return
+
+        self.call_to_thread(self._run_boot_phase, "preferences", self.get_client_preferences)
+        self.call_to_thread(self._run_boot_phase, "first sync", self.prefetch_metadata_delta)
+
     def boot_everything_base(self):
         # try:
 
@@ -349,18 +546,23 @@ class ClientController(ClientControllerUser):
         #     return
 
         try:
-            self.init_model()
+            # post_boot connects right away, so the settings have to be in before the jobs start
+            with self.boot_phase("settings"):
+                CD.load_settings(self.settings)
+
+            with self.boot_phase("state snapshot"):
+                self.load_state_snapshot()
+
+            with self.boot_phase("model"):
+                self.init_model()
 
-            self.init_view()
+                self.init_view()
 
             if CC.IS_PROFILE_MODE:
                 self.create_client_tag()
 
             self._is_booted = True
 
-            CD.load_settings(self.settings)
-
-
         except CE.Shutdown_Exception as e:
             logging.error(e)
 
@@ -373,6 +575,11 @@ class ClientController(ClientControllerUser):
         try:
             CG.started_shutdown = True
 
+            try:
+                self.file_priority_transactions.commit_all()
+            except Exception as e:
+                logging.error(e)
+
             try:
                 self.shutdown_qbittorrent_connection()
             except:
@@ -383,6 +590,11 @@ class ClientController(ClientControllerUser):
             except Exception as e:
                 logging.error(e)
 
+            try:
+                self.save_state_snapshot()
+            except Exception as e:
+                logging.error(e)
+
             self.shutdown_view()
 
             self.shutdown_model()
@@ -399,31 +611,111 @@ class ClientController(ClientControllerUser):
     ### Torrent Stuff
 
 
+    def prefetch_metadata_delta(self):
+        """
+        Fetches and applies the next sync/maindata update ahead of time, off the gui thread,
+        get_metadata_delta hands it out next
+        """
+        with self._metadata_delta_lock:
+            if self._prefetched_metadata_delta is not None or not self.qbittorrent_initialized:
+                return
+
+            updated_metadata = self.qbittorrent.sync.maindata.delta()
+
+            self._apply_metadata_delta(updated_metadata)
+
+            self._prefetched_metadata_delta = updated_metadata
+
     def get_metadata_delta(self):
         if not self.qbittorrent_initialized:
             return
-        updated_metadata = self.qbittorrent.sync.maindata.delta()
 
-        return updated_metadata
+        # while a prefetch is running its update is handed out on a later call, rather than blocking
+        if not self._metadata_delta_lock.acquire(blocking=False):
+            return
+
+        try:
+            updated_metadata = self._prefetched_metadata_delta
+
+            if updated_metadata is not None:
+                self._prefetched_metadata_delta = None
+
+                return updated_metadata
+
+            updated_metadata = self.qbittorrent.sync.maindata.delta()
+
+            self._apply_metadata_delta(updated_metadata)
+
+            return updated_metadata
+
+        finally:
+            self._metadata_delta_lock.release()
+
+    def _apply_metadata_delta(self, updated_metadata: SyncMainDataDictionary):
+        _, _, removed = self.torrent_state_store.apply_maindata(updated_metadata)
+
+        self.file_path_index.remove_torrents(removed)
+
+        for listener in list(self._metadata_delta_listeners):
+            try:
+                listener(updated_metadata, removed)
+
+            except Exception as e:
+                logging.error(e)
+
+    def add_metadata_delta_listener(
+        self, listener: Callable[[SyncMainDataDictionary, list[str]], None]
+    ):
+        """
+        Adds a callable that is given every sync/maindata delta and the torrent hashes it removed
+        """
+        self._metadata_delta_listeners.append(listener)
+
+    def _invalidate_caches(self, maindata: SyncMainDataDictionary, removed_hashes: list[str]):
+        # anything keyed by a removed torrent is of no use anymore
+        if removed_hashes:
+            removed = set(removed_hashes)
+
+            for cache in list(self._caches.values()):
+                cache.delete_data_where(lambda key: get_cache_key_torrent_hash(key) in removed)
+
+        # the file progress moves along with the torrent, the files themselves stay the same,
+        # so the cached tree only has its values refreshed when the new list comes in
+        for torrent_hash, values in (maindata.get("torrents", None) or {}).items():
+            if "progress" in values or "state" in values:
+                self.torrent_files_cache.mark_stale(f"torrent_files_{torrent_hash}")
 
 
     def get_torrents_files(self, torrent_hash : str):
+        """
+        Gets the file list of a torrent,
+
+        Once the cached list is a few seconds old it is still returned, but refreshed in the background
+        """
         if not self.qbittorrent_initialized:
             return
 
         CACHE_KEY = f"torrent_files_{torrent_hash}"
-        CACHE = self.qbittorrent_cache
+        CACHE = self.torrent_files_cache
 
-        data = CACHE.get_if_has_data(CACHE_KEY)
+        data = CACHE.get_data_revalidating(
+            CACHE_KEY, lambda: self._fetch_torrents_files(torrent_hash)
+        )
 
-        if data:
-            logging.debug(f"Cache hit for torrent hash: {torrent_hash}")
-            return data
+        # the files of a finished torrent stop changing, so they can be read without locking
+        if data is not None and not CACHE.is_frozen(CACHE_KEY):
+            torrent = self.torrent_state_store.get_torrent(torrent_hash)
+
+            if torrent is not None and torrent.get("progress", 0) >= 1:
+                CACHE.freeze_data(CACHE_KEY)
 
+        return data
+
+    def _fetch_torrents_files(self, torrent_hash: str):
         try:
-            data = self.CONTROLLER.qbittorrent.torrents_files(torrent_hash)
+            data = self.qbittorrent.torrents_files(torrent_hash)
 
-            CACHE.add_data(CACHE_KEY, data, True)
+            self.file_path_index.add_torrent_files(torrent_hash, data)
 
             return data
 
@@ -432,77 +724,126 @@ class ClientController(ClientControllerUser):
 
 
 
-    def get_torrents(self, skip_cache=False, cache_key=None, **kwargs):
+    def maintain_file_path_index(self):
         """
-        Gets all torrent files, either from a cache or fresh,
-
-        Cache expires ever 120 seconds
+        Indexes the files of a few more torrents that are not in the file path index yet
         """
-        if not self.qbittorrent_initialized:
+        if not self.qbittorrent_initialized or not self.is_good_time_to_start_background_work():
             return
 
-        if skip_cache or (kwargs and cache_key is None):
+        index = self.file_path_index
 
-            logging.debug(
-                f"Custom call to torrent_info, skipping cache. kwargs = {kwargs}, skip_cache = {skip_cache}"
-            )
+        # in profile mode only the torrents of this client are searched
+        hashes = self.filter_torrent_hashes()
+        wanted = set(hashes)
 
-            return self.qbittorrent.torrents_info(**kwargs)
+        # torrents can be gone from the store if a delta was missed, or have lost the client tag
+        index.remove_torrents([h for h in index.get_torrent_hashes() if h not in wanted])
 
-        CACHE = self.qbittorrent_cache
-        CACHE_KEY = cache_key or "torrents"
-        TIMESTAMP = "torrents_cache"
+        missing = [h for h in hashes if not index.has_torrent(h)]
 
-        data = CACHE.get_if_has_data(CACHE_KEY)
+        for torrent_hash in missing[: CC.FILE_PATH_INDEX_TORRENTS_PER_RUN]:
+            if CG.view_shutdown:
+                return
 
-        if not data or CD.time_has_passed(self.get_timestamp(TIMESTAMP) + 60):
+            torrent_files = self.torrent_files_cache.get_if_has_non_expired_data(
+                f"torrent_files_{torrent_hash}"
+            )
 
-            data = self.qbittorrent.torrents_info()
+            # crawled lists are not cached, they would push out the ones the user looked at,
+            # _fetch_torrents_files indexes what it gets, and an expired list is fetched again
+            if torrent_files is None:
+                self._fetch_torrents_files(torrent_hash)
 
-            CACHE.add_data(CACHE_KEY, data, True)
+            else:
+                index.add_torrent_files(torrent_hash, torrent_files)
 
-        return data
+        index.maintain()
 
-    def update_torrents_file_priority_transactional(
-        self, torrent_hash: str, file_id: int, priority: int
-    ):
-        """
-        Updates the torrents files priority after 2 seconds,
+        if missing:
+            logging.debug(f"File path index has {len(index)} paths, {len(missing)} torrents left")
 
-        All function calls for the given torrent in that time will be added to the transaction,
+    def get_torrents(self, **kwargs):
+        """
+        Gets the torrents from the server, kwargs are torrents_info filters, such as torrent_hashes,
 
-        After the 2 seconds all the files will be updated to reflect the final state of the transaction
+        This is never cached, the state store has what the sync/maindata deltas bring
         """
         if not self.qbittorrent_initialized:
             return
 
-        CACHE_KEY = f"file_priority_transaction_{torrent_hash}"
-        CACHE = self.qbittorrent_cache
+        data = self.qbittorrent.torrents_info(**kwargs)
+
+        if not kwargs:
+            self.torrent_state_store.set_torrents(data)
+
+        return data
+
+    def get_torrent_filters(self) -> dict:
+        """
+        Gets the torrents_info filters every torrent list request uses,
+
+        In profile mode only the torrents tagged with the client id are wanted
+        """
+        filters = {}
+
+        if CC.IS_PROFILE_MODE:
+            filters["tag"] = self.get_client_id()
+
+        return filters
 
+    def get_torrents_page(
+        self,
+        offset: int = 0,
+        limit: int = CC.TORRENT_PAGE_SIZE,
+        sort: str = CC.TORRENT_PAGE_SORT,
+        reverse: bool = False,
+        **filters,
+    ):
+        """
+        Gets one page of torrents, filtered, sorted and paged by qBittorrent rather than here
 
-        if CACHE.has_data(CACHE_KEY):
-            CACHE.get_data(CACHE_KEY)["file_ids"].append(file_id)
+        filters are torrents_info arguments, such as status_filter, category, tag and torrent_hashes,
+        they are added to get_torrent_filters
+        """
+        if not self.qbittorrent_initialized:
             return
 
+        kwargs = self.get_torrent_filters()
+        kwargs.update(filters)
 
-        CACHE.add_data(
-            CACHE_KEY, {"file_ids": [file_id], "priority": priority}, True
+        data = self.qbittorrent.torrents_info(
+            sort=sort, reverse=reverse, limit=limit, offset=offset, **kwargs
         )
 
-        def callback(cache_key, torrent_hash):
+        # a page is not every torrent, so it is merged into the store rather than replacing it
+        self.torrent_state_store.update_torrents({torrent["hash"]: torrent for torrent in data})
 
-            data = CACHE.get_if_has_data(cache_key, True)
+        return data
 
-            if not data:
-                return
+    def update_torrents_file_priority_transactional(
+        self, torrent_hash: str, file_ids: int | list[int], priority: int
+    ):
+        """
+        Updates the torrents files priority after 2 seconds,
 
-            logging.info(f"Updating torrent priority for {torrent_hash}")
+        All function calls for the given torrent in that time will be added to the transaction,
+        a file changed more than once only gets the last priority it was given
 
-            self.qbittorrent.torrents_file_priority(
-                torrent_hash, data["file_ids"], data["priority"]
-            )
+        See CoreTransactions.File_Priority_Transactions
+        """
+        if not self.qbittorrent_initialized:
+            return
+
+        if isinstance(file_ids, int):
+            file_ids = [file_ids]
 
-        self.call_later(2, callback, CACHE_KEY, torrent_hash)
+        self.file_priority_transactions.add(torrent_hash, file_ids, priority)
+
+    def _file_priorities_committed(self, torrent_hash: str, committed: dict, failed: dict):
+        # the cached file list still has the old priorities
+        if committed or failed:
+            self.torrent_files_cache.delete_data(f"torrent_files_{torrent_hash}")
 
     def set_torrents_paused(self, torrent_hash: list[str]):
 
@@ -538,42 +879,29 @@ class ClientController(ClientControllerUser):
         except Exception as e:
             logging.error(e)
 
-    def get_client_preferences(self, skip_cache=False):
+    @Cache.memoize_method(CC.CLIENT_PREFERENCES_CACHE_TIME_SECONDS, stale_while_revalidate=True)
+    def get_client_preferences(self):
         if not self.qbittorrent_initialized:
             return
 
-        TIMESTAMP = "update_pref_cache"
-        CACHE_KEY = "app_preferences"
-        CACHE = self.qbittorrent_cache
-
-        self.get_client_categories()
-
-        if skip_cache or CD.time_has_passed(self.get_timestamp(TIMESTAMP) + 60):
-            self.touch_timestamp(TIMESTAMP)
-
-            a = self.qbittorrent.app_preferences()
-
-            CACHE.add_data(CACHE_KEY, a, True)
-            return a
-
-        return CACHE.get_if_has_data(CACHE_KEY)
+        return self.qbittorrent.app_preferences()
 
     def get_client_categories(self, skip_cache=False):
+        """
+        Gets the categories, name -> {'name', 'savePath'}
+
+        They are kept up to date by the sync/maindata deltas, so they are only requested
+        when asked to skip the cache or before the first delta has arrived, and only once
+        """
         if not self.qbittorrent_initialized:
             return
 
-        TIMESTAMP = "update_cat_cache"
-        CACHE_KEY = "torrent_categories"
+        store = self.torrent_state_store
 
-        if skip_cache or CD.time_has_passed(self.get_timestamp(TIMESTAMP) + 30):
-            self.touch_timestamp(TIMESTAMP)
+        if skip_cache or not store.has_categories():
+            store.set_categories(self.qbittorrent.torrents_categories())
 
-            a = self.qbittorrent.torrents_categories()
-
-            self.qbittorrent_cache.add_data(CACHE_KEY, a, True)
-            return a
-
-        return self.qbittorrent_cache.get_if_has_data(CACHE_KEY)
+        return store.get_categories()
 
 
     def get_client_id(self, include_prefix:bool = True):
@@ -626,20 +954,40 @@ class ClientController(ClientControllerUser):
 
     def torrent_passes_filter(self, torrent_dict: dict):
 
-        passes = True
+        if not CC.IS_PROFILE_MODE:
+            return True
 
-        if CC.IS_PROFILE_MODE:
+        # the store keeps the tags parsed, so this is a set lookup for any torrent it knows
+        tags = self.torrent_state_store.get_torrent_tags(torrent_dict.get("hash", None))
 
-            tags = torrent_dict.get('tags', None)
+        if tags is None:
+            tags = CoreStateStore.parse_tags(torrent_dict.get("tags", None))
 
-            if tags:
+        return self.get_client_id() in tags
 
-                tags = set(tags.split(", "))
+    def get_filtered_hash_set(self) -> set[str] | None:
+        """
+        Gets the hashes of the torrents in the state store that pass torrent_passes_filter,
+        or None when every torrent does
+        """
+        if not CC.IS_PROFILE_MODE:
+            return None
 
-                if self.get_client_id() not in tags:
-                    passes = False
+        return self.torrent_state_store.get_tag_hashes(self.get_client_id())
 
-            else:
-                passes = False
+    def filter_torrent_hashes(self, torrent_hashes: Iterable[str] | None = None) -> list[str]:
+        """
+        Gets the torrent hashes that pass torrent_passes_filter, in the order they were given,
+        every torrent in the state store if None
+
+        The store has the tags of every torrent, so this is one set lookup per hash
+        """
+        if torrent_hashes is None:
+            torrent_hashes = self.torrent_state_store.get_hashes()
+
+        passing = self.get_filtered_hash_set()
+
+        if passing is None:
+            return list(torrent_hashes)
 
-        return passes
+        return [torrent_hash for torrent_hash in torrent_hashes if torrent_hash in passing]
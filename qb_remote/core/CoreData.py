@@ -1,5 +1,5 @@
 import json
-import math
+import gzip
 import subprocess
 import sys
 import os
@@ -7,10 +7,9 @@ import hashlib
 import time
 from typing import Union, Callable, TYPE_CHECKING
 
-from qbittorrentapi import TorrentFilesList
-
 from . import CoreGlobals as CG
 from . import CoreConstants as CC
+from . import CoreFormatting as CF
 
 
 try:
@@ -33,60 +32,12 @@ def get_client_build_information(qbittorrent):
     )
 
 
-def size_bytes_to_pretty_str(size_bytes: int):
-    if size_bytes == 0:
-        return "0B"
-    
-    is_negative = False
-    if size_bytes < 0:
-        size_bytes *= -1
-        is_negative = True
-
-    size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-
-    if is_negative:
-        s *= -1
-    return "%s %s" % (s, size_name[i])
-
-
-def get_pretty_download_priority(priority):
-    if priority == CC.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD:
-        return "Do Not Download"
-
-    if priority == CC.TORRENT_FILE_PRIORITY_NORMAL:
-        return "Normal"
-
-    if priority == CC.TORRENT_FILE_PRIORITY_HIGH:
-        return "High"
-
-    if priority == CC.TORRENT_FILE_PRIORITY_MAXIMUM:
-        return "Maximum"
-
-    return "Unknown"
+# kept here for older callers, the formatters live in CoreFormatting now
+size_bytes_to_pretty_str = CF.size_bytes_to_pretty_str
 
+get_pretty_download_priority = CF.get_pretty_download_priority
 
-def torrent_state_to_pretty(state_: str):
-    state = state_.lower()
-
-    if state == "stalledup":
-        return "Seeding"
-
-    if state == "stalled" or state == "stalleddown":
-        return "Stalled"
-
-    if state == "downloading":
-        return "Downloading"
-
-    if state == "pauseddl":
-        return "Paused"
-
-    if state == "uploading":
-        return "Uploading"
-
-    return state_
+torrent_state_to_pretty = CF.torrent_state_to_pretty
 
 
 from typing import MutableMapping
@@ -266,57 +217,6 @@ def time_delta_to_pretty_time_delta(seconds, show_seconds=True):
     return "{} microseconds".format(int(seconds * 1000000))
 
 
-class NestedTorrentFileDirectory:
-    def __init__(self, name, size=0) -> None:
-        self.name = name
-        self.torrents_file = None
-        self.size = size
-        self.progress = 0
-        self.children: dict[str, NestedTorrentFileDirectory] = {}
-
-    def recalculate_size(self):
-        if self.torrents_file:
-            self.size = self.torrents_file.size
-        else:
-            self.size = 0
-
-        self.size += sum(d.recalculate_size() for d in self.children.values())
-
-        return self.size
-
-    def _get_progress(self):
-        return self.progress * self.size + sum(d._get_progress() for d in self.children.values())
-
-    def get_progress(self):
-        p = self._get_progress()
-
-        if self.size == 0:
-            return -1
-
-        return p / self.size
-
-
-def build_nested_torrent_structure(torrent_files: TorrentFilesList):
-    root = NestedTorrentFileDirectory("/")
-
-    for file in torrent_files:
-        components = file.name.split(os.sep)
-
-        dir = None
-        current = root.children
-        for component in components:
-            dir = NestedTorrentFileDirectory(component)
-            current = current.setdefault(component, dir)
-            current.size += file.size
-            current = current.children
-
-        if dir:
-            dir.torrents_file = file
-            dir.progress = file.progress
-
-    return root
-
-
 class Call(object):
     def __init__(self, func: Callable, *args, **kwargs):
         self._label = None
@@ -366,6 +266,27 @@ def load_settings(settings:dict):
 
         update_dictionary_no_key_remove(settings, data)
 
+def save_state_snapshot(snapshot: dict):
+    """
+    Writes a gzipped json state snapshot, through a temporary file so a crash never leaves half of one
+    """
+    os.makedirs(CC.CONFIG_DIRECTORY, exist_ok=True)
+
+    temp_path = CC.CONFIG_STATE_SNAPSHOT + ".tmp"
+
+    with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=1) as writer:
+        json.dump(snapshot, writer, separators=(",", ":"))
+
+    os.replace(temp_path, CC.CONFIG_STATE_SNAPSHOT)
+
+def load_state_snapshot() -> dict | None:
+
+    if not os.path.isfile(CC.CONFIG_STATE_SNAPSHOT):
+        return None
+
+    with gzip.open(CC.CONFIG_STATE_SNAPSHOT, "rt", encoding="utf-8") as reader:
+        return json.load(reader)
+
 def save_guid(guid:str):
     if guid is None:
         return
@@ -0,0 +1,213 @@
+import fnmatch
+import re
+
+import numpy as np
+
+from . import CoreFileTree
+
+PATTERN_TYPE_GLOB = "glob"
+PATTERN_TYPE_REGEX = "regex"
+
+PATTERN_TYPES = (PATTERN_TYPE_GLOB, PATTERN_TYPE_REGEX)
+
+_GLOB_SPECIAL_CHARACTERS = re.compile(r"[*?\[\]]")
+
+# *.nfo, the most common glob by far, is just an extension check, *.tar.gz is not,
+# extensions are only the part after the last dot
+_GLOB_EXTENSION = re.compile(r"^\*(\.[^*?\[\]/.]+)$")
+
+# *sample* is a substring check
+_GLOB_SUBSTRING = re.compile(r"^\*([^*?\[\]]+)\*$")
+
+
+def split_list(text: str) -> list[str]:
+    """
+    Splits a user typed list on commas, semicolons and whitespace
+    """
+    return [part for part in re.split(r"[,;\s]+", text) if part]
+
+
+def has_uppercase(regex: str) -> bool:
+    """
+    Gets whether a regex has an uppercase letter, leaving out escapes such as \\D and \\W
+    """
+    escaped = False
+
+    for c in regex:
+        if escaped:
+            escaped = False
+
+        elif c == "\\":
+            escaped = True
+
+        elif c.isupper():
+            return True
+
+    return False
+
+
+def normalize_extension(extension: str) -> str:
+    extension = extension.strip().casefold()
+
+    if extension.startswith("*"):
+        extension = extension[1:]
+
+    if extension and not extension.startswith("."):
+        extension = "." + extension
+
+    return extension
+
+
+class File_Selection_Rule(object):
+    """
+    Picks files out of a Torrent_File_Tree by path pattern, extension or size
+
+    A file matches the rule if it matches any of the criteria, which is what you want when throwing out
+    junk, such as *.nfo, sample and anything under 10 MB
+
+    Glob patterns without a / are matched against the file name, with one against the end of the path,
+    or the whole path if they start with /, and a pattern without any wildcards matches anywhere
+
+    Regex patterns are searched for in the whole path, matching ignores case unless a regex has an
+    uppercase letter
+    """
+
+    def __init__(
+        self,
+        patterns: list[str] = (),
+        pattern_type: str = PATTERN_TYPE_GLOB,
+        extensions: list[str] = (),
+        smaller_than: int = None,
+        larger_than: int = None,
+    ):
+        if pattern_type not in PATTERN_TYPES:
+            raise ValueError(f"Unknown pattern type {pattern_type}")
+
+        self.patterns: list[str] = [p for p in patterns if p]
+        self.pattern_type: str = pattern_type
+        self.extensions: list[str] = [e for e in (normalize_extension(e) for e in extensions) if e]
+        self.smaller_than: int | None = smaller_than
+        self.larger_than: int | None = larger_than
+
+        # throws re.error right away rather than when matching
+        self._regexes = [self._compile(pattern) for pattern in self.patterns]
+
+    def __repr__(self):
+        return (
+            f"File_Selection_Rule(patterns={self.patterns}, pattern_type={self.pattern_type}, "
+            f"extensions={self.extensions}, smaller_than={self.smaller_than}, "
+            f"larger_than={self.larger_than})"
+        )
+
+    def _compile(self, pattern: str) -> re.Pattern | None:
+        if self.pattern_type == PATTERN_TYPE_REGEX:
+            # same as the torrent name filter, an uppercase letter makes it case sensitive
+            if has_uppercase(pattern):
+                return re.compile(pattern)
+
+            return re.compile(pattern, re.IGNORECASE)
+
+        if _GLOB_EXTENSION.match(pattern) or _GLOB_SUBSTRING.match(pattern):
+            return None
+
+        if not _GLOB_SPECIAL_CHARACTERS.search(pattern):
+            return None
+
+        pattern = pattern.casefold()
+
+        if "/" in pattern and not pattern.startswith("/"):
+            # a path glob can start at any directory, like in a .gitignore
+            return re.compile(r"(?:.*/)?" + fnmatch.translate(pattern))
+
+        return re.compile(fnmatch.translate(pattern.lstrip("/")))
+
+    def is_empty(self) -> bool:
+        return (
+            not self.patterns
+            and not self.extensions
+            and self.smaller_than is None
+            and self.larger_than is None
+        )
+
+    def _match_pattern(
+        self, file_tree: CoreFileTree.Torrent_File_Tree, pattern: str, regex: re.Pattern | None
+    ) -> np.ndarray:
+        file_count = file_tree.get_file_count()
+
+        if self.pattern_type == PATTERN_TYPE_REGEX:
+            search = regex.search
+
+            return np.fromiter(
+                (search(path) is not None for path in file_tree.get_file_paths()),
+                dtype=bool,
+                count=file_count,
+            )
+
+        pattern = pattern.casefold()
+
+        match = _GLOB_EXTENSION.match(pattern)
+
+        if match:
+            return file_tree.get_file_extensions() == match.group(1)
+
+        match = _GLOB_SUBSTRING.match(pattern)
+
+        if match or regex is None:
+            text = match.group(1) if match else pattern
+
+            return np.fromiter(
+                (text in path for path in file_tree.get_folded_file_paths()),
+                dtype=bool,
+                count=file_count,
+            )
+
+        if "/" in pattern:
+            texts = file_tree.get_folded_file_paths()
+        else:
+            texts = file_tree.get_folded_file_names()
+
+        full_match = regex.match
+
+        return np.fromiter(
+            (full_match(text) is not None for text in texts), dtype=bool, count=file_count
+        )
+
+    def match(self, file_tree: CoreFileTree.Torrent_File_Tree) -> np.ndarray:
+        """
+        Gets a mask over the file ids of the tree, True for every file that matches
+        """
+        matches = np.zeros(file_tree.get_file_count(), dtype=bool)
+
+        sizes = file_tree.get_file_sizes()
+
+        if self.smaller_than is not None:
+            matches |= sizes < self.smaller_than
+
+        if self.larger_than is not None:
+            matches |= sizes > self.larger_than
+
+        # the tree only knows the part after the last dot, so .tar.gz is checked against the names
+        extensions = [e for e in self.extensions if e.count(".") == 1]
+        long_extensions = tuple(e for e in self.extensions if e.count(".") > 1)
+
+        if extensions:
+            matches |= np.isin(file_tree.get_file_extensions(), extensions)
+
+        if long_extensions:
+            matches |= np.fromiter(
+                (name.endswith(long_extensions) for name in file_tree.get_folded_file_names()),
+                dtype=bool,
+                count=file_tree.get_file_count(),
+            )
+
+        for pattern, regex in zip(self.patterns, self._regexes):
+            # the cheap checks above may already cover everything
+            if matches.all():
+                break
+
+            matches |= self._match_pattern(file_tree, pattern, regex)
+
+        return matches
+
+    def get_matching_file_ids(self, file_tree: CoreFileTree.Torrent_File_Tree) -> np.ndarray:
+        return np.flatnonzero(self.match(file_tree)).astype(np.int32)
@@ -0,0 +1,497 @@
+import threading
+from typing import Iterable
+
+import numpy as np
+
+from qbittorrentapi import TorrentFilesList
+
+# unicode code points fit in 21 bits, so 3 of them pack losslessly into one int64
+_TRIGRAM_SHIFT = 21
+
+# when a query has no trigrams every path has to be scanned, so stop after this many matches
+DEFAULT_RESULT_LIMIT = 1000
+
+# removed torrents leave dead paths in the postings, they are rebuilt away once there are this many
+COMPACT_MIN_DEAD_PATHS = 1 << 16
+
+
+def _encode_code_points(texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Gets the code points of every text in one array, with a 0 after each text, and the text of every position
+    """
+    buffer = np.frombuffer(("\0".join(texts) + "\0").encode("utf-32-le"), dtype=np.uint32)
+
+    lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+
+    text_of_position = np.repeat(np.arange(len(texts), dtype=np.int32), lengths)
+
+    return buffer.astype(np.int64), text_of_position
+
+
+def _pack_trigrams(code_points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Gets the packed trigram starting at every position, and a mask of the ones not crossing a 0
+    """
+    first = code_points[:-2]
+    second = code_points[1:-1]
+    third = code_points[2:]
+
+    codes = (first << (2 * _TRIGRAM_SHIFT)) | (second << _TRIGRAM_SHIFT) | third
+
+    valid = (first != 0) & (second != 0) & (third != 0)
+
+    return codes, valid
+
+
+def _iterate_ids(ids: np.ndarray, chunk_size: int = 4096):
+    # most searches stop at the limit, so only convert as many ids as get looked at
+    for i in range(0, len(ids), chunk_size):
+        yield from ids[i : i + chunk_size].tolist()
+
+
+def fold_paths(paths: list[str]) -> list[str]:
+    """
+    Gets the case-folded paths, reusing the path itself when folding does not change it
+    """
+    folded_paths = []
+
+    for path in paths:
+        folded = path.casefold()
+
+        folded_paths.append(path if folded == path else folded)
+
+    return folded_paths
+
+
+def get_trigrams(text: str) -> list[int]:
+    """
+    Gets the distinct packed trigrams of an already case-folded text
+    """
+    if len(text) < 3:
+        return []
+
+    code_points, _ = _encode_code_points([text])
+
+    codes, valid = _pack_trigrams(code_points)
+
+    return np.unique(codes[valid]).tolist()
+
+
+def build_postings(folded_paths: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Builds the trigram postings of a batch of case-folded paths, numbered from 0
+
+    Returns the distinct trigrams, the offsets of every trigram into the path ids, and the path ids,
+    which are sorted inside every trigram
+    """
+    if not folded_paths:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(1, dtype=np.int64), empty.astype(np.int32)
+
+    code_points, path_of_position = _encode_code_points(folded_paths)
+
+    codes, valid = _pack_trigrams(code_points)
+
+    codes = codes[valid]
+    path_ids = path_of_position[:-2][valid]
+
+    # path ids go up with the position, so a stable sort keeps them sorted inside every trigram
+    order = np.argsort(codes, kind="stable")
+
+    codes = codes[order]
+    path_ids = path_ids[order]
+
+    # a trigram can show up more than once in the same path
+    keep = np.ones(len(codes), dtype=bool)
+    keep[1:] = (codes[1:] != codes[:-1]) | (path_ids[1:] != path_ids[:-1])
+
+    codes = codes[keep]
+    path_ids = path_ids[keep]
+
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+
+    offsets = np.append(starts, len(codes))
+
+    return codes[starts], offsets, path_ids
+
+
+class File_Path_Index(object):
+    """
+    Trigram index over the file paths of every torrent, for finding which torrents contain a file
+
+    Every indexed path gets an id that only goes up, postings are sorted arrays of path ids per trigram,
+    so a query is an intersection of a few arrays followed by checking the few paths that are left
+
+    Removing a torrent only marks its paths dead, the postings are rebuilt once enough of them pile up
+    """
+
+    # everything that makes up the index, swapped out as a whole when compacting
+    _STATE_ATTRIBUTES = (
+        "_capacity",
+        "_path_count",
+        "_dead_count",
+        "_paths",
+        "_folded_paths",
+        "_path_file_ids",
+        "_path_torrents",
+        "_alive",
+        "_torrent_hashes",
+        "_torrent_to_slot",
+        "_torrent_ranges",
+        "_postings",
+        "_trigram_keys",
+        "_short_path_ids",
+    )
+
+    def __init__(self, capacity: int = 1 << 16):
+        self._lock = threading.Lock()
+
+        self._initial_capacity: int = capacity
+
+        self._version: int = 0
+
+        self._reset_unsafe()
+
+    def _reset_unsafe(self):
+        capacity = self._initial_capacity
+
+        self._capacity: int = capacity
+
+        self._path_count: int = 0
+        self._dead_count: int = 0
+
+        # by path id, removed paths are None
+        self._paths: list[str | None] = []
+
+        # the case-folded paths queries are checked against, the same string when folding changes nothing
+        self._folded_paths: list[str | None] = []
+        self._path_file_ids = np.zeros(capacity, dtype=np.int32)
+        self._path_torrents = np.zeros(capacity, dtype=np.int32)
+        self._alive = np.zeros(capacity, dtype=bool)
+
+        self._torrent_hashes: list[str] = []
+        self._torrent_to_slot: dict[str, int] = {}
+
+        # torrent hash -> path id range [start, end)
+        self._torrent_ranges: dict[str, tuple[int, int]] = {}
+
+        # trigram -> sorted path id arrays, merged into one the first time a query needs them
+        self._postings: dict[int, list[np.ndarray]] = {}
+
+        # every trigram in the postings, for two letter terms, built when first needed
+        self._trigram_keys: np.ndarray | None = None
+
+        # paths too short to have a trigram
+        self._short_path_ids: list[int] = []
+
+    def __len__(self):
+        with self._lock:
+            return self._path_count - self._dead_count
+
+    def _grow_unsafe(self, needed: int):
+        if needed <= self._capacity:
+            return
+
+        capacity = self._capacity
+
+        while capacity < needed:
+            capacity *= 2
+
+        for name in ("_path_file_ids", "_path_torrents", "_alive"):
+            values = getattr(self, name)
+
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[: self._path_count] = values[: self._path_count]
+
+            setattr(self, name, grown)
+
+        self._capacity = capacity
+
+    def _get_postings_unsafe(self, trigram: int) -> np.ndarray | None:
+        chunks = self._postings.get(trigram, None)
+
+        if chunks is None:
+            return None
+
+        if len(chunks) > 1:
+            chunks[:] = [np.concatenate(chunks)]
+
+        return chunks[0]
+
+    def _add_paths_unsafe(
+        self,
+        torrent_hash: str,
+        paths: list[str],
+        folded_paths: list[str],
+        file_ids: list[int],
+        postings: tuple[np.ndarray, np.ndarray, np.ndarray],
+    ):
+        start = self._path_count
+        end = start + len(paths)
+
+        self._grow_unsafe(end)
+
+        slot = self._torrent_to_slot.get(torrent_hash, None)
+
+        if slot is None:
+            slot = len(self._torrent_hashes)
+
+            self._torrent_to_slot[torrent_hash] = slot
+            self._torrent_hashes.append(torrent_hash)
+
+        self._paths.extend(paths)
+        self._folded_paths.extend(folded_paths)
+        self._path_file_ids[start:end] = file_ids
+        self._path_torrents[start:end] = slot
+        self._alive[start:end] = True
+
+        self._torrent_ranges[torrent_hash] = (start, end)
+
+        self._path_count = end
+
+        self._short_path_ids.extend(start + i for i, path in enumerate(paths) if len(path) < 3)
+
+        trigrams, offsets, path_ids = postings
+
+        path_ids = path_ids + start
+        offsets = offsets.tolist()
+
+        all_postings = self._postings
+
+        for i, trigram in enumerate(trigrams.tolist()):
+            ids = path_ids[offsets[i] : offsets[i + 1]]
+
+            chunks = all_postings.get(trigram, None)
+
+            if chunks is None:
+                all_postings[trigram] = [ids]
+                self._trigram_keys = None
+
+            else:
+                chunks.append(ids)
+
+    def _remove_torrent_unsafe(self, torrent_hash: str):
+        start, end = self._torrent_ranges.pop(torrent_hash)
+
+        self._alive[start:end] = False
+        self._paths[start:end] = [None] * (end - start)
+        self._folded_paths[start:end] = [None] * (end - start)
+
+        self._dead_count += end - start
+
+    def _get_bigram_candidates_unsafe(self, bigram: str) -> np.ndarray:
+        # every path containing the two letters has a trigram starting or ending with them
+        if self._trigram_keys is None:
+            self._trigram_keys = np.fromiter(
+                self._postings.keys(), dtype=np.int64, count=len(self._postings)
+            )
+
+        keys = self._trigram_keys
+
+        first, second = ord(bigram[0]), ord(bigram[1])
+        mask = (1 << _TRIGRAM_SHIFT) - 1
+
+        leading = (keys >> (2 * _TRIGRAM_SHIFT) == first) & (
+            (keys >> _TRIGRAM_SHIFT) & mask == second
+        )
+        trailing = ((keys >> _TRIGRAM_SHIFT) & mask == first) & (keys & mask == second)
+
+        postings = [self._get_postings_unsafe(key) for key in keys[leading | trailing].tolist()]
+
+        postings.append(np.array(self._short_path_ids, dtype=np.int32))
+
+        return np.unique(np.concatenate(postings))
+
+    def get_version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def has_torrent(self, torrent_hash: str) -> bool:
+        with self._lock:
+            return torrent_hash in self._torrent_ranges
+
+    def get_torrent_hashes(self) -> list[str]:
+        with self._lock:
+            return list(self._torrent_ranges)
+
+    def add_torrent_files(self, torrent_hash: str, torrent_files: TorrentFilesList):
+        """
+        Indexes the file paths of a torrent, replacing what was indexed for it before
+
+        Nothing happens when the paths are the same as the ones already indexed
+        """
+        paths = [file["name"] for file in torrent_files]
+        file_ids = [file["id"] for file in torrent_files]
+
+        with self._lock:
+            indexed = self._torrent_ranges.get(torrent_hash, None)
+
+            if indexed is not None and self._paths[indexed[0] : indexed[1]] == paths:
+                return
+
+        # the expensive part runs outside the lock, so queries are not held up by big torrents
+        folded_paths = fold_paths(paths)
+
+        postings = build_postings(folded_paths)
+
+        with self._lock:
+            if torrent_hash in self._torrent_ranges:
+                self._remove_torrent_unsafe(torrent_hash)
+
+            self._add_paths_unsafe(torrent_hash, paths, folded_paths, file_ids, postings)
+
+            self._version += 1
+
+    def remove_torrents(self, torrent_hashes: Iterable[str]) -> list[str]:
+        """
+        Removes the paths of torrents from the index, returns the hashes that were actually removed
+        """
+        removed = []
+
+        with self._lock:
+            for torrent_hash in torrent_hashes:
+                if torrent_hash not in self._torrent_ranges:
+                    continue
+
+                self._remove_torrent_unsafe(torrent_hash)
+                removed.append(torrent_hash)
+
+            if removed:
+                self._version += 1
+
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._reset_unsafe()
+
+            self._version += 1
+
+    def needs_compacting(self) -> bool:
+        with self._lock:
+            return (
+                self._dead_count >= COMPACT_MIN_DEAD_PATHS
+                and self._dead_count * 2 >= self._path_count
+            )
+
+    def compact(self):
+        """
+        Rebuilds the postings without the paths of removed torrents
+        """
+        with self._lock:
+            live = [
+                (
+                    torrent_hash,
+                    self._paths[start:end],
+                    self._folded_paths[start:end],
+                    self._path_file_ids[start:end].tolist(),
+                )
+                for torrent_hash, (start, end) in self._torrent_ranges.items()
+            ]
+
+            version = self._version
+
+        rebuilt = File_Path_Index(self._initial_capacity)
+
+        for torrent_hash, paths, folded_paths, file_ids in live:
+            postings = build_postings(folded_paths)
+
+            rebuilt._add_paths_unsafe(torrent_hash, paths, folded_paths, file_ids, postings)
+
+        with self._lock:
+            # something changed while rebuilding, try again next time
+            if version != self._version:
+                return
+
+            for name in self._STATE_ATTRIBUTES:
+                setattr(self, name, getattr(rebuilt, name))
+
+            self._version += 1
+
+    def maintain(self):
+        if self.needs_compacting():
+            self.compact()
+
+    def search(self, query: str, limit: int = DEFAULT_RESULT_LIMIT) -> list[tuple[str, int, str]]:
+        """
+        Finds the files whose path contains every whitespace separated term of the query, ignoring case
+
+        Returns (torrent hash, file id, path) for at most limit files
+        """
+        terms = query.casefold().split()
+
+        if not terms:
+            return []
+
+        trigrams = set()
+
+        for term in terms:
+            trigrams.update(get_trigrams(term))
+
+        bigrams = [term for term in terms if len(term) == 2]
+
+        with self._lock:
+            if trigrams:
+                candidates = None
+
+                postings = []
+
+                for trigram in trigrams:
+                    ids = self._get_postings_unsafe(trigram)
+
+                    if ids is None:
+                        return []
+
+                    postings.append(ids)
+
+                # smallest first keeps every intersection small
+                postings.sort(key=len)
+
+                for ids in postings:
+                    if candidates is None:
+                        candidates = ids
+
+                    else:
+                        candidates = np.intersect1d(candidates, ids, assume_unique=True)
+
+                    if len(candidates) == 0:
+                        return []
+
+                candidates = candidates[self._alive[candidates]]
+
+            elif bigrams:
+                candidates = self._get_bigram_candidates_unsafe(bigrams[0])
+
+                candidates = candidates[self._alive[candidates]]
+
+            else:
+                # single letters match nearly everything, so this stops at the limit quickly
+                candidates = np.flatnonzero(self._alive[: self._path_count])
+
+            paths = self._paths
+            folded_paths = self._folded_paths
+            path_file_ids = self._path_file_ids
+            path_torrents = self._path_torrents
+            torrent_hashes = self._torrent_hashes
+
+            results = []
+
+            # trigrams only say a path might match, the terms still have to be checked
+            for path_id in _iterate_ids(candidates):
+                folded_path = folded_paths[path_id]
+
+                if not all(term in folded_path for term in terms):
+                    continue
+
+                results.append(
+                    (
+                        torrent_hashes[path_torrents[path_id]],
+                        int(path_file_ids[path_id]),
+                        paths[path_id],
+                    )
+                )
+
+                if len(results) >= limit:
+                    break
+
+            return results
@@ -0,0 +1,652 @@
+import os
+import sys
+import json
+import weakref
+
+import numpy as np
+
+from qbittorrentapi import TorrentFilesList
+
+from . import CoreCaches
+from . import CoreConstants as CC
+from . import CoreSorting
+
+# same values as Qt.CheckState, so they can be handed to Qt as they are
+CHECK_STATE_UNCHECKED = 0
+CHECK_STATE_PARTIALLY_CHECKED = 1
+CHECK_STATE_CHECKED = 2
+
+
+class Torrent_File_Tree(object):
+    """
+    Compact, array backed directory tree of a torrents files
+
+    Nodes are numbered in depth-first pre-order with the root directory as node 0,
+    so the whole subtree of a node is the node range [node, subtree_end[node])
+
+    Per file values are indexed by the qBittorrent file id, per node values by node
+
+    Every node also keeps how many of the files under it are wanted, which gives the tri-state check state
+    of a directory without looking at its children, changing priorities only updates the counts of the
+    changed files ancestors
+
+    The children of every directory are sorted once per column and kept, names and sizes never change
+    for a torrent, so those orderings survive refreshing the file values with update_files
+    """
+
+    SORT_COLUMNS = ("name", "size", "progress", "priority", "remaining", "availability")
+
+    # sort columns whose keys change when the file values are refreshed
+    VALUE_SORT_COLUMNS = ("progress", "priority", "remaining", "availability")
+
+    def __init__(
+        self,
+        names: list[str],
+        parents: np.ndarray,
+        subtree_ends: np.ndarray,
+        node_file_ids: np.ndarray,
+        torrent_files: TorrentFilesList,
+    ):
+        self._names: list[str] = names
+        self._parents: np.ndarray = parents
+        self._subtree_ends: np.ndarray = subtree_ends
+        self._node_file_ids: np.ndarray = node_file_ids
+
+        node_count = len(names)
+
+        file_count = int(node_file_ids.max()) + 1 if node_count > 1 else 0
+
+        self._file_nodes = np.full(file_count, -1, dtype=np.int32)
+        is_file = node_file_ids >= 0
+        self._file_nodes[node_file_ids[is_file]] = np.flatnonzero(is_file)
+
+        self._file_paths: list[str] = [""] * file_count
+
+        # built when first needed, paths never change for a tree
+        self._folded_file_paths: list[str] = None
+        self._folded_file_names: list[str] = None
+        self._file_extensions: np.ndarray = None
+        self._file_sizes = np.zeros(file_count, dtype=np.int64)
+        self._file_progresses = np.zeros(file_count, dtype=np.float64)
+        self._file_priorities = np.zeros(file_count, dtype=np.int8)
+        self._file_availabilities = np.zeros(file_count, dtype=np.float64)
+
+        # the file list the values came from, not kept alive here, the file list cache owns it
+        self._torrent_files_ref: weakref.ref = None
+
+        self._load_file_values(torrent_files)
+
+        # children of every node, grouped by parent and kept in pre-order inside each group
+        self._children = (np.argsort(parents[1:], kind="stable") + 1).astype(np.int32)
+        self._children_offsets = np.searchsorted(
+            parents[self._children], np.arange(node_count + 1)
+        ).astype(np.int32)
+
+        self._node_sizes: np.ndarray = None
+        self._node_progresses: np.ndarray = None
+        self._node_remaining: np.ndarray = None
+
+        # number of files in the subtree of every node, and how many of them are wanted
+        self._node_file_counts: np.ndarray = self.sum_subtrees(is_file.astype(np.int32))
+        self._node_wanted_counts: np.ndarray = None
+
+        # bytes and bytes left to download of the wanted files in the subtree of every node
+        self._file_remaining: np.ndarray = None
+        self._node_wanted_sizes: np.ndarray = None
+        self._node_wanted_remaining: np.ndarray = None
+
+        self._name_ranks: np.ndarray = None
+
+        # sort column -> self._children with every sibling group sorted by that column
+        self._orderings: dict[str, np.ndarray] = {}
+
+        self._recalculate_rollups()
+
+    def _load_file_values(self, torrent_files: TorrentFilesList):
+        for file in torrent_files:
+            file_id = file["id"]
+
+            self._file_paths[file_id] = file["name"]
+            self._file_sizes[file_id] = file.get("size", 0)
+            self._file_progresses[file_id] = file.get("progress", 0)
+            self._file_priorities[file_id] = file.get("priority", 0)
+            self._file_availabilities[file_id] = file.get("availability", -1)
+
+        self._torrent_files_ref = weakref.ref(torrent_files)
+
+    def _recalculate_rollups(self):
+        is_file = self._node_file_ids >= 0
+        file_ids = self._node_file_ids[is_file]
+
+        node_file_sizes = np.zeros(len(self._names), dtype=np.int64)
+        node_file_sizes[is_file] = self._file_sizes[file_ids]
+
+        node_file_downloaded = np.zeros(len(self._names), dtype=np.float64)
+        node_file_downloaded[is_file] = self._file_sizes[file_ids] * self._file_progresses[file_ids]
+
+        self._node_sizes = self.sum_subtrees(node_file_sizes)
+
+        downloaded = self.sum_subtrees(node_file_downloaded)
+
+        self._node_progresses = np.divide(
+            downloaded,
+            self._node_sizes,
+            out=np.zeros(len(self._names), dtype=np.float64),
+            where=self._node_sizes > 0,
+        )
+        self._node_progresses[is_file] = self._file_progresses[file_ids]
+
+        self._node_remaining = np.maximum(self._node_sizes - downloaded, 0).astype(np.int64)
+
+        self._file_remaining = np.maximum(
+            self._file_sizes - self._file_sizes * self._file_progresses, 0
+        ).astype(np.int64)
+
+        is_wanted = np.zeros(len(self._names), dtype=np.int32)
+        is_wanted[is_file] = self._file_priorities[file_ids] > CC.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD
+
+        node_file_remaining = np.zeros(len(self._names), dtype=np.int64)
+        node_file_remaining[is_file] = self._file_remaining[file_ids]
+
+        self._node_wanted_counts = self.sum_subtrees(is_wanted)
+        self._node_wanted_sizes = self.sum_subtrees(node_file_sizes * is_wanted)
+        self._node_wanted_remaining = self.sum_subtrees(node_file_remaining * is_wanted)
+
+    def sum_subtrees(self, node_values: np.ndarray) -> np.ndarray:
+        """
+        Sums a per node value over the subtree of every node
+        """
+        # subtrees are contiguous in pre-order, so every subtree sum is a difference of two prefix sums
+        prefix = np.zeros(len(node_values) + 1, dtype=node_values.dtype)
+        np.cumsum(node_values, out=prefix[1:])
+
+        return prefix[self._subtree_ends] - prefix[:-1]
+
+    def _get_sort_keys(self, column: str) -> np.ndarray:
+        if column == "name":
+            if self._name_ranks is None:
+                self._name_ranks = CoreSorting.natural_sort_ranks(self._names)
+
+            return self._name_ranks
+
+        if column == "size":
+            return self._node_sizes
+
+        if column == "progress":
+            return self._node_progresses
+
+        if column == "priority":
+            return self.get_node_priorities()
+
+        if column == "remaining":
+            return self._node_remaining
+
+        if column == "availability":
+            return self.get_node_availabilities()
+
+        raise KeyError(f"Cannot sort file tree by {column}")
+
+    def get_node_count(self) -> int:
+        return len(self._names)
+
+    def get_file_count(self) -> int:
+        return len(self._file_nodes)
+
+    def get_names(self) -> list[str]:
+        return self._names
+
+    def get_parents(self) -> np.ndarray:
+        return self._parents
+
+    def get_subtree_ends(self) -> np.ndarray:
+        return self._subtree_ends
+
+    def get_node_file_ids(self) -> np.ndarray:
+        """
+        Gets the file id of every node, directories are -1
+        """
+        return self._node_file_ids
+
+    def get_file_nodes(self) -> np.ndarray:
+        """
+        Gets the node of every file id
+        """
+        return self._file_nodes
+
+    def get_directory_nodes(self) -> np.ndarray:
+        return np.flatnonzero(self._node_file_ids < 0).astype(np.int32)
+
+    def is_directory(self, node: int) -> bool:
+        return self._node_file_ids[node] < 0
+
+    def get_children(self, node: int) -> np.ndarray:
+        return self._children[self._children_offsets[node] : self._children_offsets[node + 1]]
+
+    def _get_ordering(self, column: str) -> np.ndarray:
+        ordering = self._orderings.get(column, None)
+
+        if ordering is None:
+            children = self._children
+
+            # children are already grouped by parent, sorting by (parent, key) keeps the groups
+            # where they are and sorts inside every one of them in a single pass
+            order = np.lexsort((self._get_sort_keys(column)[children], self._parents[children]))
+
+            ordering = children[order]
+
+            self._orderings[column] = ordering
+
+        return ordering
+
+    def get_sorted_children(self, node: int, column: str, descending: bool = False) -> np.ndarray:
+        """
+        Gets the children of a node ordered by one of SORT_COLUMNS
+
+        The first call per column sorts every directory at once, after that this is a lookup
+        """
+        ordering = self._get_ordering(column)
+
+        children = ordering[self._children_offsets[node] : self._children_offsets[node + 1]]
+
+        if descending:
+            return children[::-1]
+
+        return children
+
+    def get_memory_size(self) -> int:
+        """
+        Estimates how many bytes the tree takes up, the file list it was built from is not included
+        """
+        size = sys.getsizeof(self)
+
+        for value in vars(self).values():
+            size += CoreCaches.estimate_size(value)
+
+        return size
+
+    def is_built_from(self, torrent_files: TorrentFilesList) -> bool:
+        """
+        Checks if the tree values came from this exact file list
+        """
+        return self._torrent_files_ref() is torrent_files
+
+    def has_same_files(self, torrent_files: TorrentFilesList) -> bool:
+        """
+        Checks if the file list has the same paths as the tree, so update_files can be used
+        """
+        if len(torrent_files) != len(self._file_paths):
+            return False
+
+        paths = self._file_paths
+
+        return all(paths[file["id"]] == file["name"] for file in torrent_files)
+
+    def update_files(self, torrent_files: TorrentFilesList):
+        """
+        Refreshes the file values from a newer list of the same files, see has_same_files
+        """
+        self._load_file_values(torrent_files)
+
+        self._recalculate_rollups()
+
+        for column in self.VALUE_SORT_COLUMNS:
+            self._orderings.pop(column, None)
+
+    def get_subtree_file_ids(self, node: int) -> np.ndarray:
+        """
+        Gets the file id of every file under a node, or of the node itself if it is a file
+        """
+        file_ids = self._node_file_ids[node : self._subtree_ends[node]]
+
+        return file_ids[file_ids >= 0]
+
+    def get_wanted_counts(self) -> np.ndarray:
+        """
+        Gets the number of files under every node that are not set to do not download
+        """
+        return self._node_wanted_counts
+
+    def get_wanted_sizes(self) -> np.ndarray:
+        """
+        Gets the total size of the wanted files under every node
+        """
+        return self._node_wanted_sizes
+
+    def get_wanted_remaining(self) -> np.ndarray:
+        """
+        Gets the bytes left to download of the wanted files under every node
+        """
+        return self._node_wanted_remaining
+
+    def get_selection_totals(self, node: int = 0) -> tuple[int, int]:
+        """
+        Gets the total size and the bytes left to download of the wanted files under a node
+        """
+        return int(self._node_wanted_sizes[node]), int(self._node_wanted_remaining[node])
+
+    def get_node_file_counts(self) -> np.ndarray:
+        """
+        Gets the number of files under every node, files count themselves
+        """
+        return self._node_file_counts
+
+    def get_check_state(self, node: int) -> int:
+        wanted = self._node_wanted_counts[node]
+
+        if wanted == 0:
+            return CHECK_STATE_UNCHECKED
+
+        if wanted == self._node_file_counts[node]:
+            return CHECK_STATE_CHECKED
+
+        return CHECK_STATE_PARTIALLY_CHECKED
+
+    def get_check_states(self, nodes: np.ndarray = None) -> np.ndarray:
+        """
+        Gets the check state of the given nodes, or of every node, see CHECK_STATE_CHECKED
+        """
+        wanted = self._node_wanted_counts
+        file_counts = self._node_file_counts
+
+        if nodes is not None:
+            wanted = wanted[nodes]
+            file_counts = file_counts[nodes]
+
+        states = np.full(len(wanted), CHECK_STATE_PARTIALLY_CHECKED, dtype=np.int8)
+        states[wanted == 0] = CHECK_STATE_UNCHECKED
+        states[(wanted == file_counts) & (wanted > 0)] = CHECK_STATE_CHECKED
+
+        return states
+
+    def set_file_priorities(self, file_ids: np.ndarray, priority: int) -> np.ndarray:
+        """
+        Sets the priority of files locally, such as right after asking qBittorrent to change them
+
+        Returns the directories whose wanted count changed
+        """
+        if len(file_ids) == 0:
+            return np.zeros(0, dtype=np.int32)
+
+        file_ids = np.asarray(file_ids)
+
+        was_wanted = self._file_priorities[file_ids] > CC.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD
+        is_wanted = priority > CC.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD
+
+        self._file_priorities[file_ids] = priority
+
+        self._orderings.pop("priority", None)
+
+        changed = np.unique(file_ids[was_wanted != is_wanted])
+
+        if len(changed) == 0:
+            return np.zeros(0, dtype=np.int32)
+
+        sign = 1 if is_wanted else -1
+
+        nodes = self._file_nodes[changed]
+
+        rollups = (
+            self._node_wanted_counts,
+            self._node_wanted_sizes,
+            self._node_wanted_remaining,
+        )
+        deltas = (
+            np.full(len(nodes), sign, dtype=np.int64),
+            self._file_sizes[changed] * sign,
+            self._file_remaining[changed] * sign,
+        )
+
+        for rollup, delta in zip(rollups, deltas):
+            rollup[nodes] += delta.astype(rollup.dtype)
+
+        directories = []
+
+        # walk up one level at a time for all the changed files together, adding up the changes
+        # of siblings, so every directory is touched once per level and a single file is O(depth)
+        while True:
+            parents = self._parents[nodes]
+            is_inside = parents >= 0
+
+            if not is_inside.any():
+                break
+
+            nodes, inverse = np.unique(parents[is_inside], return_inverse=True)
+
+            deltas = tuple(
+                np.bincount(inverse, weights=delta[is_inside], minlength=len(nodes)).astype(
+                    np.int64
+                )
+                for delta in deltas
+            )
+
+            for rollup, delta in zip(rollups, deltas):
+                rollup[nodes] += delta.astype(rollup.dtype)
+
+            directories.append(nodes)
+
+        return np.unique(np.concatenate(directories)).astype(np.int32)
+
+    def get_node_sizes(self) -> np.ndarray:
+        return self._node_sizes
+
+    def get_node_progresses(self) -> np.ndarray:
+        return self._node_progresses
+
+    def get_node_remaining(self) -> np.ndarray:
+        return self._node_remaining
+
+    def get_node_priorities(self) -> np.ndarray:
+        """
+        Gets the priority of every node, directories are -1
+        """
+        priorities = np.full(len(self._names), -1, dtype=np.int8)
+
+        is_file = self._node_file_ids >= 0
+        priorities[is_file] = self._file_priorities[self._node_file_ids[is_file]]
+
+        return priorities
+
+    def get_node_availabilities(self) -> np.ndarray:
+        """
+        Gets the availability of every node, directories are -1
+        """
+        availabilities = np.full(len(self._names), -1, dtype=np.float64)
+
+        is_file = self._node_file_ids >= 0
+        availabilities[is_file] = self._file_availabilities[self._node_file_ids[is_file]]
+
+        return availabilities
+
+    def get_file_paths(self) -> list[str]:
+        return self._file_paths
+
+    def get_folded_file_paths(self) -> list[str]:
+        """
+        Gets the case-folded path of every file id, always with / between directories
+        """
+        if self._folded_file_paths is None:
+            self._folded_file_paths = [
+                path.replace("\\", "/").casefold() for path in self._file_paths
+            ]
+
+        return self._folded_file_paths
+
+    def get_folded_file_names(self) -> list[str]:
+        """
+        Gets the case-folded name, without directories, of every file id
+        """
+        if self._folded_file_names is None:
+            names = self._names
+
+            self._folded_file_names = [
+                names[node].casefold() if node >= 0 else "" for node in self._file_nodes.tolist()
+            ]
+
+        return self._folded_file_names
+
+    def get_file_extensions(self) -> np.ndarray:
+        """
+        Gets the case-folded extension of every file id, including the dot, such as .mkv
+        """
+        if self._file_extensions is None:
+            self._file_extensions = np.array(
+                [os.path.splitext(name)[1] for name in self.get_folded_file_names()], dtype=str
+            )
+
+        return self._file_extensions
+
+    def get_file_sizes(self) -> np.ndarray:
+        return self._file_sizes
+
+    def get_file_progresses(self) -> np.ndarray:
+        return self._file_progresses
+
+    def get_file_priorities(self) -> np.ndarray:
+        return self._file_priorities
+
+
+def build_torrent_file_tree(torrent_files: TorrentFilesList) -> Torrent_File_Tree:
+    """
+    Builds the compact directory tree of a torrents file list
+    """
+
+    # first pass builds the tree in the order paths are seen
+
+    names = ["/"]
+    parents = [-1]
+    file_ids = [-1]
+    children: list[list[int]] = [[]]
+    directories: list[dict[str, int]] = [{}]
+
+    for file in torrent_files:
+        components = [c for c in file["name"].replace("\\", "/").split("/") if c]
+
+        if not components:
+            continue
+
+        node = 0
+
+        for component in components[:-1]:
+            child = directories[node].get(component, None)
+
+            if child is None:
+                child = len(names)
+
+                directories[node][component] = child
+                children[node].append(child)
+                names.append(component)
+                parents.append(node)
+                file_ids.append(-1)
+                children.append([])
+                directories.append({})
+
+            node = child
+
+        children[node].append(len(names))
+        names.append(components[-1])
+        parents.append(node)
+        file_ids.append(file["id"])
+        children.append(None)
+        directories.append(None)
+
+    # second pass renumbers everything in depth-first pre-order
+
+    order = []
+    stack = [0]
+
+    while stack:
+        node = stack.pop()
+
+        order.append(node)
+
+        if children[node]:
+            stack.extend(reversed(children[node]))
+
+    node_count = len(order)
+
+    new_index = [0] * node_count
+
+    for i, node in enumerate(order):
+        new_index[node] = i
+
+    new_parents = [-1] + [new_index[parents[node]] for node in order[1:]]
+
+    subtree_sizes = [1] * node_count
+
+    for node in range(node_count - 1, 0, -1):
+        subtree_sizes[new_parents[node]] += subtree_sizes[node]
+
+    subtree_ends = np.arange(node_count, dtype=np.int32) + np.array(subtree_sizes, dtype=np.int32)
+
+    return Torrent_File_Tree(
+        [names[node] for node in order],
+        np.array(new_parents, dtype=np.int32),
+        subtree_ends,
+        np.array([file_ids[node] for node in order], dtype=np.int32),
+        torrent_files,
+    )
+
+
+def estimate_torrent_files_size(torrent_files: TorrentFilesList) -> int:
+    """
+    Estimates how many bytes a file list takes up
+
+    Every file has the same keys, which are shared strings, so only the dicts and their values are counted
+    """
+    size = sys.getsizeof(torrent_files)
+
+    count = len(torrent_files)
+
+    if count == 0:
+        return size
+
+    step = max(1, count // CoreCaches.SIZE_SAMPLE_COUNT)
+    sample = [torrent_files[i] for i in range(0, count, step)][: CoreCaches.SIZE_SAMPLE_COUNT]
+
+    return size + sum(_estimate_file_size(file) for file in sample) * count // len(sample)
+
+
+def _estimate_file_size(file) -> int:
+    size = sys.getsizeof(file) + sum(CoreCaches.estimate_size(value, 1) for value in file.values())
+
+    # the api wraps every file in an object with an attribute dict of its own
+    if hasattr(file, "__dict__"):
+        size += sys.getsizeof(file.__dict__)
+
+    return size
+
+
+def encode_torrent_files(torrent_files: TorrentFilesList) -> tuple[bytes, object]:
+    """
+    Turns a file list into json of one list per key, which compresses far better than a list of dicts
+
+    The api client of the list is the context, it is given back to the decoded list
+
+    Throws ValueError if the files do not all have the same keys
+    """
+    if not torrent_files:
+        return (b"[[],[]]", getattr(torrent_files, "_client", None))
+
+    key_view = torrent_files[0].keys()
+
+    if any(file.keys() != key_view for file in torrent_files):
+        raise ValueError("The files do not all have the same keys")
+
+    keys = list(key_view)
+
+    columns = [[file[key] for file in torrent_files] for key in keys]
+
+    payload = json.dumps([keys, columns], separators=(",", ":"), ensure_ascii=False)
+
+    return (payload.encode("utf-8"), getattr(torrent_files, "_client", None))
+
+
+def decode_torrent_files(payload: bytes, client) -> TorrentFilesList:
+    (keys, columns) = json.loads(payload)
+
+    return TorrentFilesList([dict(zip(keys, values)) for values in zip(*columns)], client=client)
+
+
+CoreCaches.register_sizer(TorrentFilesList, estimate_torrent_files_size)
+CoreCaches.register_codec(TorrentFilesList, encode_torrent_files, decode_torrent_files)
+CoreCaches.register_sizer(Torrent_File_Tree, Torrent_File_Tree.get_memory_size)
@@ -0,0 +1,247 @@
+import functools
+import urllib.parse
+
+import numpy as np
+
+from . import CoreConstants as CC
+
+
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+
+# 1024 ** i for every unit, indexed the same as SIZE_UNITS
+SIZE_DIVISORS = tuple(1 << (10 * i) for i in range(len(SIZE_UNITS)))
+
+SIZE_FORMAT_CACHE_SIZE = 1 << 16
+
+# every state the webui can report, the index in this tuple is the state code
+# see https://github.com/qbittorrent/qBittorrent/wiki/WebUI-API-(qBittorrent-4.1)#get-torrent-list
+TORRENT_STATES = (
+    "unknown",
+    "error",
+    "missingFiles",
+    "uploading",
+    "pausedUP",
+    "stoppedUP",
+    "queuedUP",
+    "stalledUP",
+    "checkingUP",
+    "forcedUP",
+    "allocating",
+    "downloading",
+    "metaDL",
+    "forcedMetaDL",
+    "pausedDL",
+    "stoppedDL",
+    "queuedDL",
+    "stalledDL",
+    "checkingDL",
+    "forcedDL",
+    "checkingResumeData",
+    "moving",
+)
+
+TORRENT_STATE_UNKNOWN = 0
+
+TORRENT_STATE_TO_CODE: dict[str, int] = {state: i for i, state in enumerate(TORRENT_STATES)}
+
+# the old formatter compared lowercase names, so keep accepting any casing
+_TORRENT_STATE_LOWER_TO_CODE: dict[str, int] = {
+    state.lower(): i for i, state in enumerate(TORRENT_STATES)
+}
+_TORRENT_STATE_LOWER_TO_CODE["stalled"] = TORRENT_STATE_TO_CODE["stalledDL"]
+
+_TORRENT_STATE_PRETTY = {
+    "stalledUP": "Seeding",
+    "stalledDL": "Stalled",
+    "downloading": "Downloading",
+    "pausedDL": "Paused",
+    "uploading": "Uploading",
+}
+
+# the status filters of the sidebar, a state can be in more than one, such as stalledUP
+TORRENT_STATE_FILTERS: dict[str, tuple[str, ...]] = {
+    "Downloading": (
+        "downloading",
+        "metaDL",
+        "forcedMetaDL",
+        "forcedDL",
+        "stalledDL",
+        "queuedDL",
+        "allocating",
+    ),
+    "Seeding": ("uploading", "forcedUP", "stalledUP", "queuedUP"),
+    "Completed": (
+        "uploading",
+        "pausedUP",
+        "stoppedUP",
+        "queuedUP",
+        "stalledUP",
+        "checkingUP",
+        "forcedUP",
+    ),
+    "Paused": ("pausedUP", "stoppedUP", "pausedDL", "stoppedDL"),
+    "Stalled": ("stalledUP", "stalledDL"),
+    "Checking": ("checkingUP", "checkingDL", "checkingResumeData"),
+    "Moving": ("moving",),
+    "Errored": ("error", "missingFiles"),
+}
+
+_TORRENT_STATE_CODE_FILTERS: tuple[frozenset[str], ...] = tuple(
+    frozenset(name for name, states in TORRENT_STATE_FILTERS.items() if state in states)
+    for state in TORRENT_STATES
+)
+
+TORRENT_STATE_LABELS = tuple(_TORRENT_STATE_PRETTY.get(state, state) for state in TORRENT_STATES)
+
+_TORRENT_STATE_LABELS_ARRAY = np.array(TORRENT_STATE_LABELS, dtype=object)
+
+# qBittorrent file priorities go from 0 to 7, anything in between has no name
+FILE_PRIORITY_LABELS = tuple(
+    {
+        CC.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD: "Do Not Download",
+        CC.TORRENT_FILE_PRIORITY_NORMAL: "Normal",
+        CC.TORRENT_FILE_PRIORITY_HIGH: "High",
+        CC.TORRENT_FILE_PRIORITY_MAXIMUM: "Maximum",
+    }.get(i, "Unknown")
+    for i in range(CC.TORRENT_FILE_PRIORITY_MAXIMUM + 1)
+)
+
+FILE_PRIORITY_UNKNOWN_LABEL = "Unknown"
+
+# one extra slot at the end for anything out of range
+_FILE_PRIORITY_LABELS_ARRAY = np.array(
+    FILE_PRIORITY_LABELS + (FILE_PRIORITY_UNKNOWN_LABEL,), dtype=object
+)
+
+
+@functools.lru_cache(maxsize=SIZE_FORMAT_CACHE_SIZE)
+def _size_bytes_to_pretty_str(size_bytes: int) -> str:
+    if size_bytes == 0:
+        return "0B"
+
+    magnitude = -size_bytes if size_bytes < 0 else size_bytes
+
+    unit = (magnitude.bit_length() - 1) // 10
+
+    if unit >= len(SIZE_UNITS):
+        unit = len(SIZE_UNITS) - 1
+
+    s = round(magnitude / SIZE_DIVISORS[unit], 2)
+
+    if size_bytes < 0:
+        s *= -1
+
+    return "%s %s" % (s, SIZE_UNITS[unit])
+
+
+def size_bytes_to_pretty_str(size_bytes: int) -> str:
+    """
+    Formats a byte count as a human readable string, such as 1.5 KB
+
+    The unit is picked from the bit length of the value, so there is no float math until the final division
+    """
+    return _size_bytes_to_pretty_str(int(size_bytes))
+
+
+def torrent_state_to_code(state: str) -> int:
+    """
+    Gets the state code of a torrent state string, unknown states give TORRENT_STATE_UNKNOWN
+    """
+    code = TORRENT_STATE_TO_CODE.get(state, None)
+
+    if code is None:
+        code = _TORRENT_STATE_LOWER_TO_CODE.get(state.lower(), TORRENT_STATE_UNKNOWN)
+
+    return code
+
+
+def torrent_state_to_filters(state: str) -> frozenset[str]:
+    """
+    Gets the names of the TORRENT_STATE_FILTERS a torrent state string is in
+    """
+    return _TORRENT_STATE_CODE_FILTERS[torrent_state_to_code(state)]
+
+
+@functools.lru_cache(maxsize=1 << 12)
+def tracker_to_host(tracker: str) -> str:
+    """
+    Gets the host of a tracker url, '' when there is no tracker
+    """
+    if not tracker:
+        return ""
+
+    return urllib.parse.urlsplit(tracker).hostname or tracker
+
+
+def torrent_state_to_pretty(state: str) -> str:
+    """
+    Gets the display label of a torrent state string, unknown states are returned as is
+    """
+    code = TORRENT_STATE_TO_CODE.get(state, None)
+
+    if code is None:
+        code = _TORRENT_STATE_LOWER_TO_CODE.get(state.lower(), None)
+
+        if code is None:
+            return state
+
+    return TORRENT_STATE_LABELS[code]
+
+
+def get_pretty_download_priority(priority: int) -> str:
+    """
+    Gets the display label of a file download priority
+    """
+    if 0 <= priority < len(FILE_PRIORITY_LABELS):
+        return FILE_PRIORITY_LABELS[priority]
+
+    return FILE_PRIORITY_UNKNOWN_LABEL
+
+
+def progress_to_pretty_str(progress: float, precision: int = 2) -> str:
+    return f"{progress * 100:.{precision}f}%"
+
+
+def format_sizes(sizes: np.ndarray) -> list[str]:
+    """
+    Formats a whole column of byte counts at once, through the same memoized formatter as
+    size_bytes_to_pretty_str, so a refreshed column is mostly cache hits
+    """
+    return list(map(_size_bytes_to_pretty_str, np.asarray(sizes, dtype=np.int64).tolist()))
+
+
+def format_progresses(progresses: np.ndarray, precision: int = 2) -> list[str]:
+    """
+    Formats a whole column of 0..1 progress values as percentages
+    """
+    progresses = np.asarray(progresses, dtype=np.float64)
+
+    return [f"{p:.{precision}f}%" for p in (progresses * 100).tolist()]
+
+
+def format_torrent_states(state_codes: np.ndarray) -> list[str]:
+    """
+    Formats a whole column of state codes, see torrent_state_to_code
+    """
+    state_codes = np.asarray(state_codes, dtype=np.intp)
+
+    state_codes = np.where(
+        (state_codes < 0) | (state_codes >= len(TORRENT_STATES)), TORRENT_STATE_UNKNOWN, state_codes
+    )
+
+    return _TORRENT_STATE_LABELS_ARRAY[state_codes].tolist()
+
+
+def format_download_priorities(priorities: np.ndarray) -> list[str]:
+    """
+    Formats a whole column of file download priorities
+    """
+    priorities = np.asarray(priorities, dtype=np.intp)
+
+    priorities = np.where(
+        (priorities < 0) | (priorities >= len(FILE_PRIORITY_LABELS)),
+        len(FILE_PRIORITY_LABELS),
+        priorities,
+    )
+
+    return _FILE_PRIORITY_LABELS_ARRAY[priorities].tolist()
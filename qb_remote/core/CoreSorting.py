@@ -0,0 +1,47 @@
+import re
+
+import numpy as np
+
+_NATURAL_DIGITS_REGEX = re.compile(r"\d+")
+
+# digit runs are padded to this width, which covers any number that fits in 64 bits
+_NATURAL_DIGITS_WIDTH = 20
+
+
+def _pad_digits(match: re.Match) -> str:
+    return match.group().rjust(_NATURAL_DIGITS_WIDTH, "0")
+
+
+def natural_sort_key(text: str) -> str:
+    """
+    Gets a case-insensitive natural order key, so 'Episode 9' sorts before 'episode 10'
+
+    Digit runs are zero padded, so the key is a plain string and compares at C speed
+    """
+    return _NATURAL_DIGITS_REGEX.sub(_pad_digits, text.casefold())
+
+
+def natural_sort_ranks(names: list[str]) -> np.ndarray:
+    """
+    Gets the position of every name in natural order, so names can be sorted as plain integers afterwards
+    """
+    keys = [natural_sort_key(name) for name in names]
+
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+
+    ranks = np.empty(len(keys), dtype=np.int32)
+    ranks[order] = np.arange(len(keys), dtype=np.int32)
+
+    return ranks
+
+
+def argsort_keys(keys: np.ndarray, descending: bool = False) -> np.ndarray:
+    """
+    Gets the stable sorting order of a key column
+    """
+    order = np.argsort(keys, kind="stable")
+
+    if descending:
+        return order[::-1]
+
+    return order
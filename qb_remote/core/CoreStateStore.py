@@ -0,0 +1,627 @@
+import functools
+import threading
+from typing import Iterable, Mapping
+
+import numpy as np
+
+from . import CoreFormatting as CF
+from . import CoreSorting
+
+
+# torrents share a handful of tag strings, categories and trackers, so their parsed values are shared too
+INDEX_VALUE_CACHE_SIZE = 1 << 12
+
+
+def parse_tags(tags) -> frozenset[str]:
+    """
+    Parses the comma separated tags of a torrent, qBittorrent sends them as 'a, b'
+    """
+    if not tags:
+        return frozenset()
+
+    if isinstance(tags, str):
+        return _parse_tag_string(tags)
+
+    return frozenset(tag for tag in (tag.strip() for tag in tags) if tag)
+
+
+@functools.lru_cache(maxsize=INDEX_VALUE_CACHE_SIZE)
+def _parse_tag_string(tags: str) -> frozenset[str]:
+    return frozenset(tag for tag in (tag.strip() for tag in tags.split(",")) if tag)
+
+
+@functools.lru_cache(maxsize=INDEX_VALUE_CACHE_SIZE)
+def _single_value(value: str) -> frozenset[str]:
+    return frozenset((value,))
+
+
+class Torrent_State_Store(object):
+    """
+    Columnar store of every torrent the client knows about, keyed by torrent hash
+
+    Numeric fields are kept in numpy columns so they can be sorted and filtered without touching the GUI,
+    rows are kept dense, so removing a torrent moves the last row into its place
+
+    Tags, categories, status filters and tracker hosts are indexed both ways, so finding the torrents
+    with a tag is a set lookup and the sidebar counts are the sizes of those sets
+    """
+
+    # torrent field -> how to turn its value into the index values
+    INDEXED_FIELDS = {
+        "tags": parse_tags,
+        "category": lambda category: _single_value(category or ""),
+        "state": CF.torrent_state_to_filters,
+        "tracker": lambda tracker: _single_value(CF.tracker_to_host(tracker)),
+    }
+
+    COLUMN_TYPES = {
+        "size": np.int64,
+        "progress": np.float64,
+        "state": np.int16,
+        "ratio": np.float64,
+        "availability": np.float64,
+        "dlspeed": np.int64,
+        "upspeed": np.int64,
+        "added_on": np.int64,
+    }
+
+    # what a snapshot keeps of every torrent, the speeds are left out since they are stale right away
+    SNAPSHOT_FIELDS = (
+        "hash",
+        "name",
+        "size",
+        "progress",
+        "state",
+        "ratio",
+        "availability",
+        "added_on",
+        "category",
+        "tags",
+        "tracker",
+    )
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+
+        self._capacity: int = capacity
+
+        self._hash_to_row: dict[str, int] = {}
+        self._hashes: list[str] = []
+        self._names: list[str] = []
+        self._folded_names: list[str] = []
+        self._torrents: list[dict] = []
+
+        self._columns: dict[str, np.ndarray] = {
+            column: np.zeros(capacity, dtype=dtype) for column, dtype in self.COLUMN_TYPES.items()
+        }
+
+        self._name_ranks: np.ndarray = None
+
+        # torrent field -> value -> hashes, and torrent field -> hash -> values
+        self._index: dict[str, dict[str, set[str]]] = {field: {} for field in self.INDEXED_FIELDS}
+        self._hash_index: dict[str, dict[str, frozenset[str]]] = {
+            field: {} for field in self.INDEXED_FIELDS
+        }
+
+        # every category and tag the server has, including the ones without torrents
+        self._categories: dict[str, dict] = {}
+        self._tags: set[str] = set()
+
+        # set once a full sync/maindata update has brought every category and tag
+        self._has_categories_and_tags: bool = False
+
+        # set once the categories are known, from a full update or set_categories
+        self._has_categories: bool = False
+
+        # set while the torrents are from a snapshot, until a full torrent list replaces them
+        self._is_stale: bool = False
+
+        self._index_version: int = 0
+
+        # bumped on every change, so anything holding row numbers can tell they are stale
+        self._version: int = 0
+
+        # only bumped when rows move or names change, which is what name lookups depend on
+        self._names_version: int = 0
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _grow_unsafe(self, needed: int):
+        if needed <= self._capacity:
+            return
+
+        capacity = self._capacity
+
+        while capacity < needed:
+            capacity *= 2
+
+        for column, values in self._columns.items():
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[: len(self._hashes)] = values[: len(self._hashes)]
+            self._columns[column] = grown
+
+        self._capacity = capacity
+
+    def _set_row_values_unsafe(self, row: int, values: Mapping):
+        for column in self.COLUMN_TYPES:
+            if column not in values:
+                continue
+
+            value = values[column]
+
+            if column == "state":
+                value = CF.torrent_state_to_code(value)
+
+            self._columns[column][row] = value
+
+        if "name" in values:
+            self._names[row] = values["name"]
+            self._folded_names[row] = values["name"].casefold()
+            self._name_ranks = None
+            self._names_version += 1
+
+        for field, parse in self.INDEXED_FIELDS.items():
+            if field in values:
+                self._set_index_values_unsafe(field, self._hashes[row], parse(values[field]))
+
+    def _set_index_values_unsafe(self, field: str, torrent_hash: str, values: frozenset[str]):
+        hash_index = self._hash_index[field]
+
+        old_values = hash_index.get(torrent_hash, None)
+
+        if old_values == values:
+            return
+
+        index = self._index[field]
+
+        if old_values:
+            for value in old_values:
+                if value in values:
+                    continue
+
+                hashes = index[value]
+                hashes.discard(torrent_hash)
+
+                if not hashes:
+                    del index[value]
+
+        for value in values:
+            if old_values and value in old_values:
+                continue
+
+            hashes = index.get(value, None)
+
+            if hashes is None:
+                index[value] = {torrent_hash}
+            else:
+                hashes.add(torrent_hash)
+
+        hash_index[torrent_hash] = values
+
+        self._index_version += 1
+
+    def _add_torrent_unsafe(self, torrent_hash: str, values: Mapping):
+        row = len(self._hashes)
+
+        self._grow_unsafe(row + 1)
+
+        torrent = dict(values)
+        torrent["hash"] = torrent_hash
+
+        self._hash_to_row[torrent_hash] = row
+        self._hashes.append(torrent_hash)
+        self._names.append("")
+        self._folded_names.append("")
+        self._torrents.append(torrent)
+
+        for column_values in self._columns.values():
+            column_values[row] = 0
+
+        self._set_row_values_unsafe(row, torrent)
+
+    def _remove_torrent_unsafe(self, torrent_hash: str):
+        for field in self.INDEXED_FIELDS:
+            self._set_index_values_unsafe(field, torrent_hash, frozenset())
+            self._hash_index[field].pop(torrent_hash, None)
+
+        row = self._hash_to_row.pop(torrent_hash)
+
+        last = len(self._hashes) - 1
+
+        if row != last:
+            moved_hash = self._hashes[last]
+
+            self._hash_to_row[moved_hash] = row
+            self._hashes[row] = moved_hash
+            self._names[row] = self._names[last]
+            self._folded_names[row] = self._folded_names[last]
+            self._torrents[row] = self._torrents[last]
+
+            for values in self._columns.values():
+                values[row] = values[last]
+
+        self._hashes.pop()
+        self._names.pop()
+        self._folded_names.pop()
+        self._torrents.pop()
+
+        self._name_ranks = None
+        self._names_version += 1
+
+    def get_lock(self):
+        """
+        Gets the store threadlock
+        """
+        return self._lock
+
+    def get_version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get_names_version(self) -> int:
+        with self._lock:
+            return self._names_version
+
+    def has_torrent(self, torrent_hash: str) -> bool:
+        with self._lock:
+            return torrent_hash in self._hash_to_row
+
+    def get_torrent(self, torrent_hash: str) -> dict | None:
+        """
+        Gets a copy of everything known about the torrent, or None
+        """
+        with self._lock:
+            row = self._hash_to_row.get(torrent_hash, None)
+
+            if row is None:
+                return None
+
+            return dict(self._torrents[row])
+
+    def get_hashes(self) -> list[str]:
+        with self._lock:
+            return list(self._hashes)
+
+    def get_names(self) -> list[str]:
+        with self._lock:
+            return list(self._names)
+
+    def get_name_table(self) -> tuple[int, list[str], list[str], list[str]]:
+        """
+        Gets the names version along with copies of the hashes, names and case-folded names, all in row order
+        """
+        with self._lock:
+            return (
+                self._names_version,
+                list(self._hashes),
+                list(self._names),
+                list(self._folded_names),
+            )
+
+    def get_index_version(self) -> int:
+        """
+        Gets a number that changes whenever the tags or categories of any torrent change
+        """
+        with self._lock:
+            return self._index_version
+
+    def get_torrent_tags(self, torrent_hash: str) -> frozenset[str] | None:
+        """
+        Gets the tags of a torrent, or None if the torrent is not in the store
+        """
+        with self._lock:
+            if torrent_hash not in self._hash_to_row:
+                return None
+
+            return self._hash_index["tags"].get(torrent_hash, frozenset())
+
+    def torrent_has_tag(self, torrent_hash: str, tag: str) -> bool:
+        with self._lock:
+            return torrent_hash in self._index["tags"].get(tag, ())
+
+    def get_tag_hashes(self, tag: str) -> set[str]:
+        with self._lock:
+            return set(self._index["tags"].get(tag, ()))
+
+    def get_category_hashes(self, category: str) -> set[str]:
+        """
+        Gets the hashes of the torrents in a category, '' is the torrents without one
+        """
+        with self._lock:
+            return set(self._index["category"].get(category, ()))
+
+    def _get_index_counts_unsafe(self, field: str, within: set[str] | None) -> dict[str, int]:
+        if within is None:
+            return {value: len(hashes) for value, hashes in self._index[field].items()}
+
+        return {
+            value: len(hashes.intersection(within)) for value, hashes in self._index[field].items()
+        }
+
+    def get_tag_counts(self, within: set[str] | None = None) -> dict[str, int]:
+        """
+        Gets how many torrents have each tag, known tags without torrents count 0,
+        only the torrents in within are counted if it is given
+        """
+        with self._lock:
+            counts = dict.fromkeys(self._tags, 0)
+            counts.update(self._get_index_counts_unsafe("tags", within))
+
+            return counts
+
+    def get_category_counts(self, within: set[str] | None = None) -> dict[str, int]:
+        """
+        Gets how many torrents are in each category, '' counts the torrents without one,
+        only the torrents in within are counted if it is given
+        """
+        with self._lock:
+            counts = dict.fromkeys(self._categories, 0)
+            counts.update(self._get_index_counts_unsafe("category", within))
+
+            return counts
+
+    def get_index_counts(self, field: str, within: set[str] | None = None) -> dict[str, int]:
+        """
+        Gets how many torrents have each value of an indexed field,
+        only the torrents in within are counted if it is given
+        """
+        with self._lock:
+            return self._get_index_counts_unsafe(field, within)
+
+    def get_index_hashes(self, field: str, values: Iterable[str]) -> set[str]:
+        """
+        Gets the hashes of the torrents that have any of the values of an indexed field
+        """
+        with self._lock:
+            index = self._index[field]
+
+            hashes = set()
+
+            for value in values:
+                hashes.update(index.get(value, ()))
+
+            return hashes
+
+    def get_categories(self) -> dict[str, dict]:
+        """
+        Gets the categories from sync/maindata, name -> {'name', 'savePath'}
+        """
+        with self._lock:
+            return {name: dict(category) for name, category in self._categories.items()}
+
+    def get_tags(self) -> list[str]:
+        with self._lock:
+            return sorted(self._tags)
+
+    def has_categories_and_tags(self) -> bool:
+        """
+        Gets whether the categories and tags are known, rather than just empty
+        """
+        with self._lock:
+            return self._has_categories_and_tags
+
+    def has_categories(self) -> bool:
+        """
+        Gets whether the categories are known, rather than just empty
+        """
+        with self._lock:
+            return self._has_categories
+
+    def set_categories(self, categories: Mapping[str, Mapping]):
+        """
+        Replaces the categories, such as with the result of torrents_categories
+        """
+        with self._lock:
+            self._categories = {name: dict(category) for name, category in categories.items()}
+            self._has_categories = True
+            self._index_version += 1
+
+    def is_stale(self) -> bool:
+        """
+        Gets whether the torrents are from a snapshot that no full update has replaced yet
+        """
+        with self._lock:
+            return self._is_stale
+
+    def get_snapshot(self, within: set[str] | None = None) -> dict:
+        """
+        Gets the torrents, categories and tags as a json friendly dict, with one list per field,
+        only the torrents in within are kept if it is given
+        """
+        with self._lock:
+            torrents = self._torrents
+
+            if within is not None:
+                torrents = [torrent for torrent in torrents if torrent["hash"] in within]
+
+            return {
+                "version": self.SNAPSHOT_VERSION,
+                "fields": list(self.SNAPSHOT_FIELDS),
+                "columns": [
+                    [torrent.get(field, None) for torrent in torrents]
+                    for field in self.SNAPSHOT_FIELDS
+                ],
+                "categories": {name: dict(c) for name, c in self._categories.items()},
+                "tags": sorted(self._tags),
+            }
+
+    def load_snapshot(self, snapshot: Mapping) -> int:
+        """
+        Fills the store from get_snapshot, it is stale until apply_maindata or set_torrents brings
+        the full torrent list, returns how many torrents were loaded
+
+        Throws ValueError if the snapshot is from another version
+        """
+        if snapshot.get("version", None) != self.SNAPSHOT_VERSION:
+            raise ValueError(f"Unknown state snapshot version {snapshot.get('version', None)}")
+
+        fields = snapshot["fields"]
+
+        torrents = {}
+
+        for values in zip(*snapshot["columns"]):
+            torrent = {field: value for field, value in zip(fields, values) if value is not None}
+
+            torrents[torrent["hash"]] = torrent
+
+        self.update_torrents(torrents)
+
+        with self._lock:
+            self._categories = {
+                name: dict(category) for name, category in snapshot.get("categories", {}).items()
+            }
+            self._tags = set(snapshot.get("tags", ()))
+
+            self._is_stale = True
+            self._index_version += 1
+
+        return len(torrents)
+
+    def get_column(self, column: str) -> np.ndarray:
+        """
+        Gets a copy of a numeric column, in the same row order as get_hashes
+        """
+        with self._lock:
+            return self._columns[column][: len(self._hashes)].copy()
+
+    def update_torrents(self, torrents: Mapping[str, Mapping]) -> tuple[list[str], list[str]]:
+        """
+        Merges (partial) torrent info into the store, adding torrents that are not there yet
+
+        Returns the added and updated hashes
+        """
+        added = []
+        updated = []
+
+        with self._lock:
+            for torrent_hash, values in torrents.items():
+                row = self._hash_to_row.get(torrent_hash, None)
+
+                if row is None:
+                    self._add_torrent_unsafe(torrent_hash, values)
+                    added.append(torrent_hash)
+                    continue
+
+                self._torrents[row].update(values)
+                self._set_row_values_unsafe(row, values)
+                updated.append(torrent_hash)
+
+            if added or updated:
+                self._version += 1
+
+        return added, updated
+
+    def remove_torrents(self, torrent_hashes: Iterable[str]) -> list[str]:
+        """
+        Removes torrents from the store, returns the hashes that were actually removed
+        """
+        removed = []
+
+        with self._lock:
+            for torrent_hash in torrent_hashes:
+                if torrent_hash not in self._hash_to_row:
+                    continue
+
+                self._remove_torrent_unsafe(torrent_hash)
+                removed.append(torrent_hash)
+
+            if removed:
+                self._version += 1
+
+        return removed
+
+    def set_torrents(self, torrents: Iterable[Mapping]) -> tuple[list[str], list[str], list[str]]:
+        """
+        Replaces the store contents with a full torrent list, such as the result of torrents_info
+
+        Returns the added, updated and removed hashes
+        """
+        torrents = {torrent["hash"]: torrent for torrent in torrents}
+
+        removed = self.remove_torrents([h for h in self.get_hashes() if h not in torrents])
+
+        added, updated = self.update_torrents(torrents)
+
+        with self._lock:
+            self._is_stale = False
+
+        return added, updated, removed
+
+    def apply_maindata(self, maindata: Mapping) -> tuple[list[str], list[str], list[str]]:
+        """
+        Applies a sync/maindata response to the store
+
+        Returns the added, updated and removed hashes
+        """
+        torrents = maindata.get("torrents", None) or {}
+
+        full_update = maindata.get("full_update", False)
+
+        if full_update:
+            removed = self.remove_torrents([h for h in self.get_hashes() if h not in torrents])
+
+        else:
+            removed = self.remove_torrents(maindata.get("torrents_removed", None) or [])
+
+        added, updated = self.update_torrents(torrents)
+
+        if full_update:
+            with self._lock:
+                self._is_stale = False
+
+        self._apply_categories_and_tags(maindata, full_update)
+
+        return added, updated, removed
+
+    def _apply_categories_and_tags(self, maindata: Mapping, full_update: bool):
+        categories = maindata.get("categories", None) or {}
+        categories_removed = maindata.get("categories_removed", None) or []
+        tags = maindata.get("tags", None) or []
+        tags_removed = maindata.get("tags_removed", None) or []
+
+        if not (full_update or categories or categories_removed or tags or tags_removed):
+            return
+
+        with self._lock:
+            if full_update:
+                self._categories = {}
+                self._tags = set()
+                self._has_categories_and_tags = True
+                self._has_categories = True
+
+            for name, category in categories.items():
+                # changed categories only send what changed
+                self._categories.setdefault(name, {"name": name}).update(category)
+
+            for name in categories_removed:
+                self._categories.pop(name, None)
+
+            self._tags.update(tags)
+            self._tags.difference_update(tags_removed)
+
+            self._index_version += 1
+
+    def get_sorted_hashes(self, column: str, descending: bool = False) -> list[str]:
+        """
+        Gets every hash ordered by a numeric column, or by natural name order when column is 'name'
+        """
+        with self._lock:
+            count = len(self._hashes)
+
+            if column == "name":
+                if self._name_ranks is None:
+                    self._name_ranks = CoreSorting.natural_sort_ranks(self._names)
+
+                keys = self._name_ranks
+
+            else:
+                keys = self._columns[column][:count]
+
+            order = CoreSorting.argsort_keys(keys, descending)
+
+            hashes = self._hashes
+
+            return [hashes[i] for i in order.tolist()]
@@ -0,0 +1,144 @@
+import re
+
+from . import CoreFileRules
+from . import CoreStateStore
+
+FILTER_MODE_SUBSTRING = "substring"
+FILTER_MODE_TOKENS = "tokens"
+FILTER_MODE_REGEX = "regex"
+
+FILTER_MODES = (FILTER_MODE_SUBSTRING, FILTER_MODE_TOKENS, FILTER_MODE_REGEX)
+
+
+class Torrent_Name_Filter(object):
+    """
+    Filters the torrents of a state store by name, meant to be called on every keystroke
+
+    Keeps a copy of the case-folded name table until the store names change, and when the new query only
+    extends the previous one, only the previous matches are searched again
+    """
+
+    def __init__(self, state_store: CoreStateStore.Torrent_State_Store):
+        self._state_store = state_store
+
+        self._names_version: int = -1
+        self._hashes: list[str] = []
+        self._names: list[str] = []
+        self._folded_names: list[str] = []
+
+        self._last_query: str = ""
+        self._last_mode: str = None
+        self._last_rows: list[int] = None
+
+    def _refresh_name_table(self):
+        names_version = self._state_store.get_names_version()
+
+        if names_version == self._names_version:
+            return
+
+        hashes = self._hashes
+        names = self._names
+
+        (
+            self._names_version,
+            self._hashes,
+            self._names,
+            self._folded_names,
+        ) = self._state_store.get_name_table()
+
+        if self._last_rows is None:
+            return
+
+        if self._hashes != hashes:
+            # row numbers from before are meaningless now
+            self._last_rows = None
+            return
+
+        # only names changed, so the last query is applied again to the renamed rows
+        renamed = [i for i, (old, new) in enumerate(zip(names, self._names)) if old != new]
+
+        if not renamed:
+            return
+
+        rows = set(self._last_rows).difference(renamed)
+        rows.update(self._search_rows(self._last_query, self._last_mode, renamed))
+
+        self._last_rows = sorted(rows)
+
+    def _search_rows(self, query: str, mode: str, rows: list[int] | None) -> list[int]:
+        if mode == FILTER_MODE_REGEX:
+            # same as the file rules, any uppercase letter outside an escape makes it case sensitive
+            if CoreFileRules.has_uppercase(query):
+                search = re.compile(query).search
+            else:
+                search = re.compile(query, re.IGNORECASE).search
+
+            names = self._names
+
+            if rows is None:
+                return [i for i, name in enumerate(names) if search(name)]
+
+            return [i for i in rows if search(names[i])]
+
+        folded_names = self._folded_names
+
+        if mode == FILTER_MODE_TOKENS:
+            tokens = query.casefold().split()
+
+            if rows is None:
+                return [
+                    i
+                    for i, name in enumerate(folded_names)
+                    if all(token in name for token in tokens)
+                ]
+
+            return [i for i in rows if all(token in folded_names[i] for token in tokens)]
+
+        query = query.casefold()
+
+        if rows is None:
+            return [i for i, name in enumerate(folded_names) if query in name]
+
+        return [i for i in rows if query in folded_names[i]]
+
+    def reset(self):
+        self._last_query = ""
+        self._last_mode = None
+        self._last_rows = None
+
+    def filter(self, query: str, mode: str = FILTER_MODE_SUBSTRING) -> set[str] | None:
+        """
+        Gets the hashes of the torrents whose name matches the query, or None if the query is empty
+
+        Throws re.error for a bad regex
+        """
+        if mode not in FILTER_MODES:
+            raise ValueError(f"Unknown filter mode {mode}")
+
+        if not query.strip():
+            self.reset()
+            return None
+
+        self._refresh_name_table()
+
+        rows = None
+
+        # a longer query can only match a subset of what the shorter one matched,
+        # this does not hold for regex, where 'a' -> 'a|b' matches more
+        if (
+            self._last_rows is not None
+            and mode == self._last_mode
+            and mode != FILTER_MODE_REGEX
+            and query.startswith(self._last_query)
+        ):
+            rows = self._last_rows
+
+        rows = self._search_rows(query, mode, rows)
+
+        self._last_query = query
+        self._last_mode = mode
+        self._last_rows = rows
+
+        hashes = self._hashes
+
+        return {hashes[i] for i in rows}
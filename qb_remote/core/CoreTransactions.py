@@ -0,0 +1,196 @@
+import logging
+import threading
+from typing import Callable, Iterable
+
+import qbittorrentapi
+
+from . import CoreConstants as CC
+
+# torrent hash, {priority: file ids} that were applied, {priority: file ids} that gave up
+Priority_Transaction_Listener = Callable[[str, dict[int, list[int]], dict[int, list[int]]], None]
+
+
+def group_by_priority(file_priorities: dict[int, int]) -> dict[int, list[int]]:
+    """
+    Turns file id -> priority into priority -> sorted file ids, one request per priority
+    """
+    groups: dict[int, list[int]] = {}
+
+    for file_id, priority in file_priorities.items():
+        group = groups.get(priority, None)
+
+        if group is None:
+            groups[priority] = [file_id]
+        else:
+            group.append(file_id)
+
+    for group in groups.values():
+        group.sort()
+
+    return groups
+
+
+def chunk_ids(file_ids: list[int], chunk_size: int) -> Iterable[list[int]]:
+    for i in range(0, len(file_ids), chunk_size):
+        yield file_ids[i : i + chunk_size]
+
+
+class File_Priority_Transactions(object):
+    """
+    Collects file priority changes per torrent and sends them together after a short delay
+
+    Every file keeps only the last priority it was given, the changes are sent as one request per priority,
+    split into request sized batches. Batches that fail are retried with a growing delay, unless the file
+    was given a newer priority in the meantime
+    """
+
+    def __init__(
+        self,
+        controller,
+        delay: float = CC.FILE_PRIORITY_TRANSACTION_DELAY_SECONDS,
+        batch_size: int = CC.FILE_PRIORITY_TRANSACTION_BATCH_SIZE,
+        max_retries: int = CC.FILE_PRIORITY_TRANSACTION_MAX_RETRIES,
+    ):
+        self._controller = controller
+
+        self._delay: float = delay
+        self._batch_size: int = batch_size
+        self._max_retries: int = max_retries
+
+        self._lock = threading.Lock()
+
+        # torrent hash -> file id -> priority
+        self._pending: dict[str, dict[int, int]] = {}
+
+        # torrent hash -> how many times in a row committing it failed
+        self._attempts: dict[str, int] = {}
+
+        self._scheduled: set[str] = set()
+
+        self._listeners: list[Priority_Transaction_Listener] = []
+
+    def add_listener(self, listener: Priority_Transaction_Listener):
+        """
+        Adds a callable that is told about every finished commit, it is called from a worker thread
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _schedule_unsafe(self, torrent_hash: str, delay: float):
+        if torrent_hash in self._scheduled:
+            return
+
+        self._scheduled.add(torrent_hash)
+
+        self._controller.call_later(delay, self.commit, torrent_hash)
+
+    def add(self, torrent_hash: str, file_ids: Iterable[int], priority: int):
+        """
+        Adds a priority change to the transaction of a torrent, it is committed after the delay
+        """
+        with self._lock:
+            pending = self._pending.setdefault(torrent_hash, {})
+
+            for file_id in file_ids:
+                pending[int(file_id)] = priority
+
+            self._schedule_unsafe(torrent_hash, self._delay)
+
+    def get_pending(self, torrent_hash: str) -> dict[int, int]:
+        """
+        Gets a copy of the file id -> priority changes that have not been sent yet
+        """
+        with self._lock:
+            return dict(self._pending.get(torrent_hash, {}))
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def commit(self, torrent_hash: str):
+        """
+        Sends the pending changes of a torrent right away
+        """
+        with self._lock:
+            self._scheduled.discard(torrent_hash)
+
+            pending = self._pending.pop(torrent_hash, None)
+
+        if not pending:
+            return
+
+        committed: dict[int, list[int]] = {}
+        failed: dict[int, list[int]] = {}
+        retry: dict[int, list[int]] = {}
+
+        for priority, file_ids in group_by_priority(pending).items():
+            for batch in chunk_ids(file_ids, self._batch_size):
+                try:
+                    logging.info(
+                        f"Updating priority of {len(batch)} files to {priority} for {torrent_hash}"
+                    )
+
+                    self._controller.qbittorrent.torrents_file_priority(
+                        torrent_hash, batch, priority
+                    )
+
+                    committed.setdefault(priority, []).extend(batch)
+
+                except qbittorrentapi.NotFound404Error:
+                    # the torrent is gone, retrying will not help
+                    logging.warning(f"Could not find torrent with hash: {torrent_hash}")
+
+                    failed.setdefault(priority, []).extend(batch)
+
+                except (qbittorrentapi.APIError, qbittorrentapi.APIConnectionError) as e:
+                    logging.warning(f"Updating file priorities for {torrent_hash} failed: {e}")
+
+                    retry.setdefault(priority, []).extend(batch)
+
+        with self._lock:
+            if retry:
+                self._retry_unsafe(torrent_hash, retry, failed)
+
+            elif not failed:
+                self._attempts.pop(torrent_hash, None)
+
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(torrent_hash, committed, failed)
+
+            except Exception as e:
+                logging.error(e)
+
+    def _retry_unsafe(self, torrent_hash: str, retry: dict[int, list[int]], failed: dict):
+        attempts = self._attempts.get(torrent_hash, 0) + 1
+
+        if attempts > self._max_retries:
+            self._attempts.pop(torrent_hash, None)
+
+            for priority, file_ids in retry.items():
+                failed.setdefault(priority, []).extend(file_ids)
+
+            return
+
+        self._attempts[torrent_hash] = attempts
+
+        pending = self._pending.setdefault(torrent_hash, {})
+
+        # anything changed again since the batch was taken already has a newer priority
+        for priority, file_ids in retry.items():
+            for file_id in file_ids:
+                pending.setdefault(file_id, priority)
+
+        self._schedule_unsafe(torrent_hash, self._delay * (2**attempts))
+
+    def commit_all(self):
+        """
+        Sends every pending change right away, such as when shutting down
+        """
+        with self._lock:
+            torrent_hashes = list(self._pending)
+
+        for torrent_hash in torrent_hashes:
+            self.commit(torrent_hash)
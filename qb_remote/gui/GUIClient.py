@@ -18,17 +18,25 @@ from qtpy import QtGui as QG
 
 from ..core import CoreController 
 from ..core import CoreCaches as Cache
+from ..core import CoreFileTree
 from ..core import CoreGlobals as CG
 from ..core import CoreData as CD
 from ..core import CoreConstants as CC
+from ..core import CoreFormatting as CF
+from ..core import CoreTorrentFilter
 
 from . import GUICommon
 from . import GUITreeWidget
+from . import GUIFilterSidebar
 from . import dialogs
 from . import GUIThreading
 
 
 class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
+
+    # torrent hash, {priority: file ids} applied, {priority: file ids} that failed
+    file_priorities_committed = QC.Signal(str, object, object)
+
     def __init__(self):
         super().__init__()
 
@@ -38,7 +46,8 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
 
         self.metadata_sync_timer = QC.QTimer(self)
         self.metadata_sync_timer.timeout.connect(self._update_metadata)
-        self.metadata_sync_timer.start(CC.TORRENT_METADATA_SYNC_RATE_MS)
+        # slows down to TORRENT_METADATA_SYNC_RATE_MS once the first update is in
+        self.metadata_sync_timer.start(CC.TORRENT_METADATA_BOOT_SYNC_RATE_MS)
 
         self.setWindowTitle("qBittorrent Remote")
 
@@ -47,9 +56,24 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
         self.split_panel = QW.QSplitter(self.panel)
         self.split_panel.setOrientation(QC.Qt.Orientation.Vertical)
 
-        input_box = QW.QLineEdit()
-        input_box.setPlaceholderText("Regex for torrent name")
-        input_box.returnPressed.connect(self._search_pressed)
+        self.torrent_name_filter = CoreTorrentFilter.Torrent_Name_Filter(
+            self.CONTROLLER.torrent_state_store
+        )
+
+        self.input_box = QW.QLineEdit()
+        self.input_box.setPlaceholderText("Filter torrent names")
+        self.input_box.setClearButtonEnabled(True)
+        self.input_box.returnPressed.connect(self._search_pressed)
+        self.input_box.textChanged.connect(self._search_text_changed)
+
+        self.search_mode_dropdown = QW.QComboBox()
+        self.search_mode_dropdown.addItems(["Substring", "Tokens", "Regex"])
+        self.search_mode_dropdown.currentIndexChanged.connect(self._search_pressed)
+
+        self.search_timer = QC.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self._search_pressed)
+        self.SEARCH_TIMER_INTERVAL_MS = 100
 
         search_button = QW.QPushButton("Search")
         search_button.clicked.connect(self._search_pressed)
@@ -64,20 +88,29 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
         self.status_label = QW.QLabel(self.status_text_template)
         self.status_label.setAlignment(QC.Qt.AlignRight)
 
+        self.selection_text_template = "Selected: {}   Remaining: {}   {}"
+        self.selection_label = QW.QLabel()
+
+        self._free_space_on_disk: int = -1
+
         self.infite_progress_bar = GUICommon.InfiniteProgressBar(step_amount=-1)
         self.infite_progress_bar.setVisible(False)
 
         self.status_bar = QW.QStatusBar(self)
         self.status_bar.addWidget(self.status_label)
+        self.status_bar.addWidget(self.selection_label)
         self.status_bar.addWidget(self.infite_progress_bar)
 
 
 
+        self.filter_sidebar = GUIFilterSidebar.FilterSidebarTreeWidget(self.CONTROLLER)
+        self.filter_sidebar.filter_changed.connect(self._search_pressed)
+
         ### torrent list start
         self._torrent_list = GUITreeWidget.TorrentListTreeWidget()
         self._torrent_list.setContextMenuPolicy(QC.Qt.CustomContextMenu)
         self._torrent_list.setColumnCount(6)
-        self._torrent_list.setSortingEnabled(True)
+        self._torrent_list.enable_key_sorting()
         self._torrent_list.header().setSectionResizeMode(QW.QHeaderView.ResizeToContents)
         self._torrent_list.header().setStretchLastSection(False)
         self._torrent_list.setHeaderLabels(
@@ -86,11 +119,29 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
 
         
         self._torrent_list.itemSelectionChanged.connect(self._list_item_selection_changed)
+        self._torrent_list.verticalScrollBar().valueChanged.connect(self._torrent_list_scrolled)
+        self._torrent_list.header().sortIndicatorChanged.connect(self._torrent_list_sort_changed)
+
+        # how many torrents the pages loaded so far hold, and whether there are more,
+        # pages are in the list sort order so sorting never has to look past the loaded ones
+        self._torrent_page_offset: int = 0
+        self._has_more_torrent_pages: bool = True
+
+        # sync/maindata has no filters, its first full update is every torrent on the server,
+        # until it is in the pages are asked for with torrents_info, then they come from the store
+        self._torrent_pages_from_store: bool = False
+
+        # offset, limit, sort and reverse of the pages being fetched on a worker thread
+        self._torrent_page_request: tuple[int, int, str, bool] | None = None
+
+        # set while the list shows the torrents saved by the last run, until the first full update
+        self._showing_saved_torrents: bool = False
+        self._torrent_list_palette: QG.QPalette = self._torrent_list.palette()
         ### torrent list end
 
 
-        self.file_tree = GUITreeWidget.ExtendedQTreeWidget()
-        self.file_tree.setSortingEnabled(True)
+        self.file_tree = GUITreeWidget.TorrentFileTreeWidget()
+        self.file_tree.enable_key_sorting()
         self.file_tree.header().setSectionResizeMode(QW.QHeaderView.ResizeToContents)
         self.file_tree.header().setStretchLastSection(False)
         self.file_tree.setSelectionMode(QW.QAbstractItemView.ExtendedSelection)
@@ -107,6 +158,10 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
         toggle_action.triggered.connect(self._toggle_selected_files)
         menu.addAction(toggle_action)
 
+        select_by_rule_action = QW.QAction("Select By Rule...", menu)
+        select_by_rule_action.triggered.connect(self._select_files_by_rule)
+        menu.addAction(select_by_rule_action)
+
         self.file_tree.set_menu(menu)
 
 
@@ -117,6 +172,12 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
         self.add_torrent_file_action = self.file_menu.addAction("Add Torrent(s)")
         self.add_torrent_file_action.triggered.connect(self._handle_magnet_dialog)
 
+        self.find_files_action = self.file_menu.addAction("Find Files")
+        self.find_files_action.triggered.connect(self._open_file_search_dialog)
+
+        self.cache_stats_action = self.file_menu.addAction("Cache Stats")
+        self.cache_stats_action.triggered.connect(self._open_cache_stats_dialog)
+
         self.login_menu = self.file_menu.addAction("Connect")
         self.login_menu.triggered.connect(self.CONTROLLER.init_qbittorrent_connection)
         self.logout_menu = self.file_menu.addAction("Disconnect")
@@ -131,11 +192,17 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
 
         layout = QW.QVBoxLayout()
         layout_2 = QW.QHBoxLayout()
-        layout_2.addWidget(input_box)
+        layout_2.addWidget(self.input_box)
+        layout_2.addWidget(self.search_mode_dropdown)
         layout_2.addWidget(search_button)
         layout_2.addWidget(update_torrent_list_button)
         layout.addLayout(layout_2)
-        layout.addWidget(self.split_panel)
+        self.sidebar_split_panel = QW.QSplitter(QC.Qt.Orientation.Horizontal, self.panel)
+        self.sidebar_split_panel.addWidget(self.filter_sidebar)
+        self.sidebar_split_panel.addWidget(self.split_panel)
+        self.sidebar_split_panel.setStretchFactor(1, 1)
+
+        layout.addWidget(self.sidebar_split_panel)
         self.panel.setLayout(layout)
 
         self.setStatusBar(self.status_bar)
@@ -147,9 +214,20 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
 
         self._threads = []
 
-        self.torrent_tree_list_cache = Cache.Expiring_Data_Cache(
-            "tree list data cache", CC.TORRENT_CACHE_TIME_SECONDS
+        # transactions are committed on worker threads, the signal brings the result back to this one
+        self.file_priorities_committed.connect(self._on_file_priorities_committed)
+        self.CONTROLLER.file_priority_transactions.add_listener(self.file_priorities_committed.emit)
+
+        # trees keep their sort orderings, so they are refreshed in place rather than expired
+        self.torrent_tree_list_cache = Cache.Data_Cache(
+            "tree list data cache", max_bytes=CC.TORRENT_TREE_CACHE_MAX_BYTES
         )
+        self.CONTROLLER.register_cache(self.torrent_tree_list_cache)
+
+        if self.CONTROLLER.torrent_state_store.is_stale():
+            self._torrent_pages_from_store = True
+            self._load_torrent_list_from_store()
+            self._set_showing_saved_torrents(True)
 
         self._update_metadata()
 
@@ -158,12 +236,24 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
         if self.pause or not self.CONTROLLER.is_qbittorrent_ok():
             return
 
+        # the first page comes back well before the full update, which has every torrent
+        if not self._torrent_pages_from_store and self._torrent_page_offset == 0:
+            self.load_next_torrent_page()
+
         delta = self.CONTROLLER.get_metadata_delta()
 
 
         if not delta:
             return
 
+        if self.metadata_sync_timer.interval() != CC.TORRENT_METADATA_SYNC_RATE_MS:
+            self.metadata_sync_timer.setInterval(CC.TORRENT_METADATA_SYNC_RATE_MS)
+
+            # recorded once this update has been put in the list
+            QC.QTimer.singleShot(
+                0, lambda: self.CONTROLLER.record_boot_phase("first torrent list")
+            )
+
         server_state = delta.get("server_state", None)
 
         if server_state:
@@ -186,74 +276,127 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
             else:
                 CACHE.add_data(CACHE_KEY, server_state, True)
 
+            if self._free_space_on_disk != server_state.get("free_space_on_disk", -1):
+                self._free_space_on_disk = server_state.get("free_space_on_disk", -1)
+                self._update_selection_label()
 
             self.status_label.setText(
                 self.status_text_template.format(
-                    CD.size_bytes_to_pretty_str(server_state.get("free_space_on_disk", -1)),
+                    CF.size_bytes_to_pretty_str(server_state.get("free_space_on_disk", -1)),
                     server_state.get("dht_nodes","-1"),
-                    CD.size_bytes_to_pretty_str(server_state.get("dl_info_speed", -1)),
-                    CD.size_bytes_to_pretty_str(server_state.get("up_info_speed", -1)),
+                    CF.size_bytes_to_pretty_str(server_state.get("dl_info_speed", -1)),
+                    CF.size_bytes_to_pretty_str(server_state.get("up_info_speed", -1)),
                 )
                 + f"   RID: {delta.rid}"
             )
 
+        full_update = delta.get("full_update", False)
+
+        # the store has every torrent now, so the loaded pages, or the saved rows, come from it
+        if full_update:
+            self._torrent_pages_from_store = True
+            self._torrent_page_request = None
+
+            if self._showing_saved_torrents:
+                self._set_showing_saved_torrents(False)
+
         torrents = delta.get("torrents", {})
 
         torrents_removed = delta.get("torrents_removed", {})
 
-        if not torrents and not torrents_removed:
+        # torrents can move in or out of the selected sidebar entries
+        sidebar_changed = self.filter_sidebar.refresh_counts() and self.filter_sidebar.has_selection()
+
+        if not torrents and not torrents_removed and not full_update:
             return
 
-        existing_hashes = set()
-        items_to_remove = []
+        # every torrent is in a full update, the rows are reconciled with the store below instead
+        if full_update:
+            torrents = {}
 
-        for item in GUICommon.iter_qtreewidget_items(self._torrent_list):
-            torrent_hash = item.data(0, QC.Qt.UserRole)
+        removed = self._torrent_list.remove_torrent_items(torrents_removed)
 
-            if torrent_hash in torrents_removed:
-                items_to_remove.append(item)
+        # the pages after the loaded ones move up by the torrents removed from them
+        self._torrent_page_offset = max(0, self._torrent_page_offset - len(removed))
 
-                continue
+        new_items = {}
+
+        reload_pages = full_update
+
+        # rows whose sort column value changed
+        moved = []
+
+        renamed = False
+
+        # rows of torrents that lost the client tag in profile mode
+        filtered_out = []
+
+        sort_field, _ = self._get_torrent_page_order()
+
+        for torrent_hash, t in torrents.items():
+            item = self._torrent_list.get_torrent_item(torrent_hash)
+
+            if item is None:
+                # the delta only has what changed, the store has the whole torrent
+                metadata = self.CONTROLLER.torrent_state_store.get_torrent(torrent_hash) or t
+
+                if not self.CONTROLLER.torrent_passes_filter(metadata):
+                    continue
+
+                # with pages left it can sort into the loaded ones or past them
+                if self._has_more_torrent_pages:
+                    reload_pages = True
+                    continue
+
+                new_items[torrent_hash] = self.get_torrent_tree_widget_item(metadata)
 
-            if torrent_hash not in torrents:
                 continue
 
-            existing_hashes.add(torrent_hash)
+            if "tags" in t and not self.CONTROLLER.torrent_passes_filter(
+                self.CONTROLLER.torrent_state_store.get_torrent(torrent_hash) or t
+            ):
+                filtered_out.append(torrent_hash)
+                continue
 
-            t: dict = torrents[torrent_hash]
+            if sort_field in t:
+                moved.append(torrent_hash)
 
             if "name" in t:
                 item.setText(0, t.name)
+                renamed = True
             if "size" in t:
-                item.setText(1, CD.size_bytes_to_pretty_str(t.size))
+                item.setText(1, CF.size_bytes_to_pretty_str(t.size))
             if "progress" in t:
                 item.setText(2, f"{t.progress * 100:.2f}%")
             if "state" in t:
-                item.setText(3, CD.torrent_state_to_pretty(t.state))
+                item.setText(3, CF.torrent_state_to_pretty(t.state))
             if "ratio" in t:
                 item.setText(4, f"{t.ratio:.3f}")
             if "availability" in t:
                 item.setText(5, f"{t.availability:.3f}")
             if "dlspeed" in t:
-                item.setText(6, CD.size_bytes_to_pretty_str(t.dlspeed))
+                item.setText(6, CF.size_bytes_to_pretty_str(t.dlspeed))
             if "upspeed" in t:
-                item.setText(7, CD.size_bytes_to_pretty_str(t.upspeed))
+                item.setText(7, CF.size_bytes_to_pretty_str(t.upspeed))
 
-        _ = self._torrent_list.invisibleRootItem()
-        for item in items_to_remove:
-            _.removeChild(item)
+        if filtered_out:
+            removed = self._torrent_list.remove_torrent_items(filtered_out)
+            self._torrent_page_offset = max(0, self._torrent_page_offset - len(removed))
 
-        if len(existing_hashes) != len(torrents):
-            for hash in torrents.keys() - existing_hashes:
+        self._torrent_list.move_torrent_items(moved)
 
-                metadata = torrents[hash]
+        if new_items:
+            self._torrent_page_offset += len(new_items)
+            self._torrent_list.add_torrent_items(new_items)
 
-                if not self.CONTROLLER.torrent_passes_filter(metadata):
-                    continue
+        if reload_pages:
+            self._load_torrent_list_from_store()
 
-                item = self.get_torrent_tree_widget_item(metadata)
-                item.setData(0, QC.Qt.UserRole, hash)
-                self._torrent_list.insertTopLevelItem(0, item)
+        # a renamed torrent can start or stop matching the search
+        renamed = renamed and bool(self.input_box.text().strip())
+
+        if new_items or reload_pages or torrents_removed or sidebar_changed or renamed:
+            self._search_pressed()
 
     def _handle_magnet_dialog(self):
 
@@ -273,41 +416,153 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
 
         dialogs.SettingsDialog(self.CONTROLLER).exec_()
 
+    def _open_cache_stats_dialog(self):
+
+        dialog = dialogs.CacheStatsDialog(self.CONTROLLER, self)
+        dialog.setAttribute(QC.Qt.WA_DeleteOnClose)
+        dialog.show()
+
+    def _open_file_search_dialog(self):
+
+        dialog = dialogs.FileSearchDialog(self.CONTROLLER, self)
+        dialog.torrent_selected.connect(self._select_torrent)
+        dialog.setAttribute(QC.Qt.WA_DeleteOnClose)
+        dialog.show()
+
+    def _select_torrent(self, torrent_hash: str):
+
+        item = self._torrent_list.get_torrent_item(torrent_hash)
+
+        if item is None:
+            return
+
+        # the name filter can have the row detached
+        if item.treeWidget() is not self._torrent_list:
+            self.input_box.clear()
+            self._search_pressed()
+
+        self._torrent_list.setCurrentItem(item)
+        self._torrent_list.scrollToItem(item)
+
    
     def _toggle_selected_files(self):
 
+        node_states = []
+
         for item in self.file_tree.selectedItems():
+            node = self.file_tree.get_item_node(item)
 
-            item.setCheckState(0, GUICommon.get_flipped_check_state(item.checkState(0)))
+            if node is not None:
+                node_states.append((node, item.checkState(0) != QC.Qt.Checked))
 
+        self._apply_file_check_states(node_states)
 
-    def _item_checkbox_changed(self, item, column):
-        if not item or self.pause or not self.CONTROLLER.is_qbittorrent_ok():
+    def _select_files_by_rule(self):
+
+        file_tree = self.file_tree.get_file_tree()
+
+        if file_tree is None or self.pause or not self.CONTROLLER.is_qbittorrent_ok():
+            return
+
+        dialog = dialogs.FileRuleDialog(file_tree, self)
+
+        if dialog.exec_() != QW.QDialog.Accepted or dialog.get_rule() is None:
+            return
+
+        # the tree may have been swapped while the dialog was open
+        if self.file_tree.get_file_tree() is not file_tree:
+            return
+
+        file_ids = dialog.get_rule().get_matching_file_ids(file_tree)
+
+        wanted, unwanted = self.file_tree.apply_file_check_state(file_ids, dialog.get_checked())
+
+        self._send_file_priority_changes(wanted, unwanted)
+
+    def _apply_file_check_states(self, node_states: list[tuple[int, bool]]):
+        if not node_states or self.pause or not self.CONTROLLER.is_qbittorrent_ok():
             return
 
-        info = item.data(0, QC.Qt.UserRole)
+        # a whole directory turns into one priority update instead of one per file
+        wanted, unwanted = self.file_tree.apply_check_states(node_states)
+
+        self._send_file_priority_changes(wanted, unwanted)
+
+    def _send_file_priority_changes(self, wanted: np.ndarray, unwanted: np.ndarray):
+
+        self._update_selection_label()
+
+        if len(wanted) > 0:
+            self.CONTROLLER.update_torrents_file_priority_transactional(
+                self.selected_torrent_hash, wanted.tolist(), CC.TORRENT_FILE_PRIORITY_NORMAL
+            )
+
+        if len(unwanted) > 0:
+            self.CONTROLLER.update_torrents_file_priority_transactional(
+                self.selected_torrent_hash,
+                unwanted.tolist(),
+                CC.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD,
+            )
+
+    def _item_checkbox_changed(self, item, column):
+        if not item or column != 0:
+            return
 
-        if not info:
-            GUICommon.set_check_item_all_sub_items(item, item.checkState(column))
+        node = self.file_tree.get_item_node(item)
 
+        if node is None:
             return
 
-        if "id" not in info:
-            logging.warning(f"Could not find id in torrent files info, {info}")
+        self._apply_file_check_states([(node, item.checkState(0) == QC.Qt.Checked)])
+
+    def _update_selection_label(self):
+
+        file_tree = self.file_tree.get_file_tree()
+
+        if file_tree is None:
+            self.selection_label.setText("")
             return
 
-        id = info["id"]
+        # the tree keeps the wanted bytes of every directory, so this is a lookup on the root
+        wanted_size, wanted_remaining = file_tree.get_selection_totals()
+
+        if self._free_space_on_disk < 0:
+            fits = ""
 
-        if item.checkState(column) == QC.Qt.Checked:
-            priority = CC.TORRENT_FILE_PRIORITY_NORMAL
+        elif wanted_remaining <= self._free_space_on_disk:
+            fits = "Fits on disk"
 
         else:
-            priority = CC.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD
+            fits = "Needs {} more free space".format(
+                CF.size_bytes_to_pretty_str(wanted_remaining - self._free_space_on_disk)
+            )
 
-        self.CONTROLLER.update_torrents_file_priority_transactional(
-            self.selected_torrent_hash, id, priority
+        self.selection_label.setText(
+            self.selection_text_template.format(
+                CF.size_bytes_to_pretty_str(wanted_size),
+                CF.size_bytes_to_pretty_str(wanted_remaining),
+                fits,
+            )
         )
 
+    @QC.Slot(str, object, object)
+    def _on_file_priorities_committed(self, torrent_hash: str, committed: dict, failed: dict):
+
+        committed_count = sum(len(file_ids) for file_ids in committed.values())
+        failed_count = sum(len(file_ids) for file_ids in failed.values())
+
+        if failed_count:
+            self.status_bar.showMessage(
+                f"Could not update the priority of {failed_count} files", 10 * 1000
+            )
+
+            # the tree shows what was asked for, put back what qBittorrent actually has
+            if torrent_hash == self.selected_torrent_hash:
+                self.load_selected_torrents_files()
+
+        elif committed_count:
+            self.status_bar.showMessage(f"Updated the priority of {committed_count} files", 5 * 1000)
+
     def _torrent_right_click_menu(self, position): 
 
         indexes = self.file_tree.selectedIndexes()
@@ -329,61 +584,6 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
 
         menu.exec_(self._torrent_list.viewport().mapToGlobal(position))
 
-    def _build_treewidget_recursive(
-                self, nested_struct: CD.NestedTorrentFileDirectory, parent=None, style=None
-        ):
-            if parent is None:
-                parent = QW.QTreeWidgetItem(["/"])
-
-            for name, child in nested_struct.children.items():
-
-                if child.torrents_file:
-                    item = QW.QTreeWidgetItem(
-                        [
-                            name,
-                            CD.size_bytes_to_pretty_str(child.size),
-                            f"{child.torrents_file.progress * 100:.2f}%",
-                            CD.get_pretty_download_priority(child.torrents_file.priority),
-                            "",
-                            f"{child.torrents_file.availability}",
-                        ]
-                    )
-                    item.setData(0, QC.Qt.UserRole, child.torrents_file)
-
-                    item.setFlags(item.flags() | QC.Qt.ItemFlag.ItemIsUserCheckable)
-
-                    if child.torrents_file.priority == 0:
-                        item.setCheckState(0, QC.Qt.CheckState.Unchecked)
-                    else:
-                        p = parent
-                        while p.parent():
-                            p.setCheckState(0, QC.Qt.CheckState.Checked)
-                            p = p.parent()
-                            p.setCheckState(0, QC.Qt.CheckState.Checked)
-
-                        item.setCheckState(0, QC.Qt.CheckState.Checked)
-                else:
-                    item = QW.QTreeWidgetItem(
-                        [
-                            name,
-                            CD.size_bytes_to_pretty_str(child.size),
-                            f"{child.get_progress() * 100:.3f}%",
-                        ]
-                    )
-                    item.setFlags(item.flags() | QC.Qt.ItemFlag.ItemIsUserCheckable)
-                    item.setCheckState(0, QC.Qt.CheckState.Unchecked)
-                    item.setIcon(0, self.style().standardIcon(QW.QStyle.SP_DirOpenIcon))
-
-                parent.addChild(item)
-
-                self._build_treewidget_recursive(child, item, style=style)
-
-            return parent
-
-
-
-
-
     def _load_torrents_files_timer_tick(self):
         if self.pause or not self.CONTROLLER.is_qbittorrent_ok():
             self.load_torrents_files_timer.stop()
@@ -442,52 +642,262 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
 
 
 
+    def _search_text_changed(self):
+        self.search_timer.start(self.SEARCH_TIMER_INTERVAL_MS)
+
     def _search_pressed(self):
         if self.pause:
             return
 
-        search = self.input_box.text()
+        self.search_timer.stop()
 
-        use_ignorecase = not not re.search(r"[A-Z]", search)
+        mode = CoreTorrentFilter.FILTER_MODES[self.search_mode_dropdown.currentIndex()]
 
-        root_item = self._torrent_list.invisibleRootItem()
+        try:
+            matches = self.torrent_name_filter.filter(self.input_box.text(), mode)
 
-        for i in range(root_item.childCount()):
-            item = root_item.child(i)
+        except re.error as e:
+            # keep showing the last good result while the regex is being typed
+            self.input_box.setToolTip(str(e))
+            return
 
-            if use_ignorecase:
-                item.setHidden(not re.search(search, item.text(0)))
-            else:
-                item.setHidden(not re.search(search, item.text(0), re.IGNORECASE))
+        self.input_box.setToolTip("")
 
+        self.filter_sidebar.refresh_counts()
 
-    def get_torrent_tree_widget_item(self, values: dict):
-        item = QW.QTreeWidgetItem(
-            [
-                values.get("name", "N/A"),
-                CD.size_bytes_to_pretty_str(values.get("size", 0)),
-                f"{values.get('progress', 0) * 100:.2f}%",
-                CD.torrent_state_to_pretty(values.get("state", "N/A")),
-                f"{values.get('ratio', 0):.3f}",
-                f"{values.get('availability', 0):.3f}",
-                CD.size_bytes_to_pretty_str(values.get("dlspeed", 0)),
-                CD.size_bytes_to_pretty_str(values.get("upspeed", 0)),
-            ]
-        )
+        sidebar_matches = self.filter_sidebar.get_selected_hashes()
+
+        if sidebar_matches is not None:
+            matches = sidebar_matches if matches is None else matches & sidebar_matches
+
+        self._torrent_list.set_visible_hashes(matches)
 
-        return item
+
+    def get_torrent_row_texts(self, values: dict) -> list[str]:
+        return [
+            values.get("name", "N/A"),
+            CF.size_bytes_to_pretty_str(values.get("size", 0)),
+            f"{values.get('progress', 0) * 100:.2f}%",
+            CF.torrent_state_to_pretty(values.get("state", "N/A")),
+            f"{values.get('ratio', 0):.3f}",
+            f"{values.get('availability', 0):.3f}",
+            CF.size_bytes_to_pretty_str(values.get("dlspeed", 0)),
+            CF.size_bytes_to_pretty_str(values.get("upspeed", 0)),
+        ]
+
+    def get_torrent_tree_widget_item(self, values: dict):
+        return QW.QTreeWidgetItem(self.get_torrent_row_texts(values))
 
     def update_torrent_list(self):
+        """
+        Reloads every page of torrents loaded so far, updating only the rows that changed
+        """
         if self.pause or not self.CONTROLLER.is_qbittorrent_ok():
             return
-        self._torrent_list.clear()
 
-        for torrent in self.CONTROLLER.get_torrents():
+        # the store is kept up to date by the deltas, and the pages follow its order
+        if self._torrent_pages_from_store:
+            self._load_torrent_list_from_store()
+            self._search_pressed()
+            return
+
+        request = (
+            0,
+            max(CC.TORRENT_PAGE_SIZE, self._torrent_page_offset),
+            *self._get_torrent_page_order(),
+        )
+
+        if request == self._torrent_page_request:
+            return
+
+        self._torrent_page_request = request
+
+        def c(x): return self.CONTROLLER.get_torrents_page(*x), x
+
+        w = GUIThreading.WorkerThread(c, request)
+        w.finished2.connect(self._on_torrent_list_refreshed)
+        w.start()
+
+        self._threads.append(w)
+        self._threads = list(filter(lambda x : not x.isFinished(), self._threads))
+
+    @QC.Slot(object)
+    def _on_torrent_list_refreshed(self, *args):
+        torrents, request = args[0]
+
+        # a page request, a sort change or the full update has taken its place
+        if request != self._torrent_page_request:
+            return
+
+        self._torrent_page_request = None
+
+        if torrents is None:
+            return
+
+        rows = {}
+
+        for torrent in torrents:
             if not self.CONTROLLER.torrent_passes_filter(torrent):
                 continue
-            item = self.get_torrent_tree_widget_item(torrent)
-            item.setData(0, QC.Qt.UserRole, torrent.hash)
-            self._torrent_list.insertTopLevelItem(0, item)
+            rows[torrent.hash] = self.get_torrent_row_texts(torrent)
+
+        self._torrent_page_offset = len(torrents)
+        self._has_more_torrent_pages = len(torrents) >= request[1]
+
+        # only rows that differ are touched, which keeps the selection and scroll position
+        self._torrent_list.reconcile_torrent_items(rows)
+
+        self._search_pressed()
+
+    def _get_torrent_page_order(self) -> tuple[str, bool]:
+        """
+        Gets the state store column and whether it is reversed, for the list sort column
+        """
+        header = self._torrent_list.header()
+
+        return (
+            self._torrent_list.SORT_COLUMNS[header.sortIndicatorSection()],
+            header.sortIndicatorOrder() == QC.Qt.SortOrder.DescendingOrder,
+        )
+
+    def _get_torrent_page_from_store(self, offset: int, limit: int) -> tuple[list[dict], bool]:
+        """
+        Gets limit torrents from offset in page order, and whether there are more after them
+        """
+        store = self.CONTROLLER.torrent_state_store
+
+        hashes = self.CONTROLLER.filter_torrent_hashes(
+            store.get_sorted_hashes(*self._get_torrent_page_order())
+        )
+
+        torrents = [store.get_torrent(h) for h in hashes[offset : offset + limit]]
+
+        return [t for t in torrents if t is not None], len(hashes) > offset + limit
+
+    def _load_torrent_list_from_store(self):
+        """
+        Fills the pages loaded so far from the state store rather than the server, in page order
+        """
+        limit = max(CC.TORRENT_PAGE_SIZE, self._torrent_page_offset)
+
+        torrents, has_more = self._get_torrent_page_from_store(0, limit)
+
+        rows = {torrent["hash"]: self.get_torrent_row_texts(torrent) for torrent in torrents}
+
+        self._torrent_page_offset = len(rows)
+        self._has_more_torrent_pages = has_more
+
+        self._torrent_list.reconcile_torrent_items(rows)
+
+    def _set_showing_saved_torrents(self, value: bool):
+        self._showing_saved_torrents = value
+
+        if not value:
+            self._torrent_list.setPalette(self._torrent_list_palette)
+            return
+
+        # the saved rows are greyed out until they are up to date
+        palette = QG.QPalette(self._torrent_list_palette)
+        palette.setColor(
+            QG.QPalette.Text, palette.color(QG.QPalette.Disabled, QG.QPalette.Text)
+        )
+        self._torrent_list.setPalette(palette)
+
+        saved = self.CONTROLLER.get_timestamp("state_snapshot")
+
+        self.status_label.setText(
+            "Showing torrents saved {} ago, connecting...".format(
+                CD.time_delta_to_pretty_time_delta(CD.time_now() - saved, False)
+            )
+        )
+
+    def load_next_torrent_page(self):
+        if (
+            self.pause
+            or not self._has_more_torrent_pages
+            or not self.CONTROLLER.is_qbittorrent_ok()
+        ):
+            return
+
+        if self._torrent_pages_from_store:
+            self._add_torrent_page(
+                *self._get_torrent_page_from_store(self._torrent_page_offset, CC.TORRENT_PAGE_SIZE)
+            )
+            return
+
+        request = (self._torrent_page_offset, CC.TORRENT_PAGE_SIZE, *self._get_torrent_page_order())
+
+        if request == self._torrent_page_request:
+            return
+
+        self._torrent_page_request = request
+
+        def c(x): return self.CONTROLLER.get_torrents_page(*x), x
+
+        w = GUIThreading.WorkerThread(c, request)
+        w.finished2.connect(self._on_torrent_page_loaded)
+        w.start()
+
+        self._threads.append(w)
+        self._threads = list(filter(lambda x : not x.isFinished(), self._threads))
+
+    @QC.Slot(object)
+    def _on_torrent_page_loaded(self, *args):
+        torrents, request = args[0]
+
+        # a newer request, a sort change or the full update has taken its place
+        if request != self._torrent_page_request:
+            return
+
+        self._torrent_page_request = None
+
+        if torrents is None:
+            return
+
+        self._add_torrent_page(torrents, len(torrents) >= request[1])
+
+    def _add_torrent_page(self, torrents: list[dict], has_more: bool):
+        self._torrent_page_offset += len(torrents)
+        self._has_more_torrent_pages = has_more
+
+        items = {}
+
+        for torrent in torrents:
+            # a delta can have added it already
+            if self._torrent_list.get_torrent_item(torrent["hash"]) is not None:
+                continue
+            if not self.CONTROLLER.torrent_passes_filter(torrent):
+                continue
+            items[torrent["hash"]] = self.get_torrent_tree_widget_item(torrent)
+
+        if items:
+            self._torrent_list.add_torrent_items(items)
+
+            self._search_pressed()
+
+    def _torrent_list_scrolled(self, value: int):
+        scroll_bar = self._torrent_list.verticalScrollBar()
+
+        # starts loading a bit before the bottom, so scrolling does not stop
+        if value >= scroll_bar.maximum() - scroll_bar.pageStep():
+            self.load_next_torrent_page()
+
+    def _torrent_list_sort_changed(self, column: int, order: QC.Qt.SortOrder):
+        # every row is loaded, so reordering them is enough
+        if not self._has_more_torrent_pages:
+            return
+
+        # the loaded pages have to be the first ones in the new order
+        if self._torrent_pages_from_store:
+            self._load_torrent_list_from_store()
+            self._search_pressed()
+            return
+
+        self._torrent_page_request = None
+        self._torrent_page_offset = 0
+        self._torrent_list.clear_torrent_items()
+
+        self.load_next_torrent_page()
 
 
 
@@ -498,29 +908,43 @@ class ClientWindow(QW.QMainWindow, CoreController.ClientControllerUser):
 
         self.show_infinite_progress()
 
-        nested = None
+        file_tree = None
         if cache_key:
-            nested = self.torrent_tree_list_cache.get_if_has_non_expired_data(cache_key)
+            file_tree = self.torrent_tree_list_cache.get_if_has_data(cache_key)
 
-        if not nested:
-            nested = CD.build_nested_torrent_structure(torrent_file_list)
-            if cache_key:
-                self.torrent_tree_list_cache.add_data(cache_key, nested, True)
-        else:
-            logging.debug("Cache hit on tree list")
+        if (
+            file_tree
+            and torrent_file_list is not None
+            and not file_tree.is_built_from(torrent_file_list)
+        ):
+            if file_tree.has_same_files(torrent_file_list):
+                logging.debug("Refreshing cached tree list")
+                file_tree.update_files(torrent_file_list)
 
-        tree = self._build_treewidget_recursive(nested, style=self.style())
+                # added again, so its size is estimated again
+                self.torrent_tree_list_cache.add_data(cache_key, file_tree, True)
 
-        self.file_tree.clear()
+            else:
+                file_tree = None
 
-        if tree.childCount() > 0:
-            self.file_tree.insertTopLevelItems(0, tree.takeChildren())
+        if not file_tree:
+            if torrent_file_list is None:
+                self.file_tree.clear_file_tree()
+                self._update_selection_label()
+                self.hide_infinite_progress()
+                return
 
+            file_tree = CoreFileTree.build_torrent_file_tree(torrent_file_list)
+            if cache_key:
+                self.torrent_tree_list_cache.add_data(cache_key, file_tree, True)
         else:
-            self.file_tree.insertTopLevelItems(0, [tree])
+            logging.debug("Cache hit on tree list")
+
+        self.file_tree.set_file_tree(file_tree)
 
         self.file_tree.resizeColumnToContents(0)
-        self.file_tree.sortByColumn(0, QC.Qt.SortOrder.AscendingOrder)
+
+        self._update_selection_label()
 
         self.hide_infinite_progress()
 
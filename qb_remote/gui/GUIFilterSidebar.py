@@ -0,0 +1,208 @@
+import qtpy
+
+from qtpy import QtCore as QC
+from qtpy import QtWidgets as QW
+from qtpy import QtGui as QG
+
+from ..core import CoreGlobals as CG
+from ..core import CoreConstants as CC
+from ..core import CoreFormatting as CF
+from ..core import CoreController
+
+
+def is_client_id_tag(tag: str) -> bool:
+    """
+    Gets whether the tag is the user_<client id> tag profile mode puts on the torrents a client adds
+    """
+    return tag.startswith("user_") and CC.CLIENT_ID_REGEX.match(tag[5:]) is not None
+
+
+class FilterSidebarTreeWidget(QW.QTreeWidget):
+    """
+    Lists the status filters, categories, tags and trackers with how many torrents are in each
+
+    Selecting entries narrows the torrent list to the torrents in any of the selected entries of a section,
+    and in every section that has a selection
+    """
+
+    filter_changed = QC.Signal()
+
+    # indexed state store field, section title
+    SECTIONS = (
+        ("state", "Status"),
+        ("category", "Categories"),
+        ("tags", "Tags"),
+        ("tracker", "Trackers"),
+    )
+
+    EMPTY_VALUE_LABELS = {"category": "Uncategorized", "tracker": "Trackerless"}
+
+    def __init__(self, controller: CoreController.ClientController = None, parent=None):
+        super().__init__(parent)
+
+        self._controller: CoreController.ClientController = controller or CG.controller
+
+        # the counts shown are from this state store index version
+        self._index_version: int = -1
+
+        self._section_items: dict[str, QW.QTreeWidgetItem] = {}
+        self._value_items: dict[str, dict[str, QW.QTreeWidgetItem]] = {}
+
+        self.setHeaderHidden(True)
+        self.setSelectionMode(QW.QAbstractItemView.ExtendedSelection)
+        self.setUniformRowHeights(True)
+
+        for field, title in self.SECTIONS:
+            item = QW.QTreeWidgetItem([title])
+            item.setFlags(QC.Qt.ItemIsEnabled)
+
+            self.addTopLevelItem(item)
+            item.setExpanded(True)
+
+            self._section_items[field] = item
+            self._value_items[field] = {}
+
+        self.itemSelectionChanged.connect(self.filter_changed)
+
+    def _get_counts(self, field: str, within: set[str] | None) -> dict[str, int]:
+        store = self._controller.torrent_state_store
+
+        if field == "state":
+            counts = store.get_index_counts(field, within)
+
+            # every status is always listed, in a fixed order
+            return {name: counts.get(name, 0) for name in CF.TORRENT_STATE_FILTERS}
+
+        if field == "category":
+            counts = store.get_category_counts(within)
+
+        elif field == "tags":
+            # the user_<client id> tags only say which client added a torrent
+            counts = {
+                tag: count
+                for tag, count in store.get_tag_counts(within).items()
+                if not is_client_id_tag(tag)
+            }
+
+        else:
+            counts = store.get_index_counts(field, within)
+
+        # the empty value goes last
+        return dict(sorted(counts.items(), key=lambda kv: (not kv[0], kv[0].casefold())))
+
+    def _get_label(self, field: str, value: str, count: int) -> str:
+        if not value:
+            value = self.EMPTY_VALUE_LABELS.get(field, value)
+
+        return f"{value} ({count})"
+
+    def _update_section(self, field: str, counts: dict[str, int]) -> bool:
+        section_item = self._section_items[field]
+        value_items = self._value_items[field]
+
+        lost_selection = False
+
+        if list(value_items) != list(counts):
+            # the values changed, so the rows are put back in order, reusing the ones still there
+            for value, item in value_items.items():
+                if value not in counts:
+                    lost_selection |= item.isSelected()
+
+            section_item.takeChildren()
+
+            value_items = self._value_items[field] = {
+                value: value_items.get(value, None) or self._create_value_item(field, value)
+                for value in counts
+            }
+
+            section_item.addChildren(list(value_items.values()))
+
+        for value, count in counts.items():
+            item = value_items[value]
+            label = self._get_label(field, value, count)
+
+            if item.text(0) != label:
+                item.setText(0, label)
+
+        return lost_selection
+
+    def _create_value_item(self, field: str, value: str) -> QW.QTreeWidgetItem:
+        item = QW.QTreeWidgetItem()
+        item.setData(0, QC.Qt.UserRole, (field, value))
+
+        return item
+
+    def refresh_counts(self, force: bool = False) -> bool:
+        """
+        Updates the counts if the state store index changed, returns True if it did
+        """
+        version = self._controller.torrent_state_store.get_index_version()
+
+        if version == self._index_version and not force:
+            return False
+
+        self._index_version = version
+
+        selected = self.selectedItems()
+
+        lost_selection = False
+
+        self.blockSignals(True)
+
+        # only the torrents the list can show are counted, in profile mode the ones of this client
+        within = self._controller.get_filtered_hash_set()
+
+        try:
+            for field, _ in self.SECTIONS:
+                lost_selection |= self._update_section(field, self._get_counts(field, within))
+
+            # taking the rows out drops their selection
+            for item in selected:
+                if item.treeWidget() is self:
+                    item.setSelected(True)
+
+        finally:
+            self.blockSignals(False)
+
+        if lost_selection:
+            self.filter_changed.emit()
+
+        return True
+
+    def has_selection(self) -> bool:
+        return bool(self.selectedItems())
+
+    def get_selected_hashes(self) -> set[str] | None:
+        """
+        Gets the hashes of the torrents that pass the selected entries, or None if nothing is selected
+        """
+        field_values: dict[str, list[str]] = {}
+
+        for item in self.selectedItems():
+            data = item.data(0, QC.Qt.UserRole)
+
+            if data is None:
+                continue
+
+            field, value = data
+
+            field_values.setdefault(field, []).append(value)
+
+        if not field_values:
+            return None
+
+        store = self._controller.torrent_state_store
+
+        hashes = None
+
+        # the smallest sets first, so the intersection shrinks as fast as it can
+        for field_hashes in sorted(
+            (store.get_index_hashes(field, values) for field, values in field_values.items()),
+            key=len,
+        ):
+            if hashes is None:
+                hashes = field_hashes
+            else:
+                hashes &= field_hashes
+
+        return hashes
@@ -1,6 +1,8 @@
 import logging
 import json
 
+import numpy as np
+
 import qtpy
 
 from qtpy import QtCore as QC
@@ -11,6 +13,8 @@ from qb_remote.core import CoreController
 
 from ..core import CoreController
 from ..core import CoreConstants
+from ..core import CoreFileTree
+from ..core import CoreFormatting as CF
 
 class ExtendedQTreeWidget(QW.QTreeWidget, CoreController.ClientControllerUser):
 
@@ -53,6 +57,34 @@ class ExtendedQTreeWidget(QW.QTreeWidget, CoreController.ClientControllerUser):
 
         self._menu_ready = True
 
+    def enable_key_sorting(
+        self, column: int = 0, order: QC.Qt.SortOrder = QC.Qt.SortOrder.AscendingOrder
+    ):
+        """
+        Replaces the Qt display text sorting with sort_items, so subclasses can sort by precomputed keys
+        """
+        self.setSortingEnabled(False)
+
+        header = self.header()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(column, order)
+        header.sortIndicatorChanged.connect(self.sort_items)
+
+    def resort_items(self):
+        """
+        Sorts the items again by the current sort column
+        """
+        header = self.header()
+
+        if header.isSortIndicatorShown():
+            self.sort_items(header.sortIndicatorSection(), header.sortIndicatorOrder())
+
+    def sort_items(self, column: int, order: QC.Qt.SortOrder):
+        """
+        Called when the sort column changes if key sorting is enabled
+        """
+
     def update_item_context_menu(self):
 
         count = len(self.selectedItems())
@@ -88,9 +120,21 @@ SHOULD_PAUSE = 1
 
 class TorrentListTreeWidget(ExtendedQTreeWidget):
 
+    # state store column of every list column
+    SORT_COLUMNS = ("name", "size", "progress", "state", "ratio", "availability", "dlspeed", "upspeed")
+
+    # past this many rows to move, taking every row out and putting them back in order is faster,
+    # every single move looks up the row index, which goes over the rows
+    MAX_ROW_MOVES = 256
+
     def __init__(self, parent=None):
         super().__init__(parent=parent)
 
+        self._hash_to_item: dict[str, QW.QTreeWidgetItem] = {}
+
+        # rows not in here are detached from the view, None shows everything
+        self._visible_hashes: set[str] | None = None
+
         _item_context_menu = QW.QMenu()
         
         self.pause_resume_action = QW.QAction("Pause", _item_context_menu)
@@ -101,6 +145,257 @@ class TorrentListTreeWidget(ExtendedQTreeWidget):
         self.set_menu(_item_context_menu)
 
 
+    def get_torrent_item(self, torrent_hash: str) -> QW.QTreeWidgetItem | None:
+        return self._hash_to_item.get(torrent_hash, None)
+
+    def get_torrent_hashes(self):
+        return self._hash_to_item.keys()
+
+    def add_torrent_items(self, hashes_to_items: dict[str, QW.QTreeWidgetItem]):
+        """
+        Adds rows for the given torrent hashes where they belong in the sort order
+        """
+        if not hashes_to_items:
+            return
+
+        for torrent_hash, item in hashes_to_items.items():
+            item.setData(0, QC.Qt.UserRole, torrent_hash)
+
+        self._hash_to_item.update(hashes_to_items)
+
+        self.move_torrent_items(hashes_to_items.keys())
+
+    def remove_torrent_items(self, torrent_hashes) -> list[str]:
+        """
+        Removes the rows of the given torrent hashes, returns the hashes that had a row
+        """
+        root = self.invisibleRootItem()
+
+        removed = []
+
+        for torrent_hash in torrent_hashes:
+            item = self._hash_to_item.pop(torrent_hash, None)
+
+            if item is None:
+                continue
+
+            removed.append(torrent_hash)
+
+            if item.treeWidget() is self:
+                root.removeChild(item)
+
+        return removed
+
+    def reconcile_torrent_items(self, hashes_to_texts: dict[str, list[str]]):
+        """
+        Makes the rows match hashes_to_texts by hash, removing, adding and changing only the rows that differ
+
+        Unlike clearing and adding everything, the selection and scroll position are kept
+        """
+        removed = [h for h in self._hash_to_item if h not in hashes_to_texts]
+
+        self.remove_torrent_items(removed)
+
+        added = {}
+
+        moved = set()
+
+        sort_column = self.header().sortIndicatorSection()
+
+        for torrent_hash, texts in hashes_to_texts.items():
+            item = self._hash_to_item.get(torrent_hash, None)
+
+            if item is None:
+                added[torrent_hash] = QW.QTreeWidgetItem(texts)
+
+                continue
+
+            for column, text in enumerate(texts):
+                if item.text(column) != text:
+                    item.setText(column, text)
+
+                    # only a changed sort column value can move the row
+                    if column == sort_column:
+                        moved.add(torrent_hash)
+
+        for torrent_hash, item in added.items():
+            item.setData(0, QC.Qt.UserRole, torrent_hash)
+
+        self._hash_to_item.update(added)
+
+        moved.update(added)
+
+        self.move_torrent_items(moved)
+
+    def get_torrent_item_count(self) -> int:
+        """
+        Gets how many torrents have a row, including rows the name filter has detached
+        """
+        return len(self._hash_to_item)
+
+    def clear_torrent_items(self):
+        self._hash_to_item = {}
+
+        self.clear()
+
+    def set_visible_hashes(self, torrent_hashes: set[str] | None):
+        """
+        Only shows the rows in torrent_hashes, None shows every row
+
+        Only the rows that are shown or hidden by this are attached or detached
+        """
+        shown = self._visible_hashes
+
+        self._visible_hashes = torrent_hashes
+
+        if shown is None and torrent_hashes is None:
+            return
+
+        hashes = self._hash_to_item.keys()
+
+        if shown is None:
+            changed = hashes - torrent_hashes
+
+        elif torrent_hashes is None:
+            changed = hashes - shown
+
+        else:
+            changed = (shown ^ torrent_hashes) & hashes
+
+        self.move_torrent_items(changed)
+
+    def _get_sorted_hashes(self, column: int, order: QC.Qt.SortOrder) -> list[str]:
+        """
+        Gets the hashes of the rows that are shown, in the order of the sort column
+        """
+        hash_to_item = self._hash_to_item
+        visible_hashes = self._visible_hashes
+
+        if column >= len(self.SORT_COLUMNS):
+            hashes = []
+
+        else:
+            hashes = self.CONTROLLER.torrent_state_store.get_sorted_hashes(
+                self.SORT_COLUMNS[column], order == QC.Qt.SortOrder.DescendingOrder
+            )
+
+        if visible_hashes is None:
+            sorted_hashes = [h for h in hashes if h in hash_to_item]
+
+        else:
+            sorted_hashes = [h for h in hashes if h in hash_to_item and h in visible_hashes]
+
+        # rows the store does not know about yet go at the end
+        if len(hashes) < len(hash_to_item):
+            known_hashes = set(hashes)
+
+            sorted_hashes.extend(
+                h
+                for h in hash_to_item
+                if h not in known_hashes and (visible_hashes is None or h in visible_hashes)
+            )
+
+        return sorted_hashes
+
+    def sort_items(self, column: int, order: QC.Qt.SortOrder):
+        if column >= len(self.SORT_COLUMNS):
+            return
+
+        hash_to_item = self._hash_to_item
+
+        self._set_top_level_items([hash_to_item[h] for h in self._get_sorted_hashes(column, order)])
+
+    def move_torrent_items(self, torrent_hashes):
+        """
+        Puts the rows of the given torrent hashes where they belong in the sort order,
+        detaching the hidden ones, the other rows are left where they are
+        """
+        if not torrent_hashes:
+            return
+
+        header = self.header()
+        column = header.sortIndicatorSection()
+        order = header.sortIndicatorOrder()
+
+        hash_to_item = self._hash_to_item
+
+        if len(torrent_hashes) > self.MAX_ROW_MOVES:
+            self._set_top_level_items(
+                [hash_to_item[h] for h in self._get_sorted_hashes(column, order)]
+            )
+            return
+
+        visible_hashes = self._visible_hashes
+
+        shown = {
+            h
+            for h in torrent_hashes
+            if h in hash_to_item and (visible_hashes is None or h in visible_hashes)
+        }
+
+        current = self.currentItem()
+        scroll_position = self.verticalScrollBar().value()
+
+        self.blockSignals(True)
+
+        try:
+            selected = []
+
+            for torrent_hash in torrent_hashes:
+                item = hash_to_item.get(torrent_hash, None)
+
+                if item is None or item.treeWidget() is not self:
+                    continue
+
+                if item.isSelected():
+                    selected.append(item)
+
+                self.takeTopLevelItem(self.indexOfTopLevelItem(item))
+
+            # the rows left are still in order, so going up the new positions puts every row
+            # in front of the ones after it, rows that were only hidden need no sorting
+            if shown:
+                for index, torrent_hash in enumerate(self._get_sorted_hashes(column, order)):
+                    if torrent_hash in shown:
+                        self.insertTopLevelItem(index, hash_to_item[torrent_hash])
+
+            if current is not None and current.treeWidget() is self:
+                self.setCurrentItem(current, 0, QC.QItemSelectionModel.NoUpdate)
+
+            for item in selected:
+                if item.treeWidget() is self:
+                    item.setSelected(True)
+
+        finally:
+            self.blockSignals(False)
+
+        self.verticalScrollBar().setValue(scroll_position)
+
+    def _set_top_level_items(self, items: list[QW.QTreeWidgetItem]):
+        # hidden rows are detached rather than setHidden, hiding rows one by one is very slow
+        selected = self.selectedItems()
+        current = self.currentItem()
+        scroll_position = self.verticalScrollBar().value()
+
+        self.blockSignals(True)
+
+        try:
+            root = self.invisibleRootItem()
+            root.takeChildren()
+            root.addChildren(items)
+
+            if current is not None and current.treeWidget() is self:
+                self.setCurrentItem(current, 0, QC.QItemSelectionModel.NoUpdate)
+
+            for item in selected:
+                if item.treeWidget() is self:
+                    item.setSelected(True)
+
+        finally:
+            self.blockSignals(False)
+
+        self.verticalScrollBar().setValue(scroll_position)
+
     def update_item_context_menu_single(self):
 
         selected_item_row = self.selectedItems()[0]
@@ -111,7 +406,7 @@ class TorrentListTreeWidget(ExtendedQTreeWidget):
             logging.warn(f"Could not find torrent hash on row item {selected_item_row}")
             return
 
-        torrent_info = self.CONTROLLER.get_torrents(skip_cache=True, torrent_hashes=[torrent_hash])
+        torrent_info = self.CONTROLLER.get_torrents(torrent_hashes=[torrent_hash])
 
 
         if not torrent_info and len(torrent_info) > 0:
@@ -166,3 +461,244 @@ class TorrentListTreeWidget(ExtendedQTreeWidget):
 
 
 
+
+
+
+class TorrentFileTreeWidget(ExtendedQTreeWidget):
+    """
+    Shows a CoreFileTree.Torrent_File_Tree, every item holds its tree node in Qt.UserRole
+    """
+
+    # indexed by the CoreFileTree check states
+    CHECK_STATES = (
+        QC.Qt.CheckState.Unchecked,
+        QC.Qt.CheckState.PartiallyChecked,
+        QC.Qt.CheckState.Checked,
+    )
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+
+        self._file_tree: CoreFileTree.Torrent_File_Tree = None
+        self._node_items: list[QW.QTreeWidgetItem] = []
+
+    def _create_node_items(self, file_tree: CoreFileTree.Torrent_File_Tree):
+        names = file_tree.get_names()
+        file_ids = file_tree.get_node_file_ids()
+        priorities = file_tree.get_node_priorities()
+
+        sizes = CF.format_sizes(file_tree.get_node_sizes())
+        progresses = CF.format_progresses(file_tree.get_node_progresses())
+        priority_labels = CF.format_download_priorities(priorities)
+        availabilities = file_tree.get_node_availabilities().tolist()
+
+        check_states = self.CHECK_STATES
+        check_state_codes = file_tree.get_check_states().tolist()
+
+        file_ids = file_ids.tolist()
+
+        directory_icon = self.style().standardIcon(QW.QStyle.SP_DirOpenIcon)
+        checkable = QC.Qt.ItemFlag.ItemIsUserCheckable
+
+        items = [self.invisibleRootItem()]
+
+        for node in range(1, len(names)):
+            if file_ids[node] < 0:
+                item = QW.QTreeWidgetItem([names[node], sizes[node], progresses[node]])
+                item.setIcon(0, directory_icon)
+
+            else:
+                item = QW.QTreeWidgetItem(
+                    [
+                        names[node],
+                        sizes[node],
+                        progresses[node],
+                        priority_labels[node],
+                        "",
+                        f"{availabilities[node]}",
+                    ]
+                )
+
+            item.setData(0, QC.Qt.UserRole, node)
+            item.setFlags(item.flags() | checkable)
+            item.setCheckState(0, check_states[check_state_codes[node]])
+
+            items.append(item)
+
+        return items
+
+    def _attach_node_items(self, column: int, order: QC.Qt.SortOrder):
+        file_tree = self._file_tree
+        items = self._node_items
+
+        sort_column = CoreFileTree.Torrent_File_Tree.SORT_COLUMNS[column]
+        descending = order == QC.Qt.SortOrder.DescendingOrder
+
+        # deepest directories first, so nothing is attached to the view until the very end
+        for node in reversed(file_tree.get_directory_nodes().tolist()):
+            children = file_tree.get_sorted_children(node, sort_column, descending)
+
+            if len(children) > 0:
+                items[node].addChildren([items[child] for child in children.tolist()])
+
+    def _refresh_check_states(self, file_ids: np.ndarray, nodes: np.ndarray):
+        file_tree = self._file_tree
+        items = self._node_items
+
+        file_nodes = file_tree.get_file_nodes()[file_ids]
+        file_states = file_tree.get_check_states(file_nodes).tolist()
+        priority_labels = CF.format_download_priorities(file_tree.get_file_priorities()[file_ids])
+
+        check_states = self.CHECK_STATES
+
+        for node, state, label in zip(file_nodes.tolist(), file_states, priority_labels):
+            item = items[node]
+            item.setCheckState(0, check_states[state])
+            item.setText(3, label)
+
+        nodes = np.setdiff1d(nodes, file_nodes)
+        nodes = nodes[nodes > 0]
+
+        # the tree keeps wanted counts per node, so only the nodes that changed are looked at
+        for node, state in zip(nodes.tolist(), file_tree.get_check_states(nodes).tolist()):
+            state = check_states[state]
+
+            if items[node].checkState(0) != state:
+                items[node].setCheckState(0, state)
+
+    def _apply_file_targets(
+        self, targets: np.ndarray, clicked_nodes: list[int]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # targets holds 1 for files to check, 0 to uncheck and -1 to leave alone, by file id
+        file_tree = self._file_tree
+
+        is_wanted = (
+            file_tree.get_file_priorities() > CoreConstants.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD
+        )
+
+        # files that already have what was asked for are left alone, so high priorities stay high
+        wanted = np.flatnonzero((targets == 1) & ~is_wanted).astype(np.int32)
+        unwanted = np.flatnonzero((targets == 0) & is_wanted).astype(np.int32)
+
+        changed_directories = np.concatenate(
+            (
+                file_tree.set_file_priorities(wanted, CoreConstants.TORRENT_FILE_PRIORITY_NORMAL),
+                file_tree.set_file_priorities(
+                    unwanted, CoreConstants.TORRENT_FILE_PRIORITY_DO_NOT_DOWNLOAD
+                ),
+                # Qt already flipped the clicked item, which may need to show partially checked
+                np.array(clicked_nodes, dtype=np.int32),
+            )
+        )
+
+        self.blockSignals(True)
+
+        try:
+            self._refresh_check_states(np.concatenate((wanted, unwanted)), changed_directories)
+
+        finally:
+            self.blockSignals(False)
+
+        return wanted, unwanted
+
+    def apply_check_states(
+        self, node_states: list[tuple[int, bool]]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Checks or unchecks the whole subtree of every node at once, later nodes win where they overlap
+
+        No itemChanged signals are sent, returns the file ids that became wanted and unwanted
+        """
+        file_tree = self._file_tree
+
+        if file_tree is None:
+            empty = np.zeros(0, dtype=np.int32)
+            return empty, empty
+
+        targets = np.full(file_tree.get_file_count(), -1, dtype=np.int8)
+
+        for node, checked in node_states:
+            targets[file_tree.get_subtree_file_ids(node)] = checked
+
+        return self._apply_file_targets(targets, [node for node, _ in node_states])
+
+    def apply_file_check_state(
+        self, file_ids: np.ndarray, checked: bool
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Checks or unchecks a set of files at once, see apply_check_states
+        """
+        file_tree = self._file_tree
+
+        if file_tree is None:
+            empty = np.zeros(0, dtype=np.int32)
+            return empty, empty
+
+        targets = np.full(file_tree.get_file_count(), -1, dtype=np.int8)
+        targets[file_ids] = checked
+
+        return self._apply_file_targets(targets, [])
+
+    def get_file_tree(self) -> CoreFileTree.Torrent_File_Tree | None:
+        return self._file_tree
+
+    def get_item_node(self, item: QW.QTreeWidgetItem) -> int | None:
+        return item.data(0, QC.Qt.UserRole)
+
+    def get_node_item(self, node: int) -> QW.QTreeWidgetItem:
+        return self._node_items[node]
+
+    def set_file_tree(self, file_tree: CoreFileTree.Torrent_File_Tree):
+        """
+        Replaces the tree contents, items are created already sorted by the current sort column
+        """
+        self.blockSignals(True)
+
+        try:
+            self.clear()
+
+            self._file_tree = file_tree
+            self._node_items = self._create_node_items(file_tree)
+
+            header = self.header()
+            self._attach_node_items(header.sortIndicatorSection(), header.sortIndicatorOrder())
+
+        finally:
+            self.blockSignals(False)
+
+    def clear_file_tree(self):
+        self._file_tree = None
+        self._node_items = []
+
+        self.clear()
+
+    def sort_items(self, column: int, order: QC.Qt.SortOrder):
+        if self._file_tree is None or column >= len(CoreFileTree.Torrent_File_Tree.SORT_COLUMNS):
+            return
+
+        items = self._node_items
+
+        expanded = [
+            node
+            for node in self._file_tree.get_directory_nodes().tolist()
+            if node and items[node].isExpanded()
+        ]
+        selected = self.selectedItems()
+
+        self.blockSignals(True)
+
+        try:
+            # detach everything first, so reordering the children does not touch the view
+            for node in self._file_tree.get_directory_nodes().tolist():
+                items[node].takeChildren()
+
+            self._attach_node_items(column, order)
+
+            for node in expanded:
+                items[node].setExpanded(True)
+
+            for item in selected:
+                item.setSelected(True)
+
+        finally:
+            self.blockSignals(False)
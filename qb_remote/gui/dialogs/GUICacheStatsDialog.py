@@ -0,0 +1,111 @@
+import qtpy
+
+from qtpy import QtCore as QC
+from qtpy import QtWidgets as QW
+from qtpy import QtGui as QG
+
+from ...core import CoreGlobals as CG
+from ...core import CoreFormatting as CF
+from ...core import CoreController
+
+
+class CacheStatsDialog(QW.QDialog):
+    """
+    Shows the size and hit rate of every registered cache, refreshing while open
+    """
+
+    REFRESH_TIMER_INTERVAL_MS = 1000
+
+    COLUMNS = (
+        "Cache",
+        "Entries",
+        "Compressed",
+        "Size",
+        "Budget",
+        "Hits",
+        "Misses",
+        "Hit Rate",
+        "Evictions",
+    )
+
+    def __init__(self, controller: CoreController.ClientController = None, parent=None):
+        super().__init__(parent)
+
+        self._controller: CoreController.ClientController = controller or CG.controller
+
+        self.setWindowTitle("Caches")
+        self.resize(800, 250)
+
+        self.stats_table = QW.QTreeWidget()
+        self.stats_table.setColumnCount(len(self.COLUMNS))
+        self.stats_table.setHeaderLabels(self.COLUMNS)
+        self.stats_table.setRootIsDecorated(False)
+        self.stats_table.setUniformRowHeights(True)
+
+        self.button_maintain = QW.QPushButton("Maintain Now")
+        self.button_maintain.clicked.connect(self._maintain_pressed)
+
+        self.button_clear = QW.QPushButton("Clear All")
+        self.button_clear.clicked.connect(self._clear_pressed)
+
+        self.refresh_timer = QC.QTimer(self)
+        self.refresh_timer.timeout.connect(self._refresh)
+        self.refresh_timer.start(self.REFRESH_TIMER_INTERVAL_MS)
+
+        button_layout = QW.QHBoxLayout()
+        button_layout.addStretch(1)
+        button_layout.addWidget(self.button_maintain)
+        button_layout.addWidget(self.button_clear)
+
+        layout = QW.QVBoxLayout(self)
+        layout.addWidget(self.stats_table)
+        layout.addLayout(button_layout)
+
+        self._refresh()
+
+    def _get_row_texts(self, stats: dict) -> list[str]:
+        lookups = stats["hits"] + stats["misses"]
+
+        hit_rate = f"{stats['hits'] / lookups * 100:.1f}%" if lookups else "-"
+
+        max_bytes = stats["max_bytes"]
+
+        return [
+            stats["name"],
+            str(stats["entries"]),
+            str(stats["cold"]),
+            CF.size_bytes_to_pretty_str(stats["bytes"]),
+            "-" if max_bytes is None else CF.size_bytes_to_pretty_str(max_bytes),
+            str(stats["hits"]),
+            str(stats["misses"]),
+            hit_rate,
+            str(stats["evictions"]),
+        ]
+
+    def _refresh(self):
+        rows = [self._get_row_texts(stats) for stats in self._controller.get_cache_stats()]
+
+        root = self.stats_table.invisibleRootItem()
+
+        # rows are updated in place so the selection does not jump around every second
+        while root.childCount() > len(rows):
+            root.removeChild(root.child(root.childCount() - 1))
+
+        for i, texts in enumerate(rows):
+            if i < root.childCount():
+                item = root.child(i)
+
+                for column, text in enumerate(texts):
+                    if item.text(column) != text:
+                        item.setText(column, text)
+
+            else:
+                self.stats_table.addTopLevelItem(QW.QTreeWidgetItem(texts))
+
+    def _maintain_pressed(self):
+        self._controller.maintain_caches()
+        self._refresh()
+
+    def _clear_pressed(self):
+        self._controller.clear_caches()
+        self._refresh()
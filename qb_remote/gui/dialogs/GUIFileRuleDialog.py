@@ -0,0 +1,159 @@
+import re
+
+import qtpy
+
+from qtpy import QtCore as QC
+from qtpy import QtWidgets as QW
+from qtpy import QtGui as QG
+
+from ...core import CoreFileRules
+from ...core import CoreFileTree
+from ...core import CoreFormatting as CF
+
+
+class FileRuleDialog(QW.QDialog):
+    """
+    Builds a CoreFileRules.File_Selection_Rule, showing live how many files of the tree it matches
+    """
+
+    PREVIEW_TIMER_INTERVAL_MS = 150
+
+    def __init__(self, file_tree: CoreFileTree.Torrent_File_Tree, parent=None):
+        super().__init__(parent)
+
+        self._file_tree = file_tree
+        self._rule: CoreFileRules.File_Selection_Rule = None
+
+        self.setWindowTitle("Select Files By Rule")
+
+        self.line_edit__patterns = QW.QLineEdit()
+        self.line_edit__patterns.setPlaceholderText("*.nfo; sample; extras/*")
+        self.line_edit__patterns.setToolTip(
+            """Any number of patterns, split by ; or spaces.
+Globs without a / match the file name, with one the end of the path.
+A pattern without wildcards matches anywhere in the path."""
+        )
+
+        self.dropdown__pattern_type = QW.QComboBox()
+        self.dropdown__pattern_type.addItems(["Glob", "Regex"])
+
+        self.line_edit__extensions = QW.QLineEdit()
+        self.line_edit__extensions.setPlaceholderText("txt, jpg, url")
+
+        self.checkbox__smaller_than = QW.QCheckBox("Smaller than (MB)")
+        self.spinbox__smaller_than = QW.QDoubleSpinBox()
+        self.spinbox__smaller_than.setMaximum(1 << 30)
+        self.spinbox__smaller_than.setValue(10)
+
+        self.checkbox__larger_than = QW.QCheckBox("Larger than (MB)")
+        self.spinbox__larger_than = QW.QDoubleSpinBox()
+        self.spinbox__larger_than.setMaximum(1 << 30)
+        self.spinbox__larger_than.setValue(1024)
+
+        self.dropdown__action = QW.QComboBox()
+        self.dropdown__action.addItems(["Do not download matching files", "Download matching files"])
+
+        self.label__preview = QW.QLabel()
+
+        self.preview_timer = QC.QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.timeout.connect(self._update_preview)
+
+        for signal in (
+            self.line_edit__patterns.textChanged,
+            self.dropdown__pattern_type.currentIndexChanged,
+            self.line_edit__extensions.textChanged,
+            self.checkbox__smaller_than.stateChanged,
+            self.spinbox__smaller_than.valueChanged,
+            self.checkbox__larger_than.stateChanged,
+            self.spinbox__larger_than.valueChanged,
+        ):
+            signal.connect(self._rule_changed)
+
+        self.button_box = QW.QDialogButtonBox(
+            QW.QDialogButtonBox.Ok | QW.QDialogButtonBox.Cancel, self
+        )
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+
+        form = QW.QFormLayout()
+        form.addRow("Path patterns:", self.line_edit__patterns)
+        form.addRow("Pattern type:", self.dropdown__pattern_type)
+        form.addRow("Extensions:", self.line_edit__extensions)
+        form.addRow(self.checkbox__smaller_than, self.spinbox__smaller_than)
+        form.addRow(self.checkbox__larger_than, self.spinbox__larger_than)
+        form.addRow("Action:", self.dropdown__action)
+
+        layout = QW.QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addWidget(self.label__preview)
+        layout.addWidget(self.button_box)
+
+        self._update_preview()
+
+    def _rule_changed(self):
+        self.preview_timer.start(self.PREVIEW_TIMER_INTERVAL_MS)
+
+    def _build_rule(self) -> CoreFileRules.File_Selection_Rule:
+        smaller_than = None
+        larger_than = None
+
+        if self.checkbox__smaller_than.isChecked():
+            smaller_than = int(self.spinbox__smaller_than.value() * (1 << 20))
+
+        if self.checkbox__larger_than.isChecked():
+            larger_than = int(self.spinbox__larger_than.value() * (1 << 20))
+
+        if self.dropdown__pattern_type.currentIndex() == 1:
+            # regexes can have spaces, so only ; splits them
+            patterns = [p.strip() for p in self.line_edit__patterns.text().split(";")]
+            pattern_type = CoreFileRules.PATTERN_TYPE_REGEX
+
+        else:
+            patterns = CoreFileRules.split_list(self.line_edit__patterns.text())
+            pattern_type = CoreFileRules.PATTERN_TYPE_GLOB
+
+        return CoreFileRules.File_Selection_Rule(
+            patterns,
+            pattern_type,
+            CoreFileRules.split_list(self.line_edit__extensions.text()),
+            smaller_than,
+            larger_than,
+        )
+
+    def _update_preview(self):
+        self.preview_timer.stop()
+
+        try:
+            self._rule = self._build_rule()
+
+        except re.error as e:
+            self._rule = None
+            self.label__preview.setText(f"Bad regex: {e}")
+            self.button_box.button(QW.QDialogButtonBox.Ok).setEnabled(False)
+            return
+
+        self.button_box.button(QW.QDialogButtonBox.Ok).setEnabled(not self._rule.is_empty())
+
+        if self._rule.is_empty():
+            self.label__preview.setText("No rule yet")
+            return
+
+        file_ids = self._rule.get_matching_file_ids(self._file_tree)
+
+        self.label__preview.setText(
+            "{} of {} files match, {}".format(
+                len(file_ids),
+                self._file_tree.get_file_count(),
+                CF.size_bytes_to_pretty_str(int(self._file_tree.get_file_sizes()[file_ids].sum())),
+            )
+        )
+
+    def get_rule(self) -> CoreFileRules.File_Selection_Rule | None:
+        return self._rule
+
+    def get_checked(self) -> bool:
+        """
+        Gets whether the matching files should be checked (downloaded) or unchecked
+        """
+        return self.dropdown__action.currentIndex() == 1
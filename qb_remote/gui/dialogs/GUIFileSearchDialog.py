@@ -0,0 +1,97 @@
+import qtpy
+
+from qtpy import QtCore as QC
+from qtpy import QtWidgets as QW
+from qtpy import QtGui as QG
+
+from ...core import CoreGlobals as CG
+from ...core import CoreController
+
+
+class FileSearchDialog(QW.QDialog):
+    """
+    Searches the file paths of every torrent, double clicking a result selects its torrent
+    """
+
+    torrent_selected = QC.Signal(str)
+
+    SEARCH_TIMER_INTERVAL_MS = 150
+
+    def __init__(self, controller: CoreController.ClientController = None, parent=None):
+        super().__init__(parent)
+
+        self._controller: CoreController.ClientController = controller or CG.controller
+
+        self.setWindowTitle("Find Files")
+        self.resize(900, 500)
+
+        self.input_box = QW.QLineEdit()
+        self.input_box.setPlaceholderText("Search file paths of all torrents, such as S02E05")
+        self.input_box.setClearButtonEnabled(True)
+        self.input_box.textChanged.connect(self._search_text_changed)
+        self.input_box.returnPressed.connect(self._search)
+
+        self.search_timer = QC.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self._search)
+
+        self.results = QW.QTreeWidget()
+        self.results.setColumnCount(2)
+        self.results.setHeaderLabels(["Torrent", "File"])
+        self.results.setRootIsDecorated(False)
+        self.results.setUniformRowHeights(True)
+        self.results.itemDoubleClicked.connect(self._result_double_clicked)
+
+        self.status_label = QW.QLabel()
+
+        layout = QW.QVBoxLayout(self)
+        layout.addWidget(self.input_box)
+        layout.addWidget(self.results)
+        layout.addWidget(self.status_label)
+
+        self._update_status_label()
+
+    def _update_status_label(self, result_count: int = None):
+        index = self._controller.file_path_index
+
+        text = f"{len(index)} paths of {len(index.get_torrent_hashes())} torrents indexed"
+
+        if result_count is not None:
+            text = f"{result_count} matches   " + text
+
+        self.status_label.setText(text)
+
+    def _search_text_changed(self):
+        self.search_timer.start(self.SEARCH_TIMER_INTERVAL_MS)
+
+    def _search(self):
+        self.search_timer.stop()
+
+        matches = self._controller.file_path_index.search(self.input_box.text())
+
+        store = self._controller.torrent_state_store
+
+        torrent_names = {}
+
+        items = []
+
+        for torrent_hash, file_id, path in matches:
+            name = torrent_names.get(torrent_hash, None)
+
+            if name is None:
+                torrent = store.get_torrent(torrent_hash) or {}
+                name = torrent_names[torrent_hash] = torrent.get("name", torrent_hash)
+
+            item = QW.QTreeWidgetItem([name, path])
+            item.setData(0, QC.Qt.UserRole, torrent_hash)
+            item.setData(1, QC.Qt.UserRole, file_id)
+
+            items.append(item)
+
+        self.results.clear()
+        self.results.addTopLevelItems(items)
+
+        self._update_status_label(len(items))
+
+    def _result_double_clicked(self, item: QW.QTreeWidgetItem, column: int):
+        self.torrent_selected.emit(item.data(0, QC.Qt.UserRole))
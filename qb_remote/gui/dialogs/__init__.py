@@ -6,6 +6,9 @@ from qtpy import QtGui as QG
 
 from .GUITorrentDialog import TorrentDialog
 from .GUISettingsDialog import SettingsDialog
+from .GUIFileSearchDialog import FileSearchDialog
+from .GUIFileRuleDialog import FileRuleDialog
+from .GUICacheStatsDialog import CacheStatsDialog
 from .GUICommonDialogs import *
 
 def show_add_torrent_file_dialog(parent=None):